@@ -0,0 +1,52 @@
+# backend/accounts.py
+"""SEMS account lookup shared by single and bulk inverter creation."""
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm import Session
+
+from models import SemsAccount
+
+def get_or_create_account(db: Session, username: str, password: str, region: str) -> SemsAccount:
+    """The account for (username, region); the latest password supplied wins"""
+    account = db.query(SemsAccount).filter(
+        SemsAccount.username == username, SemsAccount.region == region
+    ).first()
+    if account is None:
+        account = SemsAccount(username=username, password=password, region=region)
+        db.add(account)
+        db.flush()
+    elif password and account.password != password:
+        account.password = password
+    return account
+
+def bulk_get_or_create_accounts(db: Session, logins: Iterable[Tuple[str, str, str]]) -> Dict[Tuple[str, str], int]:
+    """Account ids keyed by (username, region) for (username, password, region) logins.
+
+    Existing accounts are looked up in chunks and the missing ones inserted with a single
+    executemany; nothing is committed here.
+    """
+    passwords = {}
+    for username, password, region in logins:
+        passwords[(username, region)] = password
+    keys = list(passwords)
+
+    ids = {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        rows = db.query(SemsAccount.id, SemsAccount.username, SemsAccount.region).filter(
+            tuple_(SemsAccount.username, SemsAccount.region).in_(chunk)
+        ).all()
+        ids.update({(username, region): account_id for account_id, username, region in rows})
+
+    missing = [key for key in keys if key not in ids]
+    if missing:
+        now = datetime.utcnow()
+        new_ids = db.execute(
+            insert(SemsAccount).returning(SemsAccount.id, sort_by_parameter_order=True),
+            [{"username": username, "password": passwords[(username, region)], "region": region,
+              "created_at": now} for username, region in missing]
+        ).scalars().all()
+        ids.update(zip(missing, new_ids))
+    return ids
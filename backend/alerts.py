@@ -0,0 +1,340 @@
+# backend/alerts.py
+"""Inverter fault alerts evaluated on inverter_status points as scrapers write them.
+
+Scrapers forward the line protocol of every poll to ``POST /alerts/ingest`` once InfluxDB has
+accepted it. The engine keeps a few fields of state per inverter and a running median per peer
+group (inverters sharing a SEMS region and timezone), so evaluating a point costs a dict lookup
+and a sorted-list update and nothing is ever read back from InfluxDB:
+
+- ``offline``: the inverter has reported ``online=0`` for ALERT_OFFLINE_MINUTES
+- ``low_production``: ``current_power`` stayed below ALERT_LOW_FRACTION of its peer-group median
+  for ALERT_LOW_POINTS points in a row while that median was above ALERT_DAYLIGHT_WATTS (the
+  sun is up for the group)
+- ``no_data``: nothing arrived for ALERT_NO_DATA_FACTOR poll intervals, found by popping a heap
+  of per-inverter deadlines rather than scanning the fleet
+
+Alerts are opened and resolved in Postgres and every transition goes to the configured sinks.
+"""
+import heapq
+import logging
+import math
+import os
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from line_protocol import parse_line
+from models import Alert, Inverter
+from metrics import ALERT_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+ALERT_OFFLINE_MINUTES = float(os.getenv("ALERT_OFFLINE_MINUTES", "30"))
+ALERT_LOW_FRACTION = float(os.getenv("ALERT_LOW_FRACTION", "0.5"))
+ALERT_LOW_POINTS = int(os.getenv("ALERT_LOW_POINTS", "3"))
+ALERT_DAYLIGHT_WATTS = float(os.getenv("ALERT_DAYLIGHT_WATTS", "200"))
+ALERT_MIN_PEERS = int(os.getenv("ALERT_MIN_PEERS", "3"))
+ALERT_NO_DATA_FACTOR = int(os.getenv("ALERT_NO_DATA_FACTOR", "3"))
+# Seconds between no-data checks; 0 disables them
+ALERT_CHECK_INTERVAL = int(os.getenv("ALERT_CHECK_INTERVAL", "60"))
+
+Point = Tuple[int, datetime, Dict[str, Any]]  # (inverter id, time, fields)
+
+class RunningMedian:
+    """Median of the latest value per key, kept in a sorted list"""
+
+    def __init__(self):
+        self._values: List[float] = []
+        self._by_key: Dict[Any, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def update(self, key, value: float) -> None:
+        self.remove(key)
+        insort(self._values, value)
+        self._by_key[key] = value
+
+    def remove(self, key) -> None:
+        old = self._by_key.pop(key, None)
+        if old is not None:
+            del self._values[bisect_left(self._values, old)]
+
+    def median(self) -> Optional[float]:
+        count = len(self._values)
+        if not count:
+            return None
+        middle = count // 2
+        if count % 2:
+            return self._values[middle]
+        return (self._values[middle - 1] + self._values[middle]) / 2
+
+@dataclass
+class InverterState:
+    inverter_id: int
+    group: Tuple[str, str]
+    interval: int
+    last_seen: Optional[datetime] = None
+    offline_since: Optional[datetime] = None
+    low_points: int = 0
+    open: Dict[str, int] = field(default_factory=dict)  # rule -> open alert id
+
+class LogSink:
+    def send(self, event: Dict[str, Any]) -> None:
+        logger.warning(f"Alert {event['status']}: inverter {event['inverter_id']} {event['rule']} - {event['message']}")
+
+class WebhookSink:
+    """POSTs each transition as JSON to ``url``"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, event: Dict[str, Any]) -> None:
+        import requests
+        response = requests.post(self.url, json=event, timeout=self.timeout)
+        response.raise_for_status()
+
+def sinks_from_env() -> List:
+    """Sinks named in ALERT_SINKS (comma separated: log, webhook)"""
+    sinks = []
+    for name in filter(None, (part.strip() for part in os.getenv("ALERT_SINKS", "log").split(","))):
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "webhook" and os.getenv("ALERT_WEBHOOK_URL"):
+            sinks.append(WebhookSink(os.environ["ALERT_WEBHOOK_URL"]))
+        else:
+            logger.warning(f"Ignoring alert sink {name!r}")
+    return sinks
+
+def points_from_lines(lines: Iterable[str]) -> List[Point]:
+    """inverter_status points carrying an inverter_id tag; other lines are ignored"""
+    points = []
+    for line in lines:
+        if not line.strip():
+            continue
+        measurement, tags, fields, timestamp = parse_line(line)
+        if measurement != "inverter_status" or not tags.get("inverter_id", "").isdigit():
+            continue
+        at = datetime.utcfromtimestamp(timestamp / 1e9) if timestamp is not None else datetime.utcnow()
+        points.append((int(tags["inverter_id"]), at, fields))
+    return points
+
+class AlertEngine:
+    """Incremental rule evaluation with per-inverter state"""
+
+    def __init__(self, session_factory, sinks: Optional[List] = None, check_interval: int = ALERT_CHECK_INTERVAL,
+                 offline_minutes: float = ALERT_OFFLINE_MINUTES, low_fraction: float = ALERT_LOW_FRACTION,
+                 low_points: int = ALERT_LOW_POINTS, daylight_watts: float = ALERT_DAYLIGHT_WATTS,
+                 min_peers: int = ALERT_MIN_PEERS, no_data_factor: int = ALERT_NO_DATA_FACTOR):
+        self.session_factory = session_factory
+        self.sinks = sinks if sinks is not None else sinks_from_env()
+        self.check_interval = check_interval
+        self.offline_after = timedelta(minutes=offline_minutes)
+        self.low_fraction = low_fraction
+        self.low_points = low_points
+        self.daylight_watts = daylight_watts
+        self.min_peers = min_peers
+        self.no_data_factor = no_data_factor
+        self._states: Dict[int, InverterState] = {}
+        self._missing: Set[int] = set()
+        self._groups: Dict[Tuple[str, str], RunningMedian] = {}
+        self._deadlines: List[Tuple[datetime, int, datetime]] = []  # (deadline, inverter id, last_seen)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # State
+
+    def _load(self, db, inverter_ids: Iterable[int]) -> None:
+        """Create state for inverters seen for the first time, with their open alerts"""
+        inverter_ids = list(inverter_ids)
+        # Ids are never reused, so points of deleted inverters are not looked up again
+        self._missing.update(inverter_ids)
+        for inverter in db.query(Inverter).filter(Inverter.id.in_(inverter_ids)).all():
+            self._missing.discard(inverter.id)
+            self._states[inverter.id] = InverterState(
+                inverter.id, (inverter.region or "", inverter.timezone or "UTC"), inverter.interval or 300
+            )
+        for alert in db.query(Alert).filter(Alert.inverter_id.in_(inverter_ids), Alert.status == "open").all():
+            state = self._states.get(alert.inverter_id)
+            if state is not None:
+                state.open[alert.rule] = alert.id
+
+    def forget(self, inverter_id: int) -> None:
+        """Drop an inverter's state, e.g. after it was deleted"""
+        with self._lock:
+            state = self._states.pop(inverter_id, None)
+            if state is not None:
+                self._peers(state).remove(inverter_id)
+
+    def _peers(self, state: InverterState) -> RunningMedian:
+        peers = self._groups.get(state.group)
+        if peers is None:
+            peers = self._groups[state.group] = RunningMedian()
+        return peers
+
+    # Transitions are collected as (action, state, rule, at, message, value) and applied in one session;
+    # a resolve carries the id of the alert it closes as its value
+
+    def _raise(self, changes: List, state: InverterState, rule: str, at: datetime, message: str,
+               value: Optional[float] = None) -> None:
+        if rule not in state.open:
+            state.open[rule] = 0  # Placeholder until the row has an id
+            changes.append(("open", state, rule, at, message, value))
+
+    def _clear(self, changes: List, state: InverterState, rule: str, at: datetime) -> None:
+        # Popped right away, so a later point in the same batch does not resolve it twice
+        alert_id = state.open.pop(rule, None)
+        if alert_id is not None:
+            changes.append(("resolved", state, rule, at, None, alert_id))
+
+    def _evaluate(self, changes: List, state: InverterState, at: datetime, fields: Dict[str, Any]) -> None:
+        self._clear(changes, state, "no_data", at)
+        heapq.heappush(self._deadlines, (at + timedelta(seconds=state.interval * self.no_data_factor),
+                                         state.inverter_id, at))
+
+        peers = self._peers(state)
+        online = fields.get("online")
+        if online is not None and not online:
+            # Offline covers the missing production; keep the zero out of the peer median
+            peers.remove(state.inverter_id)
+            state.low_points = 0
+            self._clear(changes, state, "low_production", at)
+            if state.offline_since is None:
+                state.offline_since = at
+            if at - state.offline_since >= self.offline_after:
+                self._raise(changes, state, "offline", at,
+                            f"Offline since {state.offline_since.isoformat()}")
+            return
+        if online is not None:
+            state.offline_since = None
+            self._clear(changes, state, "offline", at)
+
+        power = fields.get("current_power")
+        if not isinstance(power, (int, float)) or not math.isfinite(power):
+            return
+        peers.update(state.inverter_id, float(power))
+        median = peers.median()
+        if len(peers) < self.min_peers or median is None or median < self.daylight_watts:
+            # Night, or too few peers to judge; keep the streak but do not extend it
+            return
+        if power < self.low_fraction * median:
+            state.low_points += 1
+            if state.low_points >= self.low_points:
+                self._raise(changes, state, "low_production", at,
+                            f"{power:.0f} W against a peer median of {median:.0f} W", float(power))
+        else:
+            state.low_points = 0
+            self._clear(changes, state, "low_production", at)
+
+    def _apply(self, db, changes: List) -> List[Dict[str, Any]]:
+        """Persist transitions and return them as sink events"""
+        if not changes:
+            return []
+        rows = []
+        opened: Dict[Tuple[int, str], Alert] = {}
+        for action, state, rule, at, message, value in changes:
+            if action == "open":
+                alert = Alert(inverter_id=state.inverter_id, rule=rule, status="open", message=message,
+                              value=value, started_at=at)
+                db.add(alert)
+                opened[(state.inverter_id, rule)] = alert
+            else:
+                # Opened earlier in the same batch (placeholder id 0), or a row from before
+                alert = opened.pop((state.inverter_id, rule), None) if not value else db.get(Alert, value)
+                if alert is None:
+                    continue
+                alert.status = "resolved"
+                alert.resolved_at = at
+            rows.append((action, state, rule, alert))
+        db.commit()
+
+        events = []
+        for action, state, rule, alert in rows:
+            if action == "open" and alert.status == "open":
+                state.open[rule] = alert.id
+            ALERT_TRANSITIONS.labels(rule=rule, status=action).inc()
+            events.append({
+                "alert_id": alert.id,
+                "inverter_id": state.inverter_id,
+                "rule": rule,
+                "status": action,
+                "message": alert.message,
+                "value": alert.value,
+                "at": (alert.resolved_at if action == "resolved" else alert.started_at).isoformat(),
+            })
+        return events
+
+    # Entry points
+
+    def observe(self, points: Iterable[Point]) -> List[Dict[str, Any]]:
+        """Evaluate newly written points; returns the alert transitions they caused"""
+        points = sorted(points, key=lambda point: point[1])
+        db = self.session_factory()
+        try:
+            with self._lock:
+                unknown = {inverter_id for inverter_id, _, _ in points
+                           if inverter_id not in self._states and inverter_id not in self._missing}
+                if unknown:
+                    self._load(db, unknown)
+                changes: List = []
+                for inverter_id, at, fields in points:
+                    state = self._states.get(inverter_id)
+                    # Unknown inverters and replays of points already seen are skipped
+                    if state is None or (state.last_seen is not None and at <= state.last_seen):
+                        continue
+                    state.last_seen = at
+                    self._evaluate(changes, state, at, fields)
+                return self._apply(db, changes)
+        finally:
+            db.close()
+
+    def expire(self, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Raise no_data for every inverter whose deadline passed without a newer point"""
+        now = now or datetime.utcnow()
+        db = self.session_factory()
+        try:
+            with self._lock:
+                changes: List = []
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    deadline, inverter_id, seen = heapq.heappop(self._deadlines)
+                    state = self._states.get(inverter_id)
+                    if state is None or state.last_seen != seen:
+                        continue  # Superseded by a newer point
+                    self._peers(state).remove(inverter_id)
+                    self._raise(changes, state, "no_data", deadline, f"No data since {seen.isoformat()}")
+                return self._apply(db, changes)
+        finally:
+            db.close()
+
+    def deliver(self, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            for sink in self.sinks:
+                try:
+                    sink.send(event)
+                except Exception as e:
+                    logger.error(f"Alert sink {type(sink).__name__} failed: {e}")
+
+    # No-data thread
+
+    def start(self) -> None:
+        if self.check_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="alert-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.deliver(self.expire())
+            except Exception as e:
+                logger.error(f"Alert expiry failed: {e}")
@@ -1,22 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+import zoneinfo
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from influxdb_client import InfluxDBClient, Point
 from influxdb_client.client.write_api import SYNCHRONOUS
 
-from models import User, Property, Device, PowerGeneration, MyHome
+from models import User, Property, Device, DeviceType, PowerGeneration, MyHome
 from schemas import (
     UserCreate, User as UserSchema,
-    PropertyCreate, Property as PropertySchema,
+    PropertyCreate, Property as PropertySchema, ExportLimit,
     DeviceCreate, Device as DeviceSchema,
     PowerGenerationCreate, PowerGeneration as PowerGenerationSchema,
     MyHomeCreate, MyHome as MyHomeSchema
 )
 from database import get_db
-from influx_config import INFLUX_CONFIG
+from influx_config import get_influx_config
+from energy import DailyEnergyCache
+from forecast import read_forecast
+from flux import local_date, local_day_bounds, site_timezone
+from flux_query import get_runner, HOME_METRICS_LATEST, INVERTER_ENERGY, POWER_GENERATION_SERIES
+from metrics import timed, INFLUX_WRITE_SECONDS, POINTS_WRITTEN
+from tracing import span, TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+
+DAILY_ENERGY_CACHE = DailyEnergyCache()
 
 # User endpoints
 @router.post("/users/", response_model=UserSchema)
@@ -41,6 +50,11 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
 # Property endpoints
 @router.post("/properties/", response_model=PropertySchema)
 def create_property(property: PropertyCreate, db: Session = Depends(get_db)):
+    if property.timezone:
+        try:
+            zoneinfo.ZoneInfo(property.timezone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            raise HTTPException(status_code=422, detail=f"Unknown IANA timezone {property.timezone!r}")
     db_property = Property(**property.dict())
     db.add(db_property)
     db.commit()
@@ -58,6 +72,17 @@ def get_property(property_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Property not found")
     return db_property
 
+@router.put("/properties/{property_id}/export-limit", response_model=PropertySchema)
+def set_export_limit(property_id: int, limit: ExportLimit, db: Session = Depends(get_db)):
+    """Cap grid export; the curtailment controller picks it up at its next refresh"""
+    db_property = db.query(Property).filter(Property.id == property_id).first()
+    if not db_property:
+        raise HTTPException(status_code=404, detail="Property not found")
+    db_property.export_limit_w = limit.export_limit_w
+    db.commit()
+    db.refresh(db_property)
+    return db_property
+
 # Device endpoints
 @router.post("/devices/", response_model=DeviceSchema)
 def create_device(device: DeviceCreate, db: Session = Depends(get_db)):
@@ -79,6 +104,15 @@ def get_device(device_id: int, db: Session = Depends(get_db)):
     return db_device
 
 # Power Generation endpoints (using InfluxDB)
+def _power_generation_row(record) -> dict:
+    values = record.values
+    return {
+        "timestamp": values.get("_time"),
+        "power_generation": values.get("power_generation"),
+        "earning": values.get("earning"),
+        "used": values.get("used")
+    }
+
 @router.get("/power-generation/{property_id}")
 def get_power_generation(property_id: int, start_time: datetime = None, end_time: datetime = None):
     if not start_time:
@@ -86,61 +120,116 @@ def get_power_generation(property_id: int, start_time: datetime = None, end_time
     if not end_time:
         end_time = datetime.utcnow()
 
-    client = InfluxDBClient(
-        url=INFLUX_CONFIG["url"],
-        token=INFLUX_CONFIG["token"],
-        org=INFLUX_CONFIG["org"]
-    )
+    try:
+        return get_runner().rows(POWER_GENERATION_SERIES, start_time, end_time, parse=_power_generation_row,
+                                 time_key="timestamp", property_id=str(property_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    query = f'''
-    from(bucket: "{INFLUX_CONFIG["bucket"]}")
-        |> range(start: {start_time.isoformat()}Z, stop: {end_time.isoformat()}Z)
-        |> filter(fn: (r) => r["_measurement"] == "power_generation")
-        |> filter(fn: (r) => r["property_id"] == "{str(property_id)}")
-        |> group(columns: ["_time"])
-        |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
-    '''
+def _inverter_serials(db: Session, property_id: int) -> List[str]:
+    return [device.device_id for device in db.query(Device).filter(
+        Device.property_id == property_id, Device.device_type == DeviceType.INVERTER
+    ).all() if device.device_id]
 
+def _inverter_energy(serials: List[str], start: datetime, stop: datetime, every: str, tz) -> List[dict]:
     try:
-        result = client.query_api().query(query)
-        records = []
-        for table in result:
-            for record in table.records:
-                values = record.values
-                records.append({
-                    "timestamp": values.get("_time"),
-                    "power_generation": values.get("power_generation"),
-                    "earning": values.get("earning"),
-                    "used": values.get("used")
-                })
-        
-        client.close()
-        return records
+        return get_runner().rows(INVERTER_ENERGY, start, stop, serials=serials, every=every, timezone=tz.key)
     except Exception as e:
-        client.close()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/properties/{property_id}/energy")
+def get_property_energy(property_id: int, start_time: datetime = None, end_time: datetime = None,
+                        every: str = Query("1d", pattern=r"^[1-9][0-9]*(m|h|d|w|mo|y)$"),
+                        db: Session = Depends(get_db)):
+    """Generated energy and earnings per inverter and window, from the etotal counter deltas.
+
+    Day, month and year windows start at local midnight in the property's timezone.
+    """
+    db_property = db.query(Property).filter(Property.id == property_id).first()
+    if not db_property:
+        raise HTTPException(status_code=404, detail="Property not found")
+    if not start_time:
+        start_time = datetime.utcnow() - timedelta(days=7)
+    if not end_time:
+        end_time = datetime.utcnow()
+
+    serials = _inverter_serials(db, property_id)
+    tariff = db_property.tariff_per_kwh or 0.0
+    if not serials:
+        return {"property_id": property_id, "tariff_per_kwh": tariff, "energy_kwh": 0.0, "earnings": 0.0, "windows": []}
+
+    windows = []
+    for row in _inverter_energy(serials, start_time, end_time, every, site_timezone(db_property.timezone)):
+        energy_kwh = row.get("_value") or 0.0
+        windows.append({
+            "timestamp": row["_time"],
+            "inverter_sn": row.get("inverter_sn"),
+            "energy_kwh": energy_kwh,
+            "earnings": energy_kwh * tariff
+        })
+    windows.sort(key=lambda window: (window["timestamp"], window["inverter_sn"]))
+    total = sum(window["energy_kwh"] for window in windows)
+    return {"property_id": property_id, "tariff_per_kwh": tariff, "energy_kwh": total,
+            "earnings": total * tariff, "windows": windows}
+
+@router.get("/properties/{property_id}/energy/daily")
+def get_property_daily_energy(property_id: int, start_date: date = None, end_date: date = None,
+                              db: Session = Depends(get_db)):
+    """Energy and earnings per local calendar day, cached per (property, local date)"""
+    db_property = db.query(Property).filter(Property.id == property_id).first()
+    if not db_property:
+        raise HTTPException(status_code=404, detail="Property not found")
+    tz = site_timezone(db_property.timezone)
+    today = local_date(datetime.utcnow(), tz)
+    end_date = min(end_date or today, today)
+    start_date = start_date or end_date - timedelta(days=6)
+    if start_date > end_date:
+        raise HTTPException(status_code=422, detail="start_date must not be after end_date")
+    if (end_date - start_date).days > 366:
+        raise HTTPException(status_code=422, detail="At most 367 days per request")
+
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    energy = DAILY_ENERGY_CACHE.get_many(property_id, days)
+    missing = [day for day in days if day not in energy]
+    serials = _inverter_serials(db, property_id)
+
+    if missing and serials:
+        start, stop = local_day_bounds(missing[0], missing[-1], tz)
+        fetched = {day: 0.0 for day in missing}
+        for row in _inverter_energy(serials, start, stop, "1d", tz):
+            day = local_date(row["_time"], tz)
+            if day in fetched:
+                fetched[day] += row.get("_value") or 0.0
+        energy.update(fetched)
+        DAILY_ENERGY_CACHE.put_many(property_id, {day: kwh for day, kwh in fetched.items() if day < today})
+
+    tariff = db_property.tariff_per_kwh or 0.0
+    return {
+        "property_id": property_id,
+        "timezone": tz.key,
+        "tariff_per_kwh": tariff,
+        "days": [{"date": day, "energy_kwh": energy.get(day, 0.0), "earnings": energy.get(day, 0.0) * tariff}
+                 for day in days]
+    }
+
+@router.get("/properties/{property_id}/forecast")
+def get_property_forecast(property_id: int, db: Session = Depends(get_db)):
+    """Forecast kWh per hour summed over the property's inverters, from the latest refit"""
+    if not db.query(Property.id).filter(Property.id == property_id).first():
+        raise HTTPException(status_code=404, detail="Property not found")
+    try:
+        hours = read_forecast(get_runner(), property_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"property_id": property_id, "energy_kwh": sum(hour["energy_kwh"] for hour in hours), "hours": hours}
+
 # My Home endpoints (using InfluxDB)
 @router.get("/my-home/{property_id}")
 def get_home_metrics(property_id: int):
-    client = InfluxDBClient(
-        url=INFLUX_CONFIG["url"],
-        token=INFLUX_CONFIG["token"],
-        org=INFLUX_CONFIG["org"]
-    )
-
-    query = f'''
-    from(bucket: "{INFLUX_CONFIG["bucket"]}")
-        |> range(start: -5m)
-        |> filter(fn: (r) => r["_measurement"] == "home_metrics")
-        |> filter(fn: (r) => r["property_id"] == "{str(property_id)}")
-        |> last()
-    '''
-
     try:
-        result = client.query_api().query(query)
-        if not result:
-            client.close()
+        rows = get_runner().rows(HOME_METRICS_LATEST, timedelta(minutes=-5), datetime.utcnow(),
+                                 property_id=str(property_id))
+        if not rows:
             raise HTTPException(status_code=404, detail="No home metrics found")
 
         data = {
@@ -153,33 +242,30 @@ def get_home_metrics(property_id: int):
             "rain_percentage": None
         }
 
-        for table in result:
-            for record in table.records:
-                field = record.get_field()
-                value = record.get_value()
-                if field == "_time":
-                    data["timestamp"] = value
-                else:
-                    data[field] = value
+        for row in rows:
+            field = row.get("_field")
+            value = row.get("_value")
+            if field == "_time":
+                data["timestamp"] = value
+            else:
+                data[field] = value
 
         if all(v is None for v in data.values()):
-            client.close()
             raise HTTPException(status_code=404, detail="No home metrics found")
-        
-        client.close()
+
         return data
     except Exception as e:
-        client.close()
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/power-generation/{property_id}")
 def create_power_generation(property_id: int, data: PowerGenerationCreate):
+    influx_config = get_influx_config()
     client = InfluxDBClient(
-        url=INFLUX_CONFIG["url"],
-        token=INFLUX_CONFIG["token"],
-        org=INFLUX_CONFIG["org"]
+        url=influx_config["url"],
+        token=influx_config["token"],
+        org=influx_config["org"]
     )
     write_api = client.write_api(write_options=SYNCHRONOUS)
     
@@ -191,16 +277,19 @@ def create_power_generation(property_id: int, data: PowerGenerationCreate):
         .field("used", data.today_used) \
         .time(data.today_date)
     
-    write_api.write(bucket=INFLUX_CONFIG["bucket"], record=point)
+    with timed(INFLUX_WRITE_SECONDS, handler="create_power_generation"), span("influx.write", handler="create_power_generation"):
+        write_api.write(bucket=influx_config["bucket"], record=point)
+    POINTS_WRITTEN.labels(handler="create_power_generation").inc()
     client.close()
     return {"message": "Data written successfully"}
 
 @router.post("/my-home/{property_id}")
 def create_home_metrics(property_id: int, data: MyHomeCreate):
+    influx_config = get_influx_config()
     client = InfluxDBClient(
-        url=INFLUX_CONFIG["url"],
-        token=INFLUX_CONFIG["token"],
-        org=INFLUX_CONFIG["org"]
+        url=influx_config["url"],
+        token=influx_config["token"],
+        org=influx_config["org"]
     )
     write_api = client.write_api(write_options=SYNCHRONOUS)
     
@@ -215,6 +304,8 @@ def create_home_metrics(property_id: int, data: MyHomeCreate):
         .field("rain_percentage", data.rain_percentage) \
         .time(datetime.utcnow())
     
-    write_api.write(bucket=INFLUX_CONFIG["bucket"], record=point)
+    with timed(INFLUX_WRITE_SECONDS, handler="create_home_metrics"), span("influx.write", handler="create_home_metrics"):
+        write_api.write(bucket=influx_config["bucket"], record=point)
+    POINTS_WRITTEN.labels(handler="create_home_metrics").inc()
     client.close()
     return {"message": "Data written successfully"} 
\ No newline at end of file
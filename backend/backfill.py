@@ -0,0 +1,303 @@
+# backend/backfill.py
+"""Historical backfill of SEMS daily power charts into InfluxDB.
+
+The scrapers only see live ``GetInverterAllPoint`` snapshots, so a new site starts empty.
+A backfill job fetches one power chart per local day for a station, many days at once
+under a shared rate limit, and writes the points through a batched line protocol writer.
+A day is only recorded in the job's checkpoint file after its points were accepted by
+InfluxDB, so an interrupted job can be started again and only fetches what is missing.
+The chart is the station's total, so it is written as ``station_power`` tagged with the
+station rather than as any one inverter's ``current_power``. Job progress is saved next to
+the checkpoint and outlives a restart of the backend.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import zoneinfo
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, asdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from line_protocol import serialize_columns, to_float_column
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_DIR = os.getenv("BACKFILL_DIR", "/app/backfill")
+BACKFILL_MEASUREMENT = "station_power"
+# Portal requests per second across all days of one job
+BACKFILL_RATE = float(os.getenv("BACKFILL_RATE", "5"))
+BACKFILL_BATCH_LINES = 20000
+
+class RateLimiter:
+    """Token bucket shared by the worker threads of a job"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class BackfillCheckpoint:
+    """Days already written for one (inverter, station), persisted as JSON"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.done: Set[str] = set()
+        if path.exists():
+            try:
+                self.done = set(json.loads(path.read_text()).get("done", []))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable backfill checkpoint {path}: {e}")
+
+    def mark_done(self, days: Iterable[str]) -> None:
+        self.done.update(days)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"done": sorted(self.done)}))
+        os.replace(tmp, self.path)
+
+@dataclass
+class BackfillProgress:
+    inverter_id: int
+    power_station_id: str
+    start_date: str
+    end_date: str
+    status: str = "pending"
+    days_total: int = 0
+    days_done: int = 0
+    days_skipped: int = 0
+    points_written: int = 0
+    failed_days: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+_jobs: Dict[int, BackfillProgress] = {}
+_jobs_lock = threading.Lock()
+
+def progress_path(inverter_id: int, directory: str = BACKFILL_DIR) -> Path:
+    return Path(directory) / f"inverter-{inverter_id}-progress.json"
+
+def save_progress(progress: BackfillProgress, directory: str = BACKFILL_DIR) -> None:
+    """Persist the inverter's latest job; a failure to do so never fails the job"""
+    path = progress_path(progress.inverter_id, directory)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(progress.to_dict()))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Could not save backfill progress to {path}: {e}")
+
+def get_progress(inverter_id: int, directory: str = BACKFILL_DIR) -> Optional[BackfillProgress]:
+    """The inverter's latest job, from memory or as saved before a restart"""
+    progress = _jobs.get(inverter_id)
+    if progress is not None:
+        return progress
+    path = progress_path(inverter_id, directory)
+    if not path.exists():
+        return None
+    try:
+        progress = BackfillProgress(**json.loads(path.read_text()))
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable backfill progress {path}: {e}")
+        return None
+    if progress.status in ("pending", "running"):
+        # Saved by a process that stopped mid-job; rerunning it resumes from the checkpoint
+        progress.status = "interrupted"
+    return progress
+
+def register_job(progress: BackfillProgress) -> bool:
+    """Claim the inverter's backfill slot; False while another job for it is running"""
+    with _jobs_lock:
+        current = _jobs.get(progress.inverter_id)
+        if current is not None and current.status in ("pending", "running"):
+            return False
+        _jobs[progress.inverter_id] = progress
+        return True
+
+def date_range(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+def chart_columns(chart: List[Dict], day: date, tz: zoneinfo.ZoneInfo) -> Tuple[np.ndarray, np.ndarray]:
+    """(epoch ns, watts) columns for one day's power chart; ``x`` is local HH:MM"""
+    midnight = datetime(day.year, day.month, day.day, tzinfo=tz)
+    timestamps = np.empty(len(chart), dtype=np.int64)
+    for i, point in enumerate(chart):
+        hours, minutes = str(point.get("x", "00:00")).split(":")[:2]
+        # Wall-clock time so DST days keep their local labels
+        local = midnight.replace(hour=int(hours) % 24, minute=int(minutes))
+        timestamps[i] = int(local.timestamp()) * 1_000_000_000
+    return timestamps, to_float_column([point.get("y") for point in chart])
+
+def chart_to_lines(chart: List[Dict], day: date, tz: zoneinfo.ZoneInfo, power_station_id: str) -> List[str]:
+    """station_power lines for one day's power chart"""
+    if not chart:
+        return []
+    timestamps, power = chart_columns(chart, day, tz)
+    rows = len(chart)
+    return serialize_columns(
+        BACKFILL_MEASUREMENT,
+        {"power_station_id": [power_station_id] * rows, "source": ["backfill"] * rows},
+        {"power": power},
+        timestamps
+    )
+
+class BatchedWriter:
+    """Buffers day results and writes them in large batches, checkpointing after each write"""
+
+    def __init__(self, write_lines: Callable[[List[str]], None], checkpoint: BackfillCheckpoint,
+                 progress: BackfillProgress, batch_lines: int = BACKFILL_BATCH_LINES,
+                 progress_dir: Optional[str] = None):
+        self.write_lines = write_lines
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.batch_lines = batch_lines
+        self.progress_dir = progress_dir
+        self._lines: List[str] = []
+        self._days: List[str] = []
+
+    def add(self, day: str, lines: List[str]) -> None:
+        self._lines.extend(lines)
+        self._days.append(day)
+        if len(self._lines) >= self.batch_lines:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._days:
+            return
+        if self._lines:
+            self.write_lines(self._lines)
+        self.checkpoint.mark_done(self._days)
+        self.progress.days_done += len(self._days)
+        self.progress.points_written += len(self._lines)
+        self._lines, self._days = [], []
+        if self.progress_dir is not None:
+            save_progress(self.progress, self.progress_dir)
+
+def influx_line_writer(client=None, handler: str = "backfill") -> Callable[[List[str]], None]:
+    """Synchronous line protocol writer for the configured bucket, on the shared client by default"""
+    from influxdb_client import WritePrecision
+    from influxdb_client.client.write_api import SYNCHRONOUS
+    from influx_config import get_influx_config
+    from flux_query import get_influx_client
+    from metrics import timed, INFLUX_WRITE_SECONDS, POINTS_WRITTEN
+
+    influx_config = get_influx_config()
+    client = client or get_influx_client()
+    write_api = client.write_api(write_options=SYNCHRONOUS)
+
+    def write_lines(lines: List[str]) -> None:
+        with timed(INFLUX_WRITE_SECONDS, handler=handler):
+            write_api.write(bucket=influx_config["bucket"], record=lines, write_precision=WritePrecision.NS)
+        POINTS_WRITTEN.labels(handler=handler).inc(len(lines))
+    return write_lines
+
+def run_backfill(client, progress: BackfillProgress, timezone: str = "UTC", concurrency: int = 8,
+                 rate: float = BACKFILL_RATE, write_lines: Optional[Callable[[List[str]], None]] = None,
+                 checkpoint_dir: str = BACKFILL_DIR) -> BackfillProgress:
+    """Fetch every missing day in the progress' date range and write it to InfluxDB.
+
+    ``client`` is a logged-in (or loggable) GoodWeSEMSClient. Days the portal fails on are
+    listed in ``failed_days`` and left out of the checkpoint, so rerunning the job retries
+    only those.
+    """
+    tz = zoneinfo.ZoneInfo(timezone)
+    checkpoint = BackfillCheckpoint(
+        Path(checkpoint_dir) / f"inverter-{progress.inverter_id}-{progress.power_station_id}.json"
+    )
+    days = date_range(date.fromisoformat(progress.start_date), date.fromisoformat(progress.end_date))
+    pending = [day for day in days if day.isoformat() not in checkpoint.done]
+    progress.days_total = len(days)
+    progress.days_skipped = len(days) - len(pending)
+    progress.status = "running"
+    save_progress(progress, checkpoint_dir)
+    logger.info(f"Backfilling {len(pending)} of {len(days)} day(s) for station {progress.power_station_id}")
+
+    if not client.token and not client.login():
+        progress.status = "failed"
+        progress.error = "SEMS login failed"
+        save_progress(progress, checkpoint_dir)
+        return progress
+
+    limiter = RateLimiter(rate)
+    writer = BatchedWriter(write_lines or influx_line_writer(), checkpoint, progress, progress_dir=checkpoint_dir)
+
+    def fetch(day: date):
+        limiter.acquire()
+        return client.get_plant_power_chart(progress.power_station_id, day.isoformat())
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = {executor.submit(fetch, day): day for day in pending}
+            for future in as_completed(futures):
+                day = futures[future]
+                chart = future.result()
+                if chart is None:
+                    progress.failed_days.append(day.isoformat())
+                    continue
+                writer.add(day.isoformat(), chart_to_lines(chart, day, tz, progress.power_station_id))
+            writer.flush()
+    except Exception as e:
+        logger.error(f"Backfill for station {progress.power_station_id} aborted: {e}")
+        progress.status = "failed"
+        progress.error = str(e)
+        save_progress(progress, checkpoint_dir)
+        return progress
+
+    progress.failed_days.sort()
+    progress.status = "partial" if progress.failed_days else "completed"
+    save_progress(progress, checkpoint_dir)
+    logger.info(f"Backfill for station {progress.power_station_id} {progress.status}: "
+                f"{progress.days_done} day(s), {progress.points_written} point(s)")
+    return progress
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from inverters.goodwe_sems import GoodWeSEMSClient
+
+    parser = argparse.ArgumentParser(description="Backfill SEMS power history into InfluxDB")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--station", required=True, help="SEMS power station id")
+    parser.add_argument("--inverter-id", type=int, required=True)
+    parser.add_argument("--start", required=True, help="First day, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="Last day, YYYY-MM-DD")
+    parser.add_argument("--timezone", default="UTC")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=BACKFILL_RATE)
+    parser.add_argument("--base-url", help="Portal API base, e.g. a fake portal")
+    parser.add_argument("--checkpoint-dir", default=BACKFILL_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = run_backfill(
+        GoodWeSEMSClient(args.username, args.password, base_url=args.base_url),
+        BackfillProgress(args.inverter_id, args.station, args.start, args.end),
+        timezone=args.timezone, concurrency=args.concurrency, rate=args.rate,
+        checkpoint_dir=args.checkpoint_dir
+    )
+    print(json.dumps(result.to_dict(), indent=2))
+    sys.exit(0 if result.status == "completed" else 1)
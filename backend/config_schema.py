@@ -0,0 +1,150 @@
+# backend/config_schema.py
+"""Compiled validators for the ``config_schema`` declared in template.json.
+
+A schema maps sections to fields. A field is either a bare type name (``"string"``) or a
+rule object::
+
+    "interval": {"type": "integer", "minimum": 30, "maximum": 86400},
+    "timezone": {"type": "string", "format": "timezone"},
+    "password": {"type": "string", "allow_empty": true},
+    "base_url": {"type": "string", "required": false}
+
+Fields are required and strings must be non-empty unless stated otherwise. Each schema is
+compiled once into a flat list of checks, so validating thousands of configs is a loop
+over prebuilt closures rather than a walk of the schema per config.
+"""
+import zoneinfo
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA_TYPES = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "object": (dict,),
+    "array": (list,),
+}
+RULE_KEYS = {"type", "required", "allow_empty", "minimum", "maximum", "format", "enum"}
+FORMATS = {"timezone"}
+
+@dataclass
+class ConfigError:
+    field: str
+    message: str
+
+    def to_dict(self) -> Dict[str, str]:
+        return asdict(self)
+
+@lru_cache(maxsize=1)
+def _timezones() -> frozenset:
+    return frozenset(zoneinfo.available_timezones())
+
+def _check_type(type_name: str) -> Callable[[Any], Optional[str]]:
+    expected = SCHEMA_TYPES[type_name]
+
+    def check(value):
+        # bool is an int subclass but never a valid integer/number here
+        if isinstance(value, bool) and type_name != "boolean":
+            return f"expected {type_name}, got boolean"
+        if not isinstance(value, expected):
+            return f"expected {type_name}, got {type(value).__name__}"
+        return None
+    return check
+
+def _compile_field(rule: Dict[str, Any]) -> List[Callable[[Any], Optional[str]]]:
+    checks = [_check_type(rule["type"])]
+    if rule["type"] == "string" and not rule.get("allow_empty", False):
+        checks.append(lambda value: "must not be empty" if not value.strip() else None)
+    if "enum" in rule:
+        allowed = frozenset(rule["enum"])
+        checks.append(lambda value: f"must be one of {sorted(allowed)}" if value not in allowed else None)
+    if "minimum" in rule:
+        minimum = rule["minimum"]
+        checks.append(lambda value: f"must be >= {minimum}" if value < minimum else None)
+    if "maximum" in rule:
+        maximum = rule["maximum"]
+        checks.append(lambda value: f"must be <= {maximum}" if value > maximum else None)
+    if rule.get("format") == "timezone":
+        checks.append(lambda value: f"unknown IANA timezone {value!r}" if value not in _timezones() else None)
+    return checks
+
+class CompiledSchema:
+    """Validator for one template's config_schema"""
+
+    def __init__(self, schema: Dict[str, Dict[str, Any]]):
+        self.schema = schema
+        # (section, field, required, checks) for every declared field
+        self._fields: List[Tuple[str, str, bool, List[Callable]]] = []
+        for section, fields in schema.items():
+            for name, rule in fields.items():
+                rule = {"type": rule} if isinstance(rule, str) else rule
+                self._fields.append((section, name, rule.get("required", True), _compile_field(rule)))
+        self._sections = tuple(schema)
+
+    def validate(self, config: Any) -> List[ConfigError]:
+        """All problems with one config; an empty list means it is valid"""
+        if not isinstance(config, dict):
+            return [ConfigError("", "config must be an object")]
+        errors = []
+        missing_sections = set()
+        for section in self._sections:
+            if not isinstance(config.get(section), dict):
+                missing_sections.add(section)
+                errors.append(ConfigError(section, "missing section" if section not in config
+                                          else "expected object"))
+        for section, name, required, checks in self._fields:
+            if section in missing_sections:
+                continue
+            values = config[section]
+            if name not in values or values[name] is None:
+                if required:
+                    errors.append(ConfigError(f"{section}.{name}", "missing field"))
+                continue
+            value = values[name]
+            for check in checks:
+                message = check(value)
+                if message:
+                    errors.append(ConfigError(f"{section}.{name}", message))
+                    break
+        return errors
+
+    def validate_many(self, configs: Iterable[Any]) -> List[List[ConfigError]]:
+        """Errors for each config, in input order"""
+        validate = self.validate
+        return [validate(config) for config in configs]
+
+def compile_schema(schema: Any) -> Tuple[Optional[CompiledSchema], List[str]]:
+    """Compile a template's config_schema, returning (validator, schema errors)"""
+    if not isinstance(schema, dict):
+        return None, ["config_schema must be an object"]
+    errors = []
+    for section, fields in schema.items():
+        if not isinstance(fields, dict):
+            errors.append(f"config_schema.{section} must be an object")
+            continue
+        for name, rule in fields.items():
+            path = f"config_schema.{section}.{name}"
+            if isinstance(rule, str):
+                rule = {"type": rule}
+            if not isinstance(rule, dict):
+                errors.append(f"{path} must be a type name or an object")
+                continue
+            if rule.get("type") not in SCHEMA_TYPES:
+                errors.append(f"{path}: unknown type {rule.get('type')!r}")
+            unknown = set(rule) - RULE_KEYS
+            if unknown:
+                errors.append(f"{path}: unknown keys {sorted(unknown)}")
+            if "format" in rule and rule["format"] not in FORMATS:
+                errors.append(f"{path}: unknown format {rule['format']!r}")
+            for bound in ("minimum", "maximum"):
+                if bound not in rule:
+                    continue
+                if rule.get("type") not in ("integer", "number"):
+                    errors.append(f"{path}: {bound} only applies to integer and number fields")
+                elif isinstance(rule[bound], bool) or not isinstance(rule[bound], (int, float)):
+                    errors.append(f"{path}: {bound} must be a number")
+    if errors:
+        return None, errors
+    return CompiledSchema(schema), []
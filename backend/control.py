@@ -0,0 +1,291 @@
+# backend/control.py
+"""Queued remote on/off control of inverters with read-back confirmation.
+
+Commands are rows in ``control_commands``, so the queue survives restarts. A dispatcher
+thread claims queued commands, sends them concurrently under one portal rate limit shared
+with the read-backs, then reads ``GetInverterAllPoint`` once per power station until every
+sent command's inverter reports the requested state (``status`` 1 is on) or
+``CONTROL_VERIFY_TIMEOUT`` passes.
+
+A command left ``sending`` by a restart may or may not have reached the portal, so it is
+verified like a sent one instead of being sent twice.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+
+from backfill import RateLimiter
+from metrics import CONTROL_COMMANDS
+from models import ControlCommand, Inverter
+
+logger = logging.getLogger(__name__)
+
+# Portal requests per second across all sends and read-backs
+CONTROL_RATE = float(os.getenv("CONTROL_RATE", "20"))
+CONTROL_WORKERS = int(os.getenv("CONTROL_WORKERS", "16"))
+CONTROL_MAX_ATTEMPTS = int(os.getenv("CONTROL_MAX_ATTEMPTS", "3"))
+# Seconds after sending before the first read-back, between read-backs and until giving up
+CONTROL_VERIFY_DELAY = float(os.getenv("CONTROL_VERIFY_DELAY", "30"))
+CONTROL_VERIFY_INTERVAL = float(os.getenv("CONTROL_VERIFY_INTERVAL", "30"))
+CONTROL_VERIFY_TIMEOUT = float(os.getenv("CONTROL_VERIFY_TIMEOUT", "600"))
+CONTROL_CLAIM_BATCH = 1000
+CONTROL_COMMIT_EVERY = 50
+# Idle wake-up so read-backs fall due without a new submission
+CONTROL_POLL_SECONDS = 5.0
+
+ACTIONS = ("on", "off")
+FINAL_STATUSES = ("confirmed", "unconfirmed", "failed", "superseded")
+
+class IdempotencyConflict(ValueError):
+    """The idempotency key was already used for a different set of commands"""
+
+# (username, password) of the portal account an inverter is controlled through
+Credentials = Tuple[str, str]
+
+def _credentials(inverter: Inverter) -> Credentials:
+    account = inverter.account
+    return (account.username, account.password) if account else (inverter.sems_username, inverter.sems_password)
+
+def submit(db: Session, inverters: List[Inverter], action: str, idempotency_key: Optional[str] = None,
+           source: str = "api") -> Tuple[List[ControlCommand], bool]:
+    """Queue ``action`` for every inverter; returns (commands, created).
+
+    Repeating a key returns the commands it created before. Queued or unconfirmed-yet commands
+    for the same inverters are superseded, so the latest request decides the final state.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+    if idempotency_key:
+        existing = _by_key(db, idempotency_key)
+        if existing:
+            return _replay(existing, inverters, action), False
+
+    now = datetime.utcnow()
+    ids = [inverter.id for inverter in inverters]
+    db.query(ControlCommand).filter(
+        ControlCommand.inverter_id.in_(ids), ControlCommand.status.in_(("queued", "sent"))
+    ).update({"status": "superseded", "completed_at": now}, synchronize_session=False)
+    batch_id = uuid.uuid4().hex
+    commands = [
+        ControlCommand(inverter_id=inverter_id, batch_id=batch_id, action=action,
+                       idempotency_key=idempotency_key, source=source, status="queued", attempts=0,
+                       created_at=now)
+        for inverter_id in ids
+    ]
+    db.add_all(commands)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request with the same key won
+        db.rollback()
+        return _replay(_by_key(db, idempotency_key), inverters, action), False
+    return commands, True
+
+def _by_key(db: Session, idempotency_key: str) -> List[ControlCommand]:
+    return db.query(ControlCommand).filter(ControlCommand.idempotency_key == idempotency_key) \
+        .order_by(ControlCommand.id).all()
+
+def _replay(existing: List[ControlCommand], inverters: List[Inverter], action: str) -> List[ControlCommand]:
+    if {command.inverter_id for command in existing} != {inverter.id for inverter in inverters} \
+            or any(command.action != action for command in existing):
+        raise IdempotencyConflict("Idempotency key was already used for a different request")
+    return existing
+
+class ControlQueue:
+    """Dispatcher thread sending queued commands and confirming them by read-back"""
+
+    def __init__(self, session_factory, client_factory: Optional[Callable] = None, rate: float = CONTROL_RATE,
+                 workers: int = CONTROL_WORKERS, verify_delay: float = CONTROL_VERIFY_DELAY,
+                 verify_interval: float = CONTROL_VERIFY_INTERVAL, verify_timeout: float = CONTROL_VERIFY_TIMEOUT):
+        self.session_factory = session_factory
+        self.client_factory = client_factory
+        # No burst: a full bucket would let the first second send about twice CONTROL_RATE
+        self.limiter = RateLimiter(rate, burst=1)
+        self.workers = workers
+        self.verify_delay = verify_delay
+        self.verify_interval = verify_interval
+        self.verify_timeout = verify_timeout
+        # One logged-in client per account, reused across commands
+        self._clients: Dict[Credentials, object] = {}
+        self._clients_lock = threading.Lock()
+        # command id -> time.monotonic() of its last read-back
+        self._checked: Dict[int, float] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._pool = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="control")
+        self._thread = threading.Thread(target=self._run, name="control-queue", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def wake(self) -> None:
+        """Dispatch now instead of at the next poll, e.g. right after a submission"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        recovered = False
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                if not recovered:
+                    self.recover()
+                    recovered = True
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Control dispatch failed: {e}")
+            self._wake.wait(min(CONTROL_POLL_SECONDS, self.verify_interval))
+
+    def _client(self, credentials: Credentials):
+        with self._clients_lock:
+            client = self._clients.get(credentials)
+            if client is None:
+                if self.client_factory is None:
+                    from inverters.goodwe_sems import GoodWeSEMSClient
+                    self.client_factory = GoodWeSEMSClient
+                client = self._clients[credentials] = self.client_factory(*credentials)
+            return client
+
+    def _map(self, fn, jobs: List) -> Iterable:
+        """Results of ``fn`` over ``jobs`` in order, as they complete"""
+        if self._pool is None or len(jobs) <= 1:
+            return map(fn, jobs)
+        return self._pool.map(fn, jobs)
+
+    def recover(self) -> int:
+        """Treat commands a restart interrupted mid-send as sent"""
+        db = self.session_factory()
+        try:
+            count = db.query(ControlCommand).filter(ControlCommand.status == "sending").update(
+                {"status": "sent", "sent_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+            if count:
+                logger.warning(f"Verifying {count} control command(s) interrupted while sending")
+            return count
+        finally:
+            db.close()
+
+    def run_once(self) -> Tuple[int, int]:
+        """Send queued commands, then read back those due; returns (sent, completed)"""
+        db = self.session_factory()
+        try:
+            return self.dispatch(db), self.verify(db)
+        finally:
+            db.close()
+
+    def _send(self, job: Tuple[int, str, bool, Credentials]) -> Tuple[int, bool]:
+        command_id, serial, on, credentials = job
+        self.limiter.acquire()
+        return command_id, self._client(credentials).control_inverter(serial, on)
+
+    def dispatch(self, db: Session) -> int:
+        claimed = db.query(ControlCommand).options(
+            joinedload(ControlCommand.inverter).joinedload(Inverter.account)
+        ).filter(ControlCommand.status == "queued").order_by(ControlCommand.id) \
+            .limit(CONTROL_CLAIM_BATCH).with_for_update(skip_locked=True, of=ControlCommand).all()
+        if not claimed:
+            return 0
+        jobs = []
+        for command in claimed:
+            command.status = "sending"
+            command.attempts = (command.attempts or 0) + 1
+            jobs.append((command.id, command.inverter.inverter_sn, command.action == "on",
+                         _credentials(command.inverter)))
+        db.commit()
+
+        by_id = {command.id: command for command in claimed}
+        sent = 0
+        for done, (command_id, accepted) in enumerate(self._map(self._send, jobs), 1):
+            command = by_id[command_id]
+            now = datetime.utcnow()
+            if accepted:
+                command.status = "sent"
+                command.sent_at = now
+                command.error = None
+                sent += 1
+            elif command.attempts < CONTROL_MAX_ATTEMPTS:
+                command.status = "queued"
+                command.error = "Rejected by the portal, retrying"
+            else:
+                self._finish(command, "failed", f"Rejected by the portal {command.attempts} times", now)
+            # Results become visible while the rest of a large claim is still being sent
+            if done % CONTROL_COMMIT_EVERY == 0:
+                db.commit()
+        db.commit()
+        logger.info(f"Control dispatch: {sent} of {len(claimed)} command(s) accepted by the portal")
+        return sent
+
+    def _read(self, job: Tuple[Credentials, str]) -> Tuple[Tuple[Credentials, str], Optional[Dict[str, int]]]:
+        credentials, station = job
+        self.limiter.acquire()
+        points = self._client(credentials).get_inverter_points(station)
+        return job, None if points is None else {point.get("sn"): point.get("status") for point in points}
+
+    def verify(self, db: Session) -> int:
+        now = datetime.utcnow()
+        clock = time.monotonic()
+        due_before = now - timedelta(seconds=self.verify_delay)
+        sent = db.query(ControlCommand).options(
+            joinedload(ControlCommand.inverter).joinedload(Inverter.account)
+        ).filter(ControlCommand.status == "sent", ControlCommand.sent_at <= due_before).all()
+
+        # Forget read-backs of commands that were superseded meanwhile
+        waiting = {command.id for command in sent}
+        self._checked = {command_id: checked for command_id, checked in self._checked.items() if command_id in waiting}
+
+        stations: Dict[Tuple[Credentials, str], List[ControlCommand]] = {}
+        completed = 0
+        for command in sent:
+            if clock - self._checked.get(command.id, float("-inf")) < self.verify_interval:
+                continue
+            if not command.inverter.power_station_id:
+                self._finish(command, "unconfirmed", "No power_station_id to read the status from", now)
+                completed += 1
+                continue
+            stations.setdefault((_credentials(command.inverter), command.inverter.power_station_id), []).append(command)
+
+        for key, statuses in self._map(self._read, list(stations)):
+            for command in stations[key]:
+                self._checked[command.id] = clock
+                status = statuses.get(command.inverter.inverter_sn) if statuses is not None else None
+                if status is not None and (status == 1) == (command.action == "on"):
+                    self._finish(command, "confirmed", None, now)
+                    completed += 1
+                elif (now - command.sent_at).total_seconds() >= self.verify_timeout:
+                    reported = "the status read failed" if statuses is None else \
+                        "the inverter was not reported" if status is None else f"status was {status}"
+                    self._finish(command, "unconfirmed", f"Not {command.action} after "
+                                 f"{self.verify_timeout:.0f}s: {reported}", now)
+                    completed += 1
+        db.commit()
+        if stations:
+            logger.info(f"Control read-back: {len(stations)} station(s), {completed} command(s) completed")
+        return completed
+
+    def _finish(self, command: ControlCommand, status: str, error: Optional[str], now: datetime) -> None:
+        command.status = status
+        command.error = error
+        command.completed_at = now
+        self._checked.pop(command.id, None)
+        CONTROL_COMMANDS.labels(action=command.action, status=status).inc()
@@ -0,0 +1,315 @@
+# backend/curtailment.py
+"""Closed-loop grid export limiting by switching inverters off and on.
+
+Every ``CURTAIL_INTERVAL`` seconds the latest ``home_metrics`` export and production of every
+property with an ``export_limit_w`` is read in one Flux query per batch of properties. Export
+above the cap for ``CURTAIL_TRIGGER_SAMPLES`` fresh samples switches off enough of the
+property's inverters to cover the excess, estimating each inverter's share as production
+divided by the inverters still on. The last inverter switched off is switched on again once
+export plus its estimated share stays under the cap less ``CURTAIL_HYSTERESIS`` for
+``CURTAIL_RESTORE_SAMPLES`` samples. A property waits at least ``CURTAIL_HOLD_SECONDS`` between
+actions, so commands never chase the meter.
+
+Commands go through the control queue (source ``curtailment``), which rate-limits, retries and
+confirms them. Inverters last switched off by anything else are left alone. The decision logic
+is ``PropertyControl.step``, which ``simulate`` also drives over stored ``home_metrics`` data:
+
+    python curtailment.py --property 12 --start 2024-06-01 --stop 2024-06-08 --limit 3000 --inverters 2
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from control import submit
+from flux_query import FluxRunner, HOME_METRICS_EXPORT, get_runner
+from models import ControlCommand, Device, DeviceType, Inverter, Property
+
+logger = logging.getLogger(__name__)
+
+CURTAIL_INTERVAL = float(os.getenv("CURTAIL_INTERVAL", "10"))  # Seconds between checks; 0 disables
+CURTAIL_TRIGGER_SAMPLES = int(os.getenv("CURTAIL_TRIGGER_SAMPLES", "2"))
+CURTAIL_RESTORE_SAMPLES = int(os.getenv("CURTAIL_RESTORE_SAMPLES", "3"))
+CURTAIL_HOLD_SECONDS = float(os.getenv("CURTAIL_HOLD_SECONDS", "60"))
+CURTAIL_HYSTERESIS = float(os.getenv("CURTAIL_HYSTERESIS", "0.1"))
+# Samples older than this are ignored, so a silent meter never triggers or restores anything
+CURTAIL_STALE_SECONDS = float(os.getenv("CURTAIL_STALE_SECONDS", "120"))
+CURTAIL_REFRESH_SECONDS = float(os.getenv("CURTAIL_REFRESH_SECONDS", "300"))
+QUERY_BATCH = 500
+
+@dataclass
+class Sample:
+    time: float  # Epoch seconds of the reading
+    exporting: float
+    producing: Optional[float] = None
+
+# ("off" | "on", inverter ids)
+Action = Tuple[str, List[int]]
+
+@dataclass
+class PropertyControl:
+    """Hysteresis state of one capped property"""
+    property_id: int
+    limit: float
+    inverter_ids: List[int]  # Controllable inverters, switched off from the end of the list
+    # Inverters this controller switched off, last first to come back, with their estimated output
+    curtailed: List[Tuple[int, Optional[float]]] = field(default_factory=list)
+    over: int = 0
+    under: int = 0
+    last_action: float = float("-inf")
+    last_sample: float = float("-inf")
+
+    @property
+    def running(self) -> List[int]:
+        off = {inverter_id for inverter_id, _ in self.curtailed}
+        return [inverter_id for inverter_id in self.inverter_ids if inverter_id not in off]
+
+    def _share(self, sample: Sample) -> Optional[float]:
+        running = len(self.running)
+        if sample.producing is None or running == 0:
+            return None
+        return max(sample.producing, 0.0) / running
+
+    def step(self, sample: Sample, now: float) -> Optional[Action]:
+        """Feed one reading; returns the action to take, if any"""
+        if sample.time <= self.last_sample or now - sample.time > CURTAIL_STALE_SECONDS:
+            return None
+        self.last_sample = sample.time
+        held = now - self.last_action >= CURTAIL_HOLD_SECONDS
+
+        if sample.exporting > self.limit:
+            self.under = 0
+            self.over += 1
+            running = self.running
+            if self.over < CURTAIL_TRIGGER_SAMPLES or not held or not running:
+                return None
+            share = self._share(sample)
+            excess = sample.exporting - self.limit
+            count = min(len(running), max(1, math.ceil(excess / share))) if share else 1
+            switched = running[-count:]
+            self.curtailed.extend((inverter_id, share) for inverter_id in reversed(switched))
+            self.over = 0
+            self.last_action = now
+            return "off", switched
+
+        self.over = 0
+        if not self.curtailed:
+            self.under = 0
+            return None
+        inverter_id, share = self.curtailed[-1]
+        share = share if share is not None else self._share(sample) or 0.0
+        if sample.exporting + share > self.limit * (1 - CURTAIL_HYSTERESIS):
+            self.under = 0
+            return None
+        self.under += 1
+        if self.under < CURTAIL_RESTORE_SAMPLES or not held:
+            return None
+        self.curtailed.pop()
+        self.under = 0
+        self.last_action = now
+        return "on", [inverter_id]
+
+def load_controls(db: Session, existing: Dict[int, PropertyControl]) -> Dict[int, PropertyControl]:
+    """Controls for every capped property, keeping the state of those already running"""
+    rows = db.query(Property.id, Property.export_limit_w, Inverter.id).join(
+        Device, (Device.property_id == Property.id) & (Device.device_type == DeviceType.INVERTER)
+    ).join(Inverter, Inverter.inverter_sn == Device.device_id).filter(
+        Property.export_limit_w.isnot(None)
+    ).order_by(Property.id, Inverter.id).all()
+    if not rows:
+        return {}
+
+    # Latest command per inverter decides who switched it off
+    latest_ids = db.query(func.max(ControlCommand.id)).filter(
+        ControlCommand.inverter_id.in_({inverter_id for _, _, inverter_id in rows})
+    ).group_by(ControlCommand.inverter_id)
+    latest = {command.inverter_id: command for command in
+              db.query(ControlCommand).filter(ControlCommand.id.in_(latest_ids)).all()}
+
+    controls: Dict[int, PropertyControl] = {}
+    for property_id, limit, inverter_id in rows:
+        control = controls.get(property_id)
+        if control is None:
+            control = controls[property_id] = PropertyControl(property_id, limit, [])
+            previous = existing.get(property_id)
+            if previous is not None:
+                # Keep counters, hold time and output estimates across refreshes
+                control.over, control.under = previous.over, previous.under
+                control.last_action, control.last_sample = previous.last_action, previous.last_sample
+            shares = dict(previous.curtailed) if previous is not None else {}
+        command = latest.get(inverter_id)
+        switched_off = command is not None and command.action == "off" \
+            and command.status not in ("failed", "superseded")
+        if switched_off and command.source != "curtailment":
+            continue  # Switched off by an operator: not ours to switch on
+        control.inverter_ids.append(inverter_id)
+        if switched_off:
+            control.curtailed.append((inverter_id, shares.get(inverter_id)))
+    for control in controls.values():
+        # Most recently switched off comes back first
+        control.curtailed.sort(key=lambda entry: latest[entry[0]].id)
+    return controls
+
+def latest_samples(runner: FluxRunner, property_ids: List[int]) -> Dict[int, Sample]:
+    samples = {}
+    for offset in range(0, len(property_ids), QUERY_BATCH):
+        batch = [str(property_id) for property_id in property_ids[offset:offset + QUERY_BATCH]]
+        for row in runner.rows(HOME_METRICS_EXPORT, timedelta(seconds=-CURTAIL_STALE_SECONDS),
+                               datetime.now(timezone.utc), property_ids=batch):
+            if row.get("exporting") is None or not str(row.get("property_id", "")).isdigit():
+                continue
+            samples[int(row["property_id"])] = Sample(row["_time"].timestamp(), float(row["exporting"]),
+                                                      None if row.get("producing") is None else float(row["producing"]))
+    return samples
+
+class Curtailer:
+    """Asyncio task running the export controller for every capped property"""
+
+    def __init__(self, session_factory, control_queue=None, interval: float = CURTAIL_INTERVAL,
+                 runner_factory: Callable[[], FluxRunner] = get_runner):
+        self.session_factory = session_factory
+        self.control_queue = control_queue
+        self.interval = interval
+        self.runner_factory = runner_factory
+        self.controls: Dict[int, PropertyControl] = {}
+        self._refreshed = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Schedule the loop on the running event loop"""
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="curtailment")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Curtailment check failed: {e}")
+
+    async def tick(self) -> List[Tuple[int, Action]]:
+        """One check of every capped property; blocking IO runs on worker threads"""
+        actions = []
+        if time.monotonic() - self._refreshed >= CURTAIL_REFRESH_SECONDS:
+            controls = await asyncio.to_thread(self.refresh)
+            # A removed cap releases whatever it had switched off
+            actions = [(property_id, ("on", [inverter_id for inverter_id, _ in reversed(control.curtailed)]))
+                       for property_id, control in self.controls.items()
+                       if property_id not in controls and control.curtailed]
+            self.controls = controls
+            self._refreshed = time.monotonic()
+        samples = await asyncio.to_thread(latest_samples, self.runner_factory(), list(self.controls)) \
+            if self.controls else {}
+        now = time.time()
+        for property_id, sample in samples.items():
+            control = self.controls.get(property_id)
+            action = control.step(sample, now) if control is not None else None
+            if action is not None:
+                actions.append((property_id, action))
+        if actions:
+            await asyncio.to_thread(self.apply, actions)
+        return actions
+
+    def refresh(self) -> Dict[int, PropertyControl]:
+        db = self.session_factory()
+        try:
+            return load_controls(db, self.controls)
+        finally:
+            db.close()
+
+    def apply(self, actions: List[Tuple[int, Action]]) -> None:
+        db = self.session_factory()
+        try:
+            for property_id, (action, inverter_ids) in actions:
+                inverters = db.query(Inverter).filter(Inverter.id.in_(inverter_ids)).all()
+                submit(db, inverters, action, source="curtailment")
+                logger.info(f"Curtailment: property {property_id} switching {action} inverter(s) {inverter_ids}")
+        finally:
+            db.close()
+        if self.control_queue is not None:
+            self.control_queue.wake()
+
+@dataclass
+class SimulationResult:
+    samples: int = 0
+    commands: int = 0
+    inverter_switches: int = 0
+    seconds_over_limit: float = 0.0
+    max_export: float = 0.0
+    curtailed_energy_wh: float = 0.0
+
+def simulate(samples: List[Sample], limit: float, inverters: int) -> SimulationResult:
+    """Replay recorded readings through the controller against a plant model.
+
+    A switched-off inverter removes its share of the recorded production from export, from
+    the next sample on (commands take effect with one sample of delay).
+    """
+    control = PropertyControl(0, limit, list(range(inverters)))
+    result = SimulationResult()
+    off = 0
+    previous: Optional[Sample] = None
+    for sample in sorted(samples, key=lambda sample: sample.time):
+        producing = max(sample.producing or 0.0, 0.0)
+        removed = producing * off / inverters if inverters else 0.0
+        seen = Sample(sample.time, sample.exporting - removed, producing - removed)
+        if previous is not None:
+            elapsed = sample.time - previous.time
+            result.curtailed_energy_wh += removed * elapsed / 3600
+            if seen.exporting > limit:
+                result.seconds_over_limit += elapsed
+        result.samples += 1
+        result.max_export = max(result.max_export, seen.exporting)
+        action = control.step(seen, sample.time)
+        if action is not None:
+            result.commands += 1
+            result.inverter_switches += len(action[1])
+            off += len(action[1]) if action[0] == "off" else -len(action[1])
+        previous = sample
+    return result
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from dataclasses import asdict
+
+    from flux_query import HOME_METRICS_SERIES
+
+    parser = argparse.ArgumentParser(description="Replay stored home_metrics through the export controller")
+    parser.add_argument("--property", type=int, required=True)
+    parser.add_argument("--start", required=True, help="First day, YYYY-MM-DD")
+    parser.add_argument("--stop", required=True, help="Day after the last, YYYY-MM-DD")
+    parser.add_argument("--limit", type=float, required=True, help="Export cap, same unit as exporting")
+    parser.add_argument("--inverters", type=int, default=1)
+    args = parser.parse_args()
+
+    def parse_day(value: str) -> datetime:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+    readings: Dict[float, Dict[str, float]] = {}
+    for row in get_runner().rows(HOME_METRICS_SERIES, parse_day(args.start), parse_day(args.stop),
+                                 property_id=str(args.property)):
+        if row.get("_field") in ("exporting", "producing") and row.get("_value") is not None:
+            readings.setdefault(row["_time"].timestamp(), {})[row["_field"]] = float(row["_value"])
+    recorded = [Sample(stamp, values["exporting"], values.get("producing"))
+                for stamp, values in readings.items() if "exporting" in values]
+    print(json.dumps(asdict(simulate(recorded, args.limit, args.inverters)), indent=2))
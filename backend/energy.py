@@ -0,0 +1,135 @@
+# backend/energy.py
+"""Interval energy from the cumulative counters inverters report.
+
+``eday``/``emonth``/``etotal`` (and the ``today_*`` fields of ``power_generation``) are running
+totals that reset, so summing raw samples counts the same energy once per poll. Energy is the
+per-sample delta of a counter, where a large drop means the counter was reset and the new
+reading is the energy since the reset. The same rule runs in Flux for queries pushed down to
+InfluxDB (``COUNTER_DELTAS`` in the ``*.energy`` templates of flux_query.py) and over NumPy
+columns for bulk recomputation; only the NumPy side knows about ``rollover``.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+# A drop to below this fraction of the previous reading is a reset; smaller drops are noise
+RESET_FRACTION = 0.5
+DAY_NS = 86_400 * 1_000_000_000
+
+def series_starts(series: np.ndarray) -> np.ndarray:
+    """Index of the first row of each series in a column sorted by series"""
+    series = np.asarray(series)
+    if len(series) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(([0], np.flatnonzero(series[1:] != series[:-1]) + 1))
+
+def _forward_fill(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Carry the last reading over NaNs, never across a series boundary"""
+    index = np.where(np.isnan(values), 0, np.arange(len(values)))
+    index[starts] = starts
+    np.maximum.accumulate(index, out=index)
+    return values[index]
+
+def counter_deltas(values: Sequence, series: Optional[Sequence] = None,
+                   rollover: Optional[float] = None) -> np.ndarray:
+    """Energy per sample of cumulative counters (same unit as the counter).
+
+    ``values`` are sorted by (series, time) with ``series`` identifying each counter; the
+    first sample of every series is 0. A reading below ``RESET_FRACTION`` of the previous
+    one is a reset and counts in full, or as the wrapped delta when the previous reading was
+    near ``rollover``; smaller drops are noise and count as 0, so they are never paid twice.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return values.copy()
+    starts = series_starts(series) if series is not None else np.zeros(1, dtype=np.int64)
+    filled = _forward_fill(values, starts)
+
+    previous = np.empty_like(filled)
+    previous[0] = filled[0]
+    previous[1:] = filled[:-1]
+    deltas = filled - previous
+
+    dropped = deltas < 0
+    reset = dropped & (filled < previous * RESET_FRACTION)
+    deltas[dropped] = 0.0
+    deltas[reset] = filled[reset]
+    if rollover:
+        wrapped = reset & (previous > rollover * (1 - RESET_FRACTION))
+        deltas[wrapped] = filled[wrapped] + rollover - previous[wrapped]
+
+    deltas[starts] = 0.0
+    deltas[np.isnan(deltas)] = 0.0
+    return deltas
+
+def bucket_sums(series: np.ndarray, timestamps: np.ndarray, values: np.ndarray, bucket_ns: int = DAY_NS,
+                offset_ns: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sum ``values`` per (series, time bucket) for columns sorted by (series, time).
+
+    Returns (series, bucket start in epoch ns, sum). ``offset_ns`` shifts bucket edges, e.g.
+    by a fixed UTC offset for local days.
+    """
+    series = np.asarray(series)
+    if len(series) == 0:
+        return series[:0], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    buckets = (np.asarray(timestamps, dtype=np.int64) + offset_ns) // bucket_ns
+    changed = (series[1:] != series[:-1]) | (buckets[1:] != buckets[:-1])
+    starts = np.concatenate(([0], np.flatnonzero(changed) + 1))
+    sums = np.add.reduceat(np.asarray(values, dtype=np.float64), starts)
+    return series[starts], buckets[starts] * bucket_ns - offset_ns, sums
+
+def earnings(series: np.ndarray, energy_kwh: np.ndarray, tariffs: Dict, default: float = 0.0) -> np.ndarray:
+    """Energy times the per-kWh tariff of each row's series"""
+    keys, inverse = np.unique(np.asarray(series), return_inverse=True)
+    rates = np.array([tariffs.get(key, default) or 0.0 for key in keys.tolist()], dtype=np.float64)
+    return energy_kwh * rates[inverse]
+
+class DailyEnergyCache:
+    """kWh per (property, local date) for finished days.
+
+    Past days only change when history is backfilled or re-fetched, so entries live for
+    ``ttl`` seconds; the current local day is never cached.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, date], Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, property_id: int, days: Iterable[date]) -> Dict[date, float]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for day in days:
+                entry = self._entries.get((property_id, day))
+                if entry is None:
+                    continue
+                energy_kwh, stored_at = entry
+                if now - stored_at > self.ttl:
+                    del self._entries[(property_id, day)]
+                    continue
+                self._entries.move_to_end((property_id, day))
+                found[day] = energy_kwh
+        return found
+
+    def put_many(self, property_id: int, values: Dict[date, float]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for day, energy_kwh in values.items():
+                self._entries[(property_id, day)] = (energy_kwh, now)
+                self._entries.move_to_end((property_id, day))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, property_id: Optional[int] = None) -> None:
+        with self._lock:
+            if property_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == property_id]:
+                del self._entries[key]
@@ -0,0 +1,29 @@
+# backend/flux.py
+"""Time handling for Flux queries.
+
+Range bounds are UTC instants; calendar windows (days, months, years) are computed by
+InfluxDB in the site's IANA timezone through the ``location`` option (see
+``FluxTemplate.local_time``), so a local day is never split across two UTC days.
+"""
+import zoneinfo
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Tuple
+
+def site_timezone(name: str) -> zoneinfo.ZoneInfo:
+    """ZoneInfo for a stored timezone name, falling back to UTC for unknown names"""
+    try:
+        return zoneinfo.ZoneInfo(name or "UTC")
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        return zoneinfo.ZoneInfo("UTC")
+
+def local_day_bounds(start: date, end: date, tz: zoneinfo.ZoneInfo) -> Tuple[datetime, datetime]:
+    """UTC instants of local midnight on ``start`` and after ``end`` (inclusive range)"""
+    first = datetime.combine(start, time(), tzinfo=tz)
+    stop = datetime.combine(end + timedelta(days=1), time(), tzinfo=tz)
+    return first.astimezone(timezone.utc), stop.astimezone(timezone.utc)
+
+def local_date(value: datetime, tz: zoneinfo.ZoneInfo) -> date:
+    """Local calendar date of an instant; naive datetimes are taken as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(tz).date()
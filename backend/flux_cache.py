@@ -0,0 +1,229 @@
+# backend/flux_cache.py
+"""Result cache for range-decomposable Flux queries.
+
+A query is identified by a key (template name and bound params) and run through a callable
+taking the range bounds. The requested range is split into chunks aligned to multiples of
+``chunk_seconds`` and each chunk is cached under (key, chunk start). Chunks that ended more than
+``settle_seconds`` ago are immutable and kept until evicted; the chunk containing "now" is
+served for ``open_ttl`` seconds and then only its tail is queried again, so a chart that
+refreshes every few seconds re-reads minutes rather than its whole range.
+
+Only queries whose rows are independent of the range (filters, pivots, per-row maps) may
+be cached this way; aggregates over the whole range must not.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import FLUX_CACHE_CHUNKS
+
+logger = logging.getLogger(__name__)
+
+Rows = List[Dict[str, Any]]
+
+@dataclass
+class _Chunk:
+    rows: Rows
+    fetched_until: float  # epoch seconds the rows are complete up to
+    stored_at: float  # time.monotonic() of the last fetch
+    complete: bool
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$dt": _utc(value).isoformat()}
+    raise TypeError(f"Cannot cache {type(value).__name__}")
+
+def _decode(obj):
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+class RedisTier:
+    """Optional shared tier for closed chunks on any Redis-compatible server"""
+
+    RETRY_AFTER = 30.0
+
+    def __init__(self, url: str, prefix: str = "flux-cache:", ttl: int = 7 * 86400):
+        self.url = url
+        self.prefix = prefix
+        self.ttl = ttl
+        self._client = None
+        self._down_until = 0.0
+
+    def _redis(self):
+        if time.monotonic() < self._down_until:
+            return None
+        if self._client is None:
+            try:
+                import redis
+                self._client = redis.Redis.from_url(self.url, socket_timeout=0.5)
+            except Exception as e:
+                logger.warning(f"Shared Flux cache disabled: {e}")
+                self._down_until = float("inf")
+                return None
+        return self._client
+
+    def _failed(self, e: Exception) -> None:
+        logger.warning(f"Shared Flux cache unavailable, retrying in {self.RETRY_AFTER:.0f}s: {e}")
+        self._down_until = time.monotonic() + self.RETRY_AFTER
+
+    def get(self, key: str) -> Optional[Rows]:
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            payload = client.get(self.prefix + key)
+        except Exception as e:
+            self._failed(e)
+            return None
+        return json.loads(payload, object_hook=_decode) if payload else None
+
+    def set(self, key: str, rows: Rows) -> None:
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            client.set(self.prefix + key, json.dumps(rows, default=_encode), ex=self.ttl)
+        except Exception as e:
+            self._failed(e)
+
+class FluxResultCache:
+    """LRU cache of Flux rows per aligned time chunk"""
+
+    def __init__(self, chunk_seconds: int = 3600, open_ttl: float = 15.0, settle_seconds: int = 120,
+                 max_chunks: int = 20000, shared: Optional[RedisTier] = None):
+        self.chunk_seconds = chunk_seconds
+        self.open_ttl = open_ttl
+        self.settle_seconds = settle_seconds
+        self.max_chunks = max_chunks
+        self.shared = shared
+        self._chunks: "OrderedDict[Tuple[str, int], _Chunk]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: Tuple[str, int]) -> Optional[_Chunk]:
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                self._chunks.move_to_end(key)
+            return chunk
+
+    def _put(self, key: Tuple[str, int], chunk: _Chunk, share: bool = True) -> None:
+        with self._lock:
+            self._chunks[key] = chunk
+            self._chunks.move_to_end(key)
+            while len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last=False)
+        if share and chunk.complete and self.shared is not None:
+            self.shared.set(f"{key[0]}:{key[1]}", chunk.rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chunks.clear()
+
+    def query(self, key: str, start: datetime, stop: datetime, run: Callable[[datetime, datetime], Rows],
+              time_key: str = "_time") -> Rows:
+        """Rows of the query ``key`` for [start, stop), from cache where possible.
+
+        ``run(start, stop)`` executes the query over a sub-range and returns rows, each
+        carrying its timestamp under ``time_key``. Rows come back in chunk order, as ``run``
+        ordered them within a chunk.
+        """
+        now = time.time()
+        start_ts = _utc(start).timestamp()
+        stop_ts = min(_utc(stop).timestamp(), now)
+        if start_ts >= stop_ts:
+            return []
+
+        size = self.chunk_seconds
+        digest = hashlib.sha256(f"{size}\0{key}".encode()).hexdigest()[:32]
+        first = int(start_ts // size) * size
+        last = int(math.ceil(stop_ts / size)) * size
+        chunk_starts = list(range(first, last, size))
+
+        def fetch(from_ts: float, to_ts: float) -> Rows:
+            return run(datetime.fromtimestamp(from_ts, timezone.utc), datetime.fromtimestamp(to_ts, timezone.utc))
+
+        def row_ts(row) -> float:
+            return _utc(row[time_key]).timestamp()
+
+        def store(chunk_start: int, rows: Rows, fetched_until: float) -> _Chunk:
+            complete = chunk_start + size <= now - self.settle_seconds
+            chunk = _Chunk(rows, min(fetched_until, chunk_start + size), time.monotonic(), complete)
+            self._put((digest, chunk_start), chunk)
+            return chunk
+
+        chunks: Dict[int, _Chunk] = {}
+        missing: List[int] = []
+        for chunk_start in chunk_starts:
+            chunk = self._get((digest, chunk_start))
+            if chunk is None and self.shared is not None and chunk_start + size <= now - self.settle_seconds:
+                rows = self.shared.get(f"{digest}:{chunk_start}")
+                if rows is not None:
+                    FLUX_CACHE_CHUNKS.labels(outcome="shared_hit").inc()
+                    chunk = _Chunk(rows, chunk_start + size, time.monotonic(), True)
+                    self._put((digest, chunk_start), chunk, share=False)
+                    chunks[chunk_start] = chunk
+                    continue
+            if chunk is None:
+                missing.append(chunk_start)
+            elif chunk.complete or time.monotonic() - chunk.stored_at <= self.open_ttl:
+                FLUX_CACHE_CHUNKS.labels(outcome="hit").inc()
+                chunks[chunk_start] = chunk
+            else:
+                # Open chunk past its TTL: re-read only the unsettled tail
+                FLUX_CACHE_CHUNKS.labels(outcome="refresh").inc()
+                tail = max(chunk_start, int(chunk.fetched_until - self.settle_seconds))
+                fresh = fetch(tail, min(chunk_start + size, now))
+                kept = [row for row in chunk.rows if row_ts(row) < tail]
+                chunks[chunk_start] = store(chunk_start, kept + fresh, now)
+
+        # One query per run of adjacent missing chunks, split back into chunks
+        run_start = 0
+        while run_start < len(missing):
+            run_end = run_start
+            while run_end + 1 < len(missing) and missing[run_end + 1] == missing[run_end] + size:
+                run_end += 1
+            span_start, span_stop = missing[run_start], min(missing[run_end] + size, now)
+            FLUX_CACHE_CHUNKS.labels(outcome="miss").inc(run_end - run_start + 1)
+            split: Dict[int, Rows] = {chunk_start: [] for chunk_start in missing[run_start:run_end + 1]}
+            for row in fetch(span_start, span_stop):
+                chunk_start = int(row_ts(row) // size) * size
+                if chunk_start in split:
+                    split[chunk_start].append(row)
+            for chunk_start, rows in split.items():
+                chunks[chunk_start] = store(chunk_start, rows, now)
+            run_start = run_end + 1
+
+        return [
+            row for chunk_start in chunk_starts for row in chunks[chunk_start].rows
+            if start_ts <= row_ts(row) < stop_ts
+        ]
+
+_cache: Optional[FluxResultCache] = None
+
+def get_flux_cache() -> FluxResultCache:
+    """Process-wide cache configured from FLUX_CACHE_* environment variables"""
+    global _cache
+    if _cache is None:
+        redis_url = os.getenv("FLUX_CACHE_REDIS_URL")
+        _cache = FluxResultCache(
+            chunk_seconds=int(os.getenv("FLUX_CACHE_CHUNK_SECONDS", "3600")),
+            open_ttl=float(os.getenv("FLUX_CACHE_OPEN_TTL", "15")),
+            settle_seconds=int(os.getenv("FLUX_CACHE_SETTLE_SECONDS", "120")),
+            max_chunks=int(os.getenv("FLUX_CACHE_MAX_CHUNKS", "20000")),
+            shared=RedisTier(redis_url) if redis_url else None,
+        )
+    return _cache
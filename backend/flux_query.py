@@ -0,0 +1,240 @@
+# backend/flux_query.py
+"""Parameterized Flux templates and the one place queries are run.
+
+A template is compiled once into Flux text that reads every variable part (bucket, range,
+tag values, window size, timezone) from an extern option sent alongside the query. The client
+turns each bound param into a top-level ``option _<name> = ...``, so request input never
+becomes Flux source and a template is the same string for every call.
+Templates are built from small reusable stages and registered by name; ``FluxRunner``
+attaches metrics, tracing and, for templates whose rows do not depend on the range, the
+chunked result cache.
+"""
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import cached_property, lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from energy import RESET_FRACTION
+from flux_cache import FluxResultCache, get_flux_cache
+from influx_config import get_influx_config
+from metrics import timed, INFLUX_QUERY_SECONDS, INFLUX_QUERY_ERRORS
+from tracing import span
+
+Rows = List[Dict[str, Any]]
+RangeBound = Union[datetime, timedelta]
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def _name(value: str) -> str:
+    """Tag, field and param names are code constants; refuse anything that is not one"""
+    if not _NAME.match(value):
+        raise ValueError(f"Invalid Flux identifier {value!r}")
+    return value
+
+def param(name: str) -> str:
+    """Flux identifier of a bound param; the prefix keeps it clear of imported packages"""
+    return f"_{_name(name)}"
+
+# Reusable stages
+
+def tag_equals(tag: str, name: Optional[str] = None) -> str:
+    return f'|> filter(fn: (r) => r["{_name(tag)}"] == {param(name or tag)})'
+
+def tag_in(tag: str, name: str) -> str:
+    return f'|> filter(fn: (r) => contains(value: r["{_name(tag)}"], set: {param(name)}))'
+
+def tag_exists(tag: str) -> str:
+    return f'|> filter(fn: (r) => exists r["{_name(tag)}"])'
+
+def fields(*names: str) -> str:
+    return "|> filter(fn: (r) => " + " or ".join(f'r["_field"] == "{_name(name)}"' for name in names) + ")"
+
+def drop(*columns: str) -> str:
+    return "|> drop(columns: [" + ", ".join(f'"{_name(column)}"' for column in columns) + "])"
+
+def group(*columns: str) -> str:
+    return "|> group(columns: [" + ", ".join(f'"{_name(column)}"' for column in columns) + "])"
+
+def window(fn: str, create_empty: bool = False, time_src: str = "_stop", every_param: str = "every") -> str:
+    """aggregateWindow with ``every`` from a duration string param ("5m", "1d", "1mo")"""
+    return (f"|> aggregateWindow(every: duration(v: {param(every_param)}), fn: {_name(fn)}, "
+            f'createEmpty: {"true" if create_empty else "false"}, timeSrc: "{_name(time_src)}")')
+
+SORT_BY_TIME = '|> sort(columns: ["_time"])'
+PIVOT_FIELDS = '|> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")'
+# Same rule as energy.counter_deltas: a drop below RESET_FRACTION of the previous reading is a
+# reset and the new reading counts in full; smaller drops are noise and count as 0
+COUNTER_DELTAS = "\n    ".join((
+    '|> duplicate(column: "_value", as: "_reading")',
+    "|> difference()",
+    "|> map(fn: (r) => {",
+    "        delta = float(v: r._value)",
+    "        reading = float(v: r._reading)",
+    f"        reset = reading < (reading - delta) * {RESET_FRACTION!r}",
+    "        return {r with _value: if delta >= 0.0 then delta else if reset then reading else 0.0}",
+    "    })",
+    drop("_reading"),
+))
+LAST = "|> last()"
+COUNT = "|> count()"
+
+@dataclass(frozen=True)
+class FluxTemplate:
+    name: str
+    # None reads the measurement from the measurement param
+    measurement: Optional[str]
+    stages: Tuple[str, ...] = ()
+    # Rows depend only on their own timestamps, so ranges can be served from cached chunks
+    cacheable: bool = False
+    # Windows align to local midnight in the timezone param
+    local_time: bool = False
+
+    @cached_property
+    def text(self) -> str:
+        header = f'import "timezone"\noption location = timezone.location(name: {param("timezone")})\n' \
+            if self.local_time else ""
+        measurement = f'"{_name(self.measurement)}"' if self.measurement else param("measurement")
+        lines = [
+            f"from(bucket: {param('bucket')})",
+            f"|> range(start: {param('start')}, stop: {param('stop')})",
+            f'|> filter(fn: (r) => r["_measurement"] == {measurement})',
+            *self.stages,
+        ]
+        return header + "\n    ".join(lines)
+
+TEMPLATES: Dict[str, FluxTemplate] = {}
+
+def register(template: FluxTemplate) -> FluxTemplate:
+    if template.name in TEMPLATES:
+        raise ValueError(f"Flux template {template.name} is already registered")
+    TEMPLATES[template.name] = template
+    return template
+
+POWER_GENERATION_SERIES = register(FluxTemplate(
+    "power_generation.series", "power_generation",
+    (tag_equals("property_id"), group("_time"), PIVOT_FIELDS), cacheable=True
+))
+POWER_GENERATION_DEVICE = register(FluxTemplate(
+    "power_generation.device", "power_generation", (tag_equals("device_id"),), cacheable=True
+))
+POWER_GENERATION_ENERGY = register(FluxTemplate(
+    "power_generation.energy", "power_generation",
+    (fields("power_generation", "earning", "used"), tag_equals("property_id"), group("property_id", "_field"),
+     SORT_BY_TIME, COUNTER_DELTAS, window("sum", time_src="_start")),
+    local_time=True
+))
+HOME_METRICS_SERIES = register(FluxTemplate(
+    "home_metrics.series", "home_metrics", (tag_equals("property_id"),), cacheable=True
+))
+HOME_METRICS_LATEST = register(FluxTemplate(
+    "home_metrics.latest", "home_metrics", (tag_equals("property_id"), LAST)
+))
+# Latest export and production of many properties, one row each
+HOME_METRICS_EXPORT = register(FluxTemplate(
+    "home_metrics.export", "home_metrics",
+    (fields("exporting", "producing"), tag_in("property_id", "property_ids"), group("property_id", "_field"),
+     LAST, PIVOT_FIELDS)
+))
+# Series of one inverter are merged first: the source tag and pre-migration tags split them
+INVERTER_ENERGY = register(FluxTemplate(
+    "inverter_status.energy", "inverter_status",
+    (fields("total_energy"), tag_in("inverter_sn", "serials"), group("inverter_sn", "_field"),
+     SORT_BY_TIME, COUNTER_DELTAS, window("sum", time_src="_start")),
+    local_time=True
+))
+# Hourly energy quantile per inverter, a stand-in for rated capacity when none is configured
+INVERTER_PEAK_ENERGY = register(FluxTemplate(
+    "inverter_status.peak_energy", "inverter_status",
+    (fields("total_energy"), tag_in("inverter_sn", "serials"), group("inverter_sn", "_field"),
+     SORT_BY_TIME, COUNTER_DELTAS, window("sum", time_src="_start"),
+     f'|> quantile(q: {param("q")}, method: "exact_selector")')
+))
+# Live and re-fetched points of one inverter as a single series
+INVERTER_POWER = register(FluxTemplate(
+    "inverter_status.power", "inverter_status",
+    (fields("current_power"), tag_equals("inverter_id"), group("_field"), SORT_BY_TIME, window("mean"))
+))
+INVERTER_WINDOW_COUNTS = register(FluxTemplate(
+    "inverter_status.window_counts", "inverter_status",
+    (fields("current_power"), tag_in("inverter_id", "inverter_ids"), group("inverter_id"),
+     window("count", create_empty=True))
+))
+
+# Backfilled station totals
+STATION_POWER = register(FluxTemplate(
+    "station_power.series", "station_power",
+    (fields("power"), tag_equals("power_station_id"), group("_field"), SORT_BY_TIME, window("mean"))
+))
+
+FORECAST_SERIES = register(FluxTemplate(
+    "forecast.series", "forecast", (tag_equals("property_id"), PIVOT_FIELDS)
+))
+
+# Cardinality of any measurement; last() leaves one row per series (tag set and field)
+SERIES_COUNT = register(FluxTemplate(
+    "schema.series_count", None, (LAST, drop("_value"), "|> group()", '|> count(column: "_measurement")')
+))
+TAG_KEYS = register(FluxTemplate(
+    "schema.tag_keys", None, (LAST, "|> keys()", '|> keep(columns: ["_value"])', "|> group()", "|> distinct()")
+))
+TAG_VALUE_COUNT = register(FluxTemplate(
+    "schema.tag_value_count", None, (LAST, drop("_value"), "|> group()", f"|> distinct(column: {param('tag')})", COUNT)
+))
+
+def record_values(record) -> Dict[str, Any]:
+    """Record as a plain dict, without the per-query result/table columns"""
+    return {key: value for key, value in record.values.items() if key not in ("result", "table")}
+
+class FluxRunner:
+    """Runs registered templates against one bucket"""
+
+    def __init__(self, query_api, bucket: str, org: Optional[str] = None,
+                 cache: Optional[FluxResultCache] = None):
+        self.query_api = query_api
+        self.bucket = bucket
+        self.org = org
+        self.cache = cache
+
+    def _bind(self, params: Dict[str, Any], start: RangeBound, stop: RangeBound) -> Dict[str, Any]:
+        """Params keyed by their Flux identifiers, as the client sends them as extern options"""
+        bound = {**params, "bucket": self.bucket, "start": start, "stop": stop}
+        return {param(name): value for name, value in bound.items()}
+
+    def rows(self, template: FluxTemplate, start: RangeBound, stop: RangeBound,
+             parse: Callable[[Any], Dict[str, Any]] = record_values, time_key: str = "_time",
+             **params) -> Rows:
+        """Parsed rows of ``template`` over [start, stop) with ``params`` bound"""
+        def execute(range_start: RangeBound, range_stop: RangeBound) -> Rows:
+            with timed(INFLUX_QUERY_SECONDS, INFLUX_QUERY_ERRORS, handler=template.name), \
+                    span("influx.query", handler=template.name):
+                tables = self.query_api.query(template.text, org=self.org,
+                                              params=self._bind(params, range_start, range_stop))
+            return [parse(record) for table in tables for record in table.records]
+
+        if template.cacheable and self.cache is not None and isinstance(start, datetime):
+            key = f"{self.bucket}\0{template.name}\0{json.dumps(params, sort_keys=True, default=str)}"
+            return self.cache.query(key, start, stop, execute, time_key=time_key)
+        return execute(start, stop)
+
+    def stream(self, template: FluxTemplate, start: RangeBound, stop: RangeBound,
+               parse: Callable[[Any], Dict[str, Any]] = record_values, **params) -> Iterator[Dict[str, Any]]:
+        """Parsed rows as the response is read, for results too large to hold; never cached"""
+        with timed(INFLUX_QUERY_SECONDS, INFLUX_QUERY_ERRORS, handler=template.name), \
+                span("influx.query", handler=template.name):
+            for record in self.query_api.query_stream(template.text, org=self.org,
+                                                      params=self._bind(params, start, stop)):
+                yield parse(record)
+
+@lru_cache(maxsize=None)
+def get_influx_client():
+    """Shared client for the configured InfluxDB (thread-safe, pooled connections)"""
+    from influxdb_client import InfluxDBClient
+    influx_config = get_influx_config()
+    return InfluxDBClient(url=influx_config["url"], token=influx_config["token"], org=influx_config["org"])
+
+@lru_cache(maxsize=None)
+def get_runner() -> FluxRunner:
+    influx_config = get_influx_config()
+    return FluxRunner(get_influx_client().query_api(), influx_config["bucket"], cache=get_flux_cache())
@@ -0,0 +1,392 @@
+# backend/forecast.py
+"""Hourly production forecast for every inverter, refit in batches.
+
+The baseline model needs no weather: clear-sky irradiance from the site's coordinates (solar
+position and the Haurwitz model) times the inverter's historical ratio of hourly energy to
+clear-sky irradiance, one median per hour of day over ``FORECAST_HISTORY_DAYS``. The ratio absorbs
+capacity, orientation, shading and the site's usual cloud cover. With ``FORECAST_WEATHER_FILE``
+and scikit-learn installed, a gradient boosted model per inverter additionally learns energy
+from the local weather features in that file, and its predictions replace the baseline where
+forecast weather is available.
+
+Sites are fit in chunks (weather models on a process pool) and forecasts are written to the ``forecast``
+measurement (``energy_kwh`` and ``baseline_kwh`` per inverter and hour). Reads are served per
+property from ``FORECAST_CACHE`` until the next refit.
+
+    python forecast.py --workers 8
+"""
+import csv
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from flux_query import FluxRunner, FORECAST_SERIES, get_influx_client, get_runner
+from line_protocol import serialize_columns
+from peer_performance import InverterSite, hourly_energy, load_sites
+
+logger = logging.getLogger(__name__)
+
+FORECAST_INTERVAL = int(os.getenv("FORECAST_INTERVAL", "21600"))  # Seconds between refits; 0 disables
+FORECAST_HORIZON_HOURS = int(os.getenv("FORECAST_HORIZON_HOURS", "48"))
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "30"))
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", str(os.cpu_count() or 1)))
+FORECAST_CHUNK = int(os.getenv("FORECAST_CHUNK", "200"))  # Sites per pool task
+# CSV with property_id, time (ISO 8601, hourly) and numeric weather columns, past and forecast
+FORECAST_WEATHER_FILE = os.getenv("FORECAST_WEATHER_FILE", "")
+FORECAST_MIN_SAMPLES = int(os.getenv("FORECAST_MIN_SAMPLES", "100"))
+FORECAST_GBM_ITERATIONS = int(os.getenv("FORECAST_GBM_ITERATIONS", "100"))
+FORECAST_MEASUREMENT = "forecast"
+
+HOUR_NS = 3_600_000_000_000
+# Irradiance samples per hour, so sunrise and sunset hours are not judged by their midpoint
+SUBSAMPLES = 4
+# W/m2 below which an hour is too dark to learn a ratio from
+MIN_IRRADIANCE = 50.0
+MIN_RATIO_DAYS = 3
+# kWh per kW per (W/m2): performance ratio 0.8 at 1000 W/m2, for sites with capacity but no history
+DEFAULT_RATIO_PER_KW = 0.8 / 1000
+
+def clear_sky(latitudes: np.ndarray, longitudes: np.ndarray, hour_starts_ns: np.ndarray) -> np.ndarray:
+    """Mean clear-sky global horizontal irradiance (W/m2) per (site, hour) from the hour's start.
+
+    Solar position from the NOAA series approximations, irradiance from the Haurwitz model.
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))[:, None, None]
+    lon = np.asarray(longitudes, dtype=np.float64)[:, None, None]
+    offsets = (np.arange(SUBSAMPLES) + 0.5) / SUBSAMPLES * 3600
+    seconds = (np.asarray(hour_starts_ns, dtype=np.int64) // 1_000_000_000)[None, :, None] + offsets[None, None, :]
+    days = (seconds // 86400).astype(np.int64).astype("datetime64[D]")
+    day_of_year = (days - days.astype("datetime64[Y]").astype("datetime64[D]")).astype(np.float64)
+    minutes = (seconds % 86400) / 60.0
+    gamma = 2 * np.pi / 365 * (day_of_year + (minutes / 60 - 12) / 24)
+    equation_of_time = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                                 - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+    declination = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+                   - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+                   - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+    hour_angle = np.radians((minutes + equation_of_time + 4 * lon) / 4 - 180)
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        ghi = np.where(cos_zenith > 0.01, 1098 * cos_zenith * np.exp(-0.057 / cos_zenith), 0.0)
+    return ghi.mean(axis=2)
+
+def ratio_profile(energy: np.ndarray, irradiance: np.ndarray, hour_of_day: np.ndarray) -> np.ndarray:
+    """(N, 24) median of energy / irradiance per UTC hour of day, NaN where too few days.
+
+    Hours of day without ``MIN_RATIO_DAYS`` usable days take the site's overall median.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(irradiance >= MIN_IRRADIANCE, energy / irradiance, np.nan)
+    profile = np.full((len(energy), 24), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN slices
+        for hour in range(24):
+            columns = ratio[:, hour_of_day == hour]
+            enough = np.isfinite(columns).sum(axis=1) >= MIN_RATIO_DAYS
+            profile[enough, hour] = np.nanmedian(columns[enough], axis=1)
+        overall = np.nanmedian(ratio, axis=1)
+    return np.where(np.isfinite(profile), profile, overall[:, None])
+
+@dataclass
+class FitTask:
+    """One chunk of sites; arrays are (sites, hours) over history then horizon"""
+    energy: np.ndarray  # history only
+    irradiance: np.ndarray
+    hour_of_day: np.ndarray  # (hours,)
+    fallback_ratio: np.ndarray  # (sites,) used without history, NaN for none
+    weather: Optional[np.ndarray] = None  # (sites, hours, features)
+
+def _weather_model(features: np.ndarray, energy: np.ndarray, irradiance: np.ndarray,
+                   hour_of_day: np.ndarray, history: int) -> Optional[np.ndarray]:
+    """Gradient boosted energy over the horizon for one site, None if it cannot be trained"""
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    matrix = np.column_stack([features, irradiance, hour_of_day])
+    train = (irradiance[:history] > 0) & np.isfinite(energy)
+    if train.sum() < FORECAST_MIN_SAMPLES:
+        return None
+    model = HistGradientBoostingRegressor(max_iter=FORECAST_GBM_ITERATIONS, max_leaf_nodes=15)
+    model.fit(matrix[:history][train], energy[train])
+    predicted = np.clip(model.predict(matrix[history:]), 0.0, np.nanmax(energy[train]) * 1.2)
+    predicted[irradiance[history:] <= 0] = 0.0
+    # Hours without forecast weather keep the baseline
+    predicted[~np.isfinite(features[history:]).all(axis=1)] = np.nan
+    return predicted
+
+def fit_chunk(task: FitTask) -> Tuple[np.ndarray, np.ndarray]:
+    """(baseline, forecast) kWh per (site, horizon hour); rows without a model are NaN"""
+    history = task.energy.shape[1]
+    profile = ratio_profile(task.energy, task.irradiance[:, :history], task.hour_of_day[:history])
+    profile = np.where(np.isfinite(profile), profile, task.fallback_ratio[:, None])
+    ahead = task.hour_of_day[history:]
+    baseline = profile[:, ahead] * task.irradiance[:, history:]
+    forecast = baseline.copy()
+    if task.weather is not None:
+        for site in range(len(baseline)):
+            predicted = _weather_model(task.weather[site], task.energy[site], task.irradiance[site],
+                                       task.hour_of_day, history)
+            if predicted is not None:
+                forecast[site] = np.where(np.isfinite(predicted), predicted, baseline[site])
+    return baseline, forecast
+
+class WeatherTable:
+    """Hourly weather features per property from ``FORECAST_WEATHER_FILE``"""
+
+    def __init__(self, features: List[str], rows: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        self.features = features
+        self.rows = rows  # property_id -> (hour starts in epoch ns, (hours, features))
+
+    @classmethod
+    def load(cls, path: str) -> "WeatherTable":
+        with open(path, newline="") as handle:
+            reader = csv.DictReader(handle)
+            features = [name for name in reader.fieldnames or [] if name not in ("property_id", "time")]
+            collected: Dict[str, List[Tuple[int, List[float]]]] = {}
+            for row in reader:
+                stamp = datetime.fromisoformat(row["time"].replace("Z", "+00:00"))
+                if stamp.tzinfo is None:
+                    stamp = stamp.replace(tzinfo=timezone.utc)
+                hour = int(stamp.timestamp()) // 3600 * HOUR_NS
+                values = []
+                for name in features:
+                    try:
+                        values.append(float(row[name]))
+                    except (TypeError, ValueError):
+                        values.append(np.nan)
+                collected.setdefault(str(row["property_id"]), []).append((hour, values))
+        rows = {}
+        for property_id, entries in collected.items():
+            entries.sort(key=lambda entry: entry[0])
+            rows[property_id] = (np.array([entry[0] for entry in entries], dtype=np.int64),
+                                 np.array([entry[1] for entry in entries], dtype=np.float64).reshape(-1, len(features)))
+        return cls(features, rows)
+
+    def matrix(self, property_ids: List[Optional[int]], hour_starts: np.ndarray) -> np.ndarray:
+        """(sites, hours, features), NaN where the file has no row for that property and hour"""
+        result = np.full((len(property_ids), len(hour_starts), len(self.features)), np.nan)
+        for site, property_id in enumerate(property_ids):
+            entry = self.rows.get(str(property_id))
+            if entry is None:
+                continue
+            times, values = entry
+            position = np.clip(np.searchsorted(times, hour_starts), 0, len(times) - 1)
+            found = times[position] == hour_starts
+            result[site, found] = values[position[found]]
+        return result
+
+def _weather_enabled() -> bool:
+    if not FORECAST_WEATHER_FILE:
+        return False
+    try:
+        import sklearn  # noqa: F401
+    except ImportError:
+        logger.warning("FORECAST_WEATHER_FILE is set but scikit-learn is not installed; using the baseline only")
+        return False
+    return True
+
+def fit_forecasts(sites: List[InverterSite], energy: np.ndarray, history_start_ns: int,
+                  horizon_hours: int = FORECAST_HORIZON_HOURS, workers: int = FORECAST_WORKERS,
+                  weather: Optional[WeatherTable] = None, chunk: int = FORECAST_CHUNK) -> Tuple[np.ndarray, np.ndarray]:
+    """(baseline, forecast) kWh per (site, hour) for ``horizon_hours`` after the history"""
+    history = energy.shape[1]
+    hour_starts = history_start_ns + np.arange(history + horizon_hours, dtype=np.int64) * HOUR_NS
+    hour_of_day = (hour_starts // HOUR_NS) % 24
+    latitudes = np.array([site.latitude for site in sites], dtype=np.float64)
+    longitudes = np.array([site.longitude for site in sites], dtype=np.float64)
+    fallback = np.array([(site.capacity_kw or np.nan) * DEFAULT_RATIO_PER_KW for site in sites])
+
+    tasks = []
+    for offset in range(0, len(sites), chunk):
+        part = slice(offset, offset + chunk)
+        tasks.append(FitTask(
+            energy[part], clear_sky(latitudes[part], longitudes[part], hour_starts), hour_of_day, fallback[part],
+            weather.matrix([site.property_id for site in sites[part]], hour_starts) if weather else None
+        ))
+    # The baseline is a few array operations per chunk; only per-site weather models are worth a pool.
+    # Workers are spawned: forking a process that runs threads (uvicorn, background jobs) is unsafe
+    if weather is not None and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(fit_chunk, tasks))
+    else:
+        results = [fit_chunk(task) for task in tasks]
+    if not results:
+        empty = np.empty((0, horizon_hours))
+        return empty, empty
+    return np.vstack([result[0] for result in results]), np.vstack([result[1] for result in results])
+
+def forecast_lines(sites: List[InverterSite], hour_starts: np.ndarray, baseline: np.ndarray,
+                   forecast: np.ndarray) -> List[str]:
+    rows, hours = np.nonzero(np.isfinite(forecast))
+    if not len(rows):
+        return []
+    return serialize_columns(
+        FORECAST_MEASUREMENT,
+        {"inverter_sn": [sites[row].serial for row in rows.tolist()],
+         "property_id": [str(sites[row].property_id or "") for row in rows.tolist()]},
+        {"energy_kwh": forecast[rows, hours], "baseline_kwh": baseline[rows, hours]},
+        hour_starts[hours]
+    )
+
+def property_forecasts(sites: List[InverterSite], hour_starts: np.ndarray, baseline: np.ndarray,
+                       forecast: np.ndarray) -> Dict[int, List[Dict[str, Any]]]:
+    """Hourly totals per property, the shape ``GET /properties/{id}/forecast`` serves"""
+    totals: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+    for site, row_baseline, row_forecast in zip(sites, baseline, forecast):
+        if site.property_id is None or not np.isfinite(row_forecast).any():
+            continue
+        energy, base = totals.setdefault(site.property_id, (np.zeros(len(hour_starts)), np.zeros(len(hour_starts))))
+        energy += np.nan_to_num(row_forecast)
+        base += np.nan_to_num(row_baseline)
+    return {
+        property_id: forecast_hours(hour_starts, energy, base)
+        for property_id, (energy, base) in totals.items()
+    }
+
+def forecast_hours(hour_starts: np.ndarray, energy: np.ndarray, baseline: np.ndarray) -> List[Dict[str, Any]]:
+    return [
+        {"timestamp": datetime.fromtimestamp(start // 1_000_000_000, timezone.utc),
+         "energy_kwh": kwh, "baseline_kwh": base}
+        for start, kwh, base in zip(np.asarray(hour_starts).tolist(), np.asarray(energy).tolist(),
+                                    np.asarray(baseline).tolist())
+    ]
+
+class ForecastCache:
+    """Latest hourly forecast per property, valid until the next refit is due"""
+
+    def __init__(self, ttl: float = max(FORECAST_INTERVAL, 900), max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Tuple[List[Dict[str, Any]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, property_id: int) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(property_id)
+            if entry is None:
+                return None
+            hours, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[property_id]
+                return None
+            self._entries.move_to_end(property_id)
+            return hours
+
+    def put_many(self, values: Dict[int, List[Dict[str, Any]]]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for property_id, hours in values.items():
+                self._entries[property_id] = (hours, now)
+                self._entries.move_to_end(property_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+FORECAST_CACHE = ForecastCache()
+
+def read_forecast(runner: FluxRunner, property_id: int, now: Optional[datetime] = None,
+                  horizon_hours: int = FORECAST_HORIZON_HOURS) -> List[Dict[str, Any]]:
+    """Hourly forecast of a property from the cache, else from the stored ``forecast`` points"""
+    hours = FORECAST_CACHE.get(property_id)
+    if hours is None:
+        start = (now or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+        totals: Dict[datetime, List[float]] = {}
+        for row in runner.rows(FORECAST_SERIES, start, start + timedelta(hours=horizon_hours),
+                               property_id=str(property_id)):
+            total = totals.setdefault(row["_time"], [0.0, 0.0])
+            total[0] += row.get("energy_kwh") or 0.0
+            total[1] += row.get("baseline_kwh") or 0.0
+        hours = [{"timestamp": stamp, "energy_kwh": energy, "baseline_kwh": base}
+                 for stamp, (energy, base) in sorted(totals.items())]
+        FORECAST_CACHE.put_many({property_id: hours})
+    now = now or datetime.now(timezone.utc)
+    # Entries from the last refit cover hours that have since passed
+    return [hour for hour in hours if hour["timestamp"] + timedelta(hours=1) > now]
+
+def refit(db: Session, runner: FluxRunner, write_lines: Callable[[List[str]], None],
+          now: Optional[datetime] = None, workers: int = FORECAST_WORKERS) -> int:
+    """Fit every inverter on its history and write the next ``FORECAST_HORIZON_HOURS``; returns sites"""
+    now = (now or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    start = now.replace(hour=0) - timedelta(days=FORECAST_HISTORY_DAYS)
+    sites = load_sites(db)
+    if not sites:
+        return 0
+
+    started = time.perf_counter()
+    energy = hourly_energy(runner, [site.serial for site in sites], start, now)
+    fetched = time.perf_counter()
+    start_ns = int(start.timestamp()) * 1_000_000_000
+    weather = WeatherTable.load(FORECAST_WEATHER_FILE) if _weather_enabled() else None
+    baseline, forecast = fit_forecasts(sites, energy, start_ns, workers=workers, weather=weather)
+    hour_starts = start_ns + (energy.shape[1] + np.arange(FORECAST_HORIZON_HOURS, dtype=np.int64)) * HOUR_NS
+
+    lines = forecast_lines(sites, hour_starts, baseline, forecast)
+    if lines:
+        write_lines(lines)
+    FORECAST_CACHE.put_many(property_forecasts(sites, hour_starts, baseline, forecast))
+    fitted = int(np.isfinite(forecast).any(axis=1).sum())
+    logger.info(f"Forecast refit: {fitted}/{len(sites)} inverters ({'weather' if weather else 'baseline'} model), "
+                f"history {fetched - started:.1f}s, fit {time.perf_counter() - fetched:.1f}s")
+    return fitted
+
+class ForecastJob:
+    """Background thread refitting forecasts every ``FORECAST_INTERVAL`` seconds"""
+
+    def __init__(self, session_factory, interval: int = FORECAST_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="forecast", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Forecast refit failed: {e}")
+
+    def run_once(self, workers: int = FORECAST_WORKERS) -> int:
+        from backfill import influx_line_writer
+
+        db = self.session_factory()
+        try:
+            return refit(db, get_runner(), influx_line_writer(get_influx_client(), handler="forecast"),
+                         workers=workers)
+        finally:
+            db.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Refit production forecasts for every inverter")
+    parser.add_argument("--workers", type=int, default=FORECAST_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"{ForecastJob(SessionLocal).run_once(workers=args.workers)} inverters forecast")
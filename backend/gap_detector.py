@@ -0,0 +1,292 @@
+# backend/gap_detector.py
+"""Detection and re-fetch of holes in each inverter's ``inverter_status`` series.
+
+Scrapers poll on a fixed interval and a failed poll leaves no trace in InfluxDB. The
+detector asks InfluxDB for the number of points per poll-interval window (one Flux query
+per batch of inverters sharing an interval), records every run of at least ``GAP_FACTOR``
+empty windows as a TelemetryGap and then fills open gaps from the SEMS daily power chart.
+That chart is the total of a whole station, so it only stands in for an inverter's own
+``current_power`` when the inverter is the only one at its station.
+
+Points carry the ``inverter_id`` tag only for inverters with an ``inverter_sn`` (the serial the
+account scraper fans its sweep out on), so inverters without one are not scanned.
+"""
+import logging
+import os
+import threading
+import zoneinfo
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backfill import BACKFILL_RATE, RateLimiter, chart_columns, date_range, influx_line_writer
+from flux_query import FluxRunner, INVERTER_WINDOW_COUNTS, get_influx_client, get_runner
+from line_protocol import serialize_columns
+from models import Inverter, TelemetryGap
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background scans; 0 disables the detector
+GAP_SCAN_INTERVAL = int(os.getenv("GAP_SCAN_INTERVAL", "900"))
+# A gap is at least this many consecutive poll intervals without a point
+GAP_FACTOR = int(os.getenv("GAP_FACTOR", "3"))
+GAP_LOOKBACK_HOURS = int(os.getenv("GAP_LOOKBACK_HOURS", "48"))
+GAP_MAX_ATTEMPTS = 3
+QUERY_BATCH = 200
+
+Window = Tuple[datetime, int]  # (window stop, point count)
+
+def window_counts(runner: FluxRunner, inverter_ids: List[int], interval: int,
+                  start: datetime, stop: datetime) -> Dict[int, List[Window]]:
+    """current_power point count per ``interval`` window for each inverter id.
+
+    Inverters without a single point in range are absent.
+    """
+    windows: Dict[int, List[Window]] = {}
+    rows = runner.rows(INVERTER_WINDOW_COUNTS, start, stop, inverter_ids=[str(i) for i in inverter_ids],
+                       every=f"{interval}s")
+    for row in rows:
+        inverter_id = int(row["inverter_id"])
+        stop_time = row["_time"].astimezone(timezone.utc).replace(tzinfo=None)
+        windows.setdefault(inverter_id, []).append((stop_time, int(row.get("_value") or 0)))
+    for series in windows.values():
+        series.sort()
+    return windows
+
+def find_gaps(windows: List[Window], interval: int, factor: int = GAP_FACTOR) -> List[Tuple[datetime, datetime]]:
+    """(start, end) of every run of at least ``factor`` empty windows"""
+    if not windows:
+        return []
+    stops = np.array([stop for stop, _ in windows], dtype="datetime64[us]")
+    empty = np.array([count == 0 for _, count in windows])
+    # Run boundaries of the empty mask: starts where it turns on, ends where it turns off
+    edges = np.diff(np.concatenate(([False], empty, [False])).astype(np.int8))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    step = timedelta(seconds=interval)
+    return [
+        (stops[first].astype(datetime) - step, stops[last - 1].astype(datetime))
+        for first, last in zip(starts, ends) if last - first >= factor
+    ]
+
+def completeness(windows: List[Window]) -> float:
+    """Percentage of windows holding at least one point"""
+    if not windows:
+        return 0.0
+    return round(100.0 * sum(1 for _, count in windows if count) / len(windows), 2)
+
+def inverter_windows(inverter: Inverter, windows: Optional[List[Window]], start: datetime,
+                     stop: datetime) -> List[Window]:
+    """Windows the inverter existed for; a missing series counts as all-empty"""
+    interval = inverter.interval or 300
+    since = max(start, inverter.created_at or start)
+    if windows is None:
+        count = int((stop - since).total_seconds() // interval)
+        return [(since + timedelta(seconds=interval * (i + 1)), 0) for i in range(count)]
+    return [(window_stop, count) for window_stop, count in windows
+            if window_stop - timedelta(seconds=interval) >= since]
+
+def record_gaps(db: Session, inverter: Inverter, gaps: List[Tuple[datetime, datetime]]) -> int:
+    """Store newly found gaps; an open gap that grew is extended. Returns gaps added"""
+    if not gaps:
+        return 0
+    known = db.query(TelemetryGap).filter(
+        TelemetryGap.inverter_id == inverter.id, TelemetryGap.end >= gaps[0][0]
+    ).all()
+    added = 0
+    for start, end in gaps:
+        overlapping = [gap for gap in known if gap.start < end and start < gap.end]
+        if not overlapping:
+            gap = TelemetryGap(inverter_id=inverter.id, start=start, end=end, status="open")
+            db.add(gap)
+            known.append(gap)
+            added += 1
+            continue
+        # Re-fetched windows stay coarser than the poll interval, so anything overlapping a
+        # resolved gap is not reported again
+        for gap in overlapping:
+            if gap.status == "open" and end > gap.end:
+                gap.end = end
+    return added
+
+def untracked_gaps(db: Session, inverter_ids: List[int], now: datetime) -> int:
+    """Mark open gaps of inverters without a serial unfillable. Returns gaps closed"""
+    if not inverter_ids:
+        return 0
+    return db.query(TelemetryGap).filter(
+        TelemetryGap.inverter_id.in_(inverter_ids), TelemetryGap.status == "open"
+    ).update({TelemetryGap.status: "unfillable", TelemetryGap.resolved_at: now}, synchronize_session=False)
+
+def scan(db: Session, runner: FluxRunner, now: Optional[datetime] = None,
+         inverters: Optional[List[Inverter]] = None, record: bool = True) -> Dict[int, Optional[float]]:
+    """Detect (and optionally record) gaps; returns completeness per inverter id.
+
+    Inverters without an ``inverter_sn`` have no tagged series to count: their completeness
+    is None and no gaps are recorded for them.
+    """
+    now = now or datetime.utcnow()
+    start = now - timedelta(hours=GAP_LOOKBACK_HOURS)
+    if inverters is None:
+        inverters = db.query(Inverter).filter(Inverter.status == "active").all()
+
+    result: Dict[int, Optional[float]] = {}
+    by_interval: Dict[int, List[Inverter]] = {}
+    for inverter in inverters:
+        if inverter.inverter_sn:
+            by_interval.setdefault(inverter.interval or 300, []).append(inverter)
+        else:
+            result[inverter.id] = None
+
+    added = 0
+    for interval, group in by_interval.items():
+        for offset in range(0, len(group), QUERY_BATCH):
+            batch = group[offset:offset + QUERY_BATCH]
+            counts = window_counts(runner, [inverter.id for inverter in batch], interval, start, now)
+            for inverter in batch:
+                windows = inverter_windows(inverter, counts.get(inverter.id), start, now)
+                result[inverter.id] = completeness(windows)
+                if record:
+                    added += record_gaps(db, inverter, find_gaps(windows, interval))
+    if record:
+        untracked = [inverter_id for inverter_id, value in result.items() if value is None]
+        closed = untracked_gaps(db, untracked, now)
+        db.commit()
+        logger.info(f"Gap scan: {len(result) - len(untracked)} inverter(s), {added} new gap(s)"
+                    + (f", {closed} gap(s) of inverters without a serial closed" if closed else ""))
+    return result
+
+def gap_days(gap: TelemetryGap, tz: zoneinfo.ZoneInfo) -> List[date]:
+    """Local days touched by a gap stored in naive UTC"""
+    first = gap.start.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    last = gap.end.replace(tzinfo=timezone.utc).astimezone(tz).date()
+    return date_range(first, last)
+
+def gap_lines(gap: TelemetryGap, inverter: Inverter, charts: Dict[date, List[Dict]],
+              tz: zoneinfo.ZoneInfo) -> List[str]:
+    """inverter_status current_power lines for the chart points inside the gap"""
+    start_ns = int(gap.start.replace(tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+    end_ns = int(gap.end.replace(tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+    lines = []
+    for day, chart in charts.items():
+        if not chart:
+            continue
+        timestamps, power = chart_columns(chart, day, tz)
+        inside = (timestamps > start_ns) & (timestamps < end_ns)
+        rows = int(inside.sum())
+        if not rows:
+            continue
+        lines.extend(serialize_columns(
+            "inverter_status",
+            {"inverter_id": [str(inverter.id)] * rows, "inverter_sn": [inverter.inverter_sn or ""] * rows,
+             "source": ["refetch"] * rows},
+            {"current_power": power[inside]},
+            timestamps[inside]
+        ))
+    return lines
+
+def shared_stations(db: Session, station_ids: Iterable[str]) -> Set[str]:
+    """Stations with more than one inverter, whose chart is no single inverter's power"""
+    station_ids = set(station_ids)
+    if not station_ids:
+        return set()
+    return {station_id for station_id, in db.query(Inverter.power_station_id).filter(
+        Inverter.power_station_id.in_(station_ids)
+    ).group_by(Inverter.power_station_id).having(func.count(Inverter.id) > 1)}
+
+def refetch_gaps(db: Session, client_factory: Callable, write_lines: Callable[[List[str]], None],
+                 rate: float = BACKFILL_RATE) -> int:
+    """Fill open gaps from the portal history, one login per account. Returns gaps filled.
+
+    Gaps of inverters without a station, or sharing theirs with other inverters, are unfillable.
+    """
+    gaps = db.query(TelemetryGap).join(Inverter).filter(
+        TelemetryGap.status == "open", TelemetryGap.attempts < GAP_MAX_ATTEMPTS
+    ).order_by(TelemetryGap.start).all()
+
+    by_account: Dict[Optional[int], List[TelemetryGap]] = {}
+    for gap in gaps:
+        by_account.setdefault(gap.inverter.account_id, []).append(gap)
+
+    shared = shared_stations(db, {gap.inverter.power_station_id for gap in gaps if gap.inverter.power_station_id})
+    limiter = RateLimiter(rate)
+    filled = 0
+    now = datetime.utcnow()
+    for account_gaps in by_account.values():
+        client = None
+        for gap in account_gaps:
+            inverter = gap.inverter
+            if not inverter.power_station_id or inverter.power_station_id in shared:
+                gap.status = "unfillable"
+                gap.resolved_at = now
+                continue
+            if client is None:
+                account = inverter.account
+                client = client_factory(account.username if account else inverter.sems_username,
+                                        account.password if account else inverter.sems_password)
+            gap.attempts = (gap.attempts or 0) + 1
+            tz = zoneinfo.ZoneInfo(inverter.timezone or "UTC")
+
+            charts = {}
+            for day in gap_days(gap, tz):
+                limiter.acquire()
+                charts[day] = client.get_plant_power_chart(inverter.power_station_id, day.isoformat())
+            if any(chart is None for chart in charts.values()):
+                if gap.attempts >= GAP_MAX_ATTEMPTS:
+                    gap.status = "failed"
+                    gap.resolved_at = now
+                continue
+
+            lines = gap_lines(gap, inverter, charts, tz)
+            if lines:
+                write_lines(lines)
+                gap.status = "filled"
+                gap.points_refetched = len(lines)
+                filled += 1
+            else:
+                gap.status = "unfillable"
+            gap.resolved_at = now
+        db.commit()
+    if gaps:
+        logger.info(f"Gap re-fetch: {filled} of {len(gaps)} gap(s) filled")
+    return filled
+
+class GapDetector:
+    """Background thread running scan + re-fetch every ``GAP_SCAN_INTERVAL`` seconds"""
+
+    def __init__(self, session_factory, interval: int = GAP_SCAN_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="gap-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        # First pass after one interval so startup stays cheap
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Gap detection failed: {e}")
+
+    def run_once(self) -> None:
+        from inverters.goodwe_sems import GoodWeSEMSClient
+
+        db = self.session_factory()
+        try:
+            scan(db, get_runner())
+            refetch_gaps(db, GoodWeSEMSClient, influx_line_writer(get_influx_client()))
+        finally:
+            db.close()
@@ -1,5 +1,6 @@
 import json
 import os
+from functools import lru_cache
 
 def load_influx_config():
     try:
@@ -14,4 +15,21 @@ def load_influx_config():
             "bucket": "solar-bucket"
         }
 
-INFLUX_CONFIG = load_influx_config() 
\ No newline at end of file
+# Environment variables (as set in docker-compose.yml) take precedence over the file
+ENV_OVERRIDES = {
+    "url": "INFLUXDB_URL",
+    "token": "INFLUXDB_TOKEN",
+    "org": "INFLUXDB_ORG",
+    "bucket": "INFLUXDB_BUCKET"
+}
+
+def apply_env_overrides(config):
+    for key, env_var in ENV_OVERRIDES.items():
+        if os.getenv(env_var):
+            config[key] = os.getenv(env_var)
+    return config
+
+@lru_cache(maxsize=None)
+def get_influx_config():
+    """Loaded on first use rather than at import"""
+    return apply_env_overrides(load_influx_config())
@@ -1,14 +1,79 @@
 from influxdb_client import InfluxDBClient, Point
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from flux import site_timezone
+from flux_cache import FluxResultCache, get_flux_cache
+from flux_query import FluxRunner, HOME_METRICS_SERIES, POWER_GENERATION_DEVICE, POWER_GENERATION_ENERGY
+
+def _online(status: str) -> float:
+    return 1.0 if status == "Online" else 0.0
+
+@dataclass(frozen=True)
+class MeasurementSchema:
+    """Tag and field layout of one measurement.
+
+    Every distinct tag combination is a separate series, so only keys with a bounded value
+    set that queries filter or group by are tags; everything else is a field.
+    """
+    name: str
+    tags: Tuple[str, ...]
+    fields: Tuple[str, ...]
+    # Tags of earlier layouts: tag -> (field it becomes, value converter), or None to drop it
+    legacy_tags: Dict[str, Optional[Tuple[str, Callable[[str], float]]]] = field(default_factory=dict)
+    # Legacy tag every old-layout point carries; its values select old points for rewrite and delete
+    legacy_marker: Optional[str] = None
+
+SCHEMAS: Dict[str, MeasurementSchema] = {schema.name: schema for schema in (
+    # status used to be a tag (splitting each inverter's series on every flip) and every
+    # write carried a random collection_id; names live in Postgres
+    MeasurementSchema(
+        "inverter_status",
+        tags=("inverter_id", "inverter_sn", "source"),
+        fields=("current_power", "daily_energy", "monthly_energy", "total_energy", "total_hours", "online"),
+        legacy_tags={"status": ("online", _online), "collection_id": None, "inverter_name": None},
+        legacy_marker="status",
+    ),
+    # A station's chart is the same for each of its inverters; backfills used to tag it with the
+    # inverter they ran for, writing one copy per inverter
+    MeasurementSchema(
+        "station_power",
+        tags=("power_station_id", "source"),
+        fields=("power",),
+        legacy_tags={"inverter_id": None},
+        legacy_marker="inverter_id",
+    ),
+    MeasurementSchema(
+        "peer_performance",
+        tags=("inverter_sn", "property_id"),
+        fields=("ratio", "yield", "peer_yield", "peers", "underperforming"),
+    ),
+    MeasurementSchema(
+        "forecast",
+        tags=("inverter_sn", "property_id"),
+        fields=("energy_kwh", "baseline_kwh"),
+    ),
+    MeasurementSchema(
+        "power_generation",
+        tags=("property_id", "user_id", "device_id"),
+        fields=("power_generation", "earning", "used"),
+    ),
+    MeasurementSchema(
+        "home_metrics",
+        tags=("property_id", "user_id"),
+        fields=("producing", "consuming", "charging", "exporting", "climate", "rain_percentage"),
+    ),
+)}
 
 class InfluxManager:
-    def __init__(self, url: str, token: str, org: str, bucket: str):
+    def __init__(self, url: str, token: str, org: str, bucket: str, cache: Optional[FluxResultCache] = None):
         self.client = InfluxDBClient(url=url, token=token, org=org)
         self.write_api = self.client.write_api()
         self.query_api = self.client.query_api()
         self.bucket = bucket
         self.org = org
+        self.runner = FluxRunner(self.query_api, bucket, org, cache or get_flux_cache())
 
     def write_power_generation(self, data: Dict[str, Any]):
         """
@@ -64,45 +129,29 @@ class InfluxManager:
         
         self.write_api.write(bucket=self.bucket, record=point)
 
-    def get_daily_power_generation(self, property_id: int, start_time: datetime, end_time: datetime = None):
-        """Get daily power generation data for a property"""
+    def get_daily_power_generation(self, property_id: int, start_time: datetime, end_time: datetime = None,
+                                   timezone: str = "UTC") -> List[Dict[str, Any]]:
+        """Get daily power generation data for a property.
+
+        The fields are running "today" totals, so each day is the sum of counter deltas
+        rather than of the raw samples. Days run from local midnight in ``timezone``.
+        """
         if end_time is None:
             end_time = datetime.utcnow()
 
-        query = f'''
-        from(bucket: "{self.bucket}")
-            |> range(start: {start_time.isoformat()}, stop: {end_time.isoformat()})
-            |> filter(fn: (r) => r["_measurement"] == "power_generation")
-            |> filter(fn: (r) => r["property_id"] == "{str(property_id)}")
-            |> aggregateWindow(every: 1d, fn: sum)
-        '''
-        
-        return self.query_api.query(query, org=self.org)
+        return self.runner.rows(POWER_GENERATION_ENERGY, start_time, end_time, property_id=str(property_id),
+                                every="1d", timezone=site_timezone(timezone).key)
 
-    def get_home_metrics(self, property_id: int, start_time: datetime, end_time: datetime = None):
-        """Get home metrics data for a property"""
+    def get_home_metrics(self, property_id: int, start_time: datetime, end_time: datetime = None) -> List[Dict[str, Any]]:
+        """Home metrics records for a property, served from the Flux result cache"""
         if end_time is None:
             end_time = datetime.utcnow()
 
-        query = f'''
-        from(bucket: "{self.bucket}")
-            |> range(start: {start_time.isoformat()}, stop: {end_time.isoformat()})
-            |> filter(fn: (r) => r["_measurement"] == "home_metrics")
-            |> filter(fn: (r) => r["property_id"] == "{str(property_id)}")
-        '''
-        
-        return self.query_api.query(query, org=self.org)
+        return self.runner.rows(HOME_METRICS_SERIES, start_time, end_time, property_id=str(property_id))
 
-    def get_device_metrics(self, device_id: str, start_time: datetime, end_time: datetime = None):
-        """Get device-specific metrics"""
+    def get_device_metrics(self, device_id: str, start_time: datetime, end_time: datetime = None) -> List[Dict[str, Any]]:
+        """Device-specific records, served from the Flux result cache"""
         if end_time is None:
             end_time = datetime.utcnow()
 
-        query = f'''
-        from(bucket: "{self.bucket}")
-            |> range(start: {start_time.isoformat()}, stop: {end_time.isoformat()})
-            |> filter(fn: (r) => r["_measurement"] == "power_generation")
-            |> filter(fn: (r) => r["device_id"] == "{device_id}")
-        '''
-        
-        return self.query_api.query(query, org=self.org) 
\ No newline at end of file
+        return self.runner.rows(POWER_GENERATION_DEVICE, start_time, end_time, device_id=device_id)
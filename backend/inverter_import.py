@@ -0,0 +1,46 @@
+# backend/inverter_import.py
+"""Parsing helpers for bulk inverter onboarding (POST /inverters/import)."""
+import csv
+import io
+import json
+from typing import Any, Dict, List
+
+MAX_IMPORT_ROWS = 10000
+
+def parse_inverter_file(filename: str, content: bytes) -> List[Dict[str, Any]]:
+    """Rows of a CSV (header line required) or JSON array file of inverter definitions.
+
+    Empty CSV cells are dropped so model defaults apply. Raises ValueError when the file
+    itself cannot be read; per-row problems are left to row validation.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("File must be UTF-8 encoded")
+
+    if filename.lower().endswith(".json") or text.lstrip().startswith("["):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise ValueError("JSON import must be an array of inverter objects")
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise ValueError("CSV import needs a header row")
+        rows = [
+            {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+            for row in reader
+        ]
+
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError(f"Too many rows ({len(rows)}), the limit is {MAX_IMPORT_ROWS}")
+    return rows
+
+def validation_errors(exc) -> List[Dict[str, str]]:
+    """Pydantic ValidationError as the same {field, message} shape as ConfigError"""
+    return [
+        {"field": ".".join(str(part) for part in error["loc"]), "message": error["msg"]}
+        for error in exc.errors()
+    ]
@@ -1,22 +1,53 @@
 import requests
 import json
 import logging
+import threading
+import time
+import numpy as np
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional
+
+from line_protocol import to_float_column, serialize_columns
 
 logger = logging.getLogger(__name__)
 
+# Standardized field -> raw SEMS monitor detail key
+TRANSFORM_FIELDS = {
+    "power_generation": "power",
+    "earning": "money",
+    "used": "used",
+    "producing": "current_power",
+    "consuming": "home_consumption",
+    "charging": "battery_charging",
+    "exporting": "grid_export",
+}
+
+# inverter_status field -> raw GetInverterAllPoint key
+INVERTER_POINT_FIELDS = {
+    "current_power": "out_pac",
+    "daily_energy": "eday",
+    "monthly_energy": "emonth",
+    "total_energy": "etotal",
+    "total_hours": "hTotal",
+}
+
 class GoodWeSEMSClient:
     LOGIN_URL = "https://www.semsportal.com/api/v2/Common/CrossLogin"
     POWER_STATION_URL = "/v2/PowerStation/GetMonitorDetailByPowerstationId"
     POWER_CONTROL_URL = "https://www.semsportal.com/api/PowerStation/SaveRemoteControlInverter"
+    POWER_CHART_URL = "/v2/Charts/GetPlantPowerChart"
+    INVERTER_POINTS_URL = "/v3/PowerStation/GetInverterAllPoint"
     REQUEST_TIMEOUT = 30
 
-    def __init__(self, username: str, password: str):
+    def __init__(self, username: str, password: str, base_url: Optional[str] = None):
         self.username = username
         self.password = password
         self.token = None
         self.api_url = None
+        # Overrides the global login endpoint, e.g. to point at a fake portal
+        self.login_url = f"{base_url}/v2/Common/CrossLogin" if base_url else self.LOGIN_URL
+        self.control_url = f"{base_url}/PowerStation/SaveRemoteControlInverter" if base_url else self.POWER_CONTROL_URL
+        self._login_lock = threading.Lock()
 
     def _get_default_headers(self) -> Dict[str, str]:
         return {
@@ -55,7 +86,7 @@ class GoodWeSEMSClient:
             }
 
             response = requests.post(
-                self.LOGIN_URL,
+                self.login_url,
                 headers=self._get_default_headers(),
                 json=login_data,
                 timeout=self.REQUEST_TIMEOUT
@@ -108,16 +139,69 @@ class GoodWeSEMSClient:
             logger.error(f"Error getting power station data: {str(e)}")
             return None
 
+    def _relogin(self, stale_token) -> bool:
+        """Log in again unless another thread already replaced ``stale_token``"""
+        with self._login_lock:
+            if self.token is not stale_token:
+                return True
+            return self.login()
+
+    def get_plant_power_chart(self, power_station_id: str, date: str, max_retries: int = 2) -> Optional[List[Dict[str, Any]]]:
+        """Power curve for one local day (YYYY-MM-DD) as [{"x": "HH:MM", "y": watts}, ...].
+
+        Returns an empty list for days without data and None when the request failed.
+        Safe to call from many threads; an expired token is refreshed once for all of them.
+        """
+        if max_retries <= 0:
+            logger.error("Maximum retries reached")
+            return None
+
+        try:
+            token = self.token
+            if not token:
+                if not self._relogin(token):
+                    return None
+                token = self.token
+
+            response = requests.post(
+                f"{self.api_url}{self.POWER_CHART_URL}",
+                headers=self._get_auth_headers(),
+                json={"id": power_station_id, "date": date, "full_script": False},
+                timeout=self.REQUEST_TIMEOUT
+            )
+            response.raise_for_status()
+
+            data = response.json()
+            if data.get("hasError") or data.get("msg") != "success":
+                # Token might be expired, try to login again
+                if self._relogin(token):
+                    return self.get_plant_power_chart(power_station_id, date, max_retries - 1)
+                return None
+
+            lines = (data.get("data") or {}).get("lines") or []
+            power = next((line for line in lines if line.get("key") == "PCurve_Power_PV"), lines[0] if lines else None)
+            return power.get("xy", []) if power else []
+
+        except Exception as e:
+            logger.error(f"Error getting power chart for {date}: {str(e)}")
+            return None
+
     def control_inverter(self, inverter_sn: str, status: bool, max_retries: int = 2) -> bool:
-        """Control inverter status (on/off)"""
+        """Switch an inverter on or off. True once the portal accepted the command.
+
+        Acceptance does not mean the inverter has switched; read its status back to confirm.
+        Safe to call from many threads; an expired token is refreshed once for all of them.
+        """
         if max_retries <= 0:
             logger.error("Maximum retries reached")
             return False
 
         try:
-            if not self.token:
-                if not self.login():
+            token = self.token
+            if not token:
+                if not self._relogin(token):
                     return False
+                token = self.token
 
             data = {
                 "InverterSN": inverter_sn,
@@ -126,15 +210,18 @@ class GoodWeSEMSClient:
             }
 
             response = requests.post(
-                self.POWER_CONTROL_URL,
+                self.control_url,
                 headers=self._get_auth_headers(),
                 json=data,
                 timeout=self.REQUEST_TIMEOUT
             )
             response.raise_for_status()
 
-            if response.status_code != 200:
-                if self.login():
+            result = response.json()
+            if result.get("hasError"):
+                logger.warning(f"Control of {inverter_sn} rejected: {result.get('msg')}")
+                # Token might be expired, try to login again
+                if self._relogin(token):
                     return self.control_inverter(inverter_sn, status, max_retries - 1)
                 return False
 
@@ -144,21 +231,85 @@ class GoodWeSEMSClient:
             logger.error(f"Error controlling inverter: {str(e)}")
             return False
 
+    def get_inverter_points(self, power_station_id: str, max_retries: int = 2) -> Optional[List[Dict[str, Any]]]:
+        """Current ``inverterPoints`` of a station (``status`` 1 is online), None when the request failed"""
+        if max_retries <= 0:
+            logger.error("Maximum retries reached")
+            return None
+
+        try:
+            token = self.token
+            if not token:
+                if not self._relogin(token):
+                    return None
+                token = self.token
+
+            response = requests.post(
+                f"{self.api_url}{self.INVERTER_POINTS_URL}",
+                headers=self._get_auth_headers(),
+                json={"powerStationId": power_station_id},
+                timeout=self.REQUEST_TIMEOUT
+            )
+            response.raise_for_status()
+
+            data = response.json()
+            if data.get("hasError") or data.get("msg") != "success":
+                # Token might be expired, try to login again
+                if self._relogin(token):
+                    return self.get_inverter_points(power_station_id, max_retries - 1)
+                return None
+
+            return (data.get("data") or {}).get("inverterPoints") or []
+
+        except Exception as e:
+            logger.error(f"Error getting inverter points for {power_station_id}: {str(e)}")
+            return None
+
     def transform_data(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
         """Transform raw SEMS data into standardized format"""
         try:
             # Extract relevant data from the raw response
             # This will need to be adjusted based on the actual SEMS API response structure
-            return {
-                "power_generation": float(raw_data.get("power", 0)),
-                "earning": float(raw_data.get("money", 0)),
-                "used": float(raw_data.get("used", 0)),
-                "producing": float(raw_data.get("current_power", 0)),
-                "consuming": float(raw_data.get("home_consumption", 0)),
-                "charging": float(raw_data.get("battery_charging", 0)),
-                "exporting": float(raw_data.get("grid_export", 0)),
-                "timestamp": datetime.utcnow()
-            }
+            data = {field: float(raw_data.get(key, 0)) for field, key in TRANSFORM_FIELDS.items()}
+            data["timestamp"] = datetime.utcnow()
+            return data
         except Exception as e:
             logger.error(f"Error transforming data: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def transform_batch(raw_responses: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Transform many raw SEMS responses into float64 columns keyed by standardized field.
+
+        Missing or unparseable values become NaN instead of failing the whole batch.
+        """
+        return {
+            field: to_float_column([raw.get(key) for raw in raw_responses])
+            for field, key in TRANSFORM_FIELDS.items()
+        }
+
+
+def inverter_points_to_columns(responses: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Flatten GetInverterAllPoint payloads into tag lists and float64 field columns.
+
+    The layout follows ``influx_schema.SCHEMAS["inverter_status"]``.
+    """
+    points = [point for response in responses if response for point in response.get("inverterPoints", [])]
+    return {
+        "tags": {
+            "inverter_sn": [point.get("sn", "") for point in points],
+        },
+        "fields": {
+            **{field: to_float_column([point.get(key, 0) for point in points])
+               for field, key in INVERTER_POINT_FIELDS.items()},
+            "online": np.array([1.0 if point.get("status") == 1 else 0.0 for point in points]),
+        },
+    }
+
+
+def inverter_points_to_line_protocol(responses: Iterable[Dict[str, Any]], timestamp_ns: Optional[int] = None) -> List[str]:
+    """Serialize GetInverterAllPoint payloads into inverter_status line protocol in one pass"""
+    columns = inverter_points_to_columns(responses)
+    rows = len(columns["tags"]["inverter_sn"])
+    timestamps = np.full(rows, timestamp_ns if timestamp_ns is not None else time.time_ns(), dtype=np.int64)
+    return serialize_columns("inverter_status", columns["tags"], columns["fields"], timestamps) 
\ No newline at end of file
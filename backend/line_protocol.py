@@ -0,0 +1,173 @@
+# backend/line_protocol.py
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Same escaping rules the influxdb-client Point builder applies
+_ESCAPE_MEASUREMENT = str.maketrans({",": r"\,", " ": r"\ ", "\n": r"\n", "\r": r"\r", "\t": r"\t"})
+_ESCAPE_KEY = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ ", "\n": r"\n", "\r": r"\r", "\t": r"\t"})
+
+
+def escape_tag(value: str) -> str:
+    """Escape a tag key or value for line protocol"""
+    escaped = str(value).translate(_ESCAPE_KEY)
+    if escaped.endswith("\\"):
+        escaped += " "
+    return escaped
+
+
+def to_float_column(values: Sequence) -> np.ndarray:
+    """Convert raw JSON values (numbers, numeric strings, None) into a float64 array.
+
+    Values that cannot be parsed become NaN and are dropped at serialization time.
+    """
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        column = np.empty(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                column[i] = np.nan
+        return column
+
+
+def _format_column(column: np.ndarray) -> List[str]:
+    """Format a float column the way the Point builder does (shortest repr, no trailing .0)"""
+    return [text[:-2] if text.endswith(".0") else text for text in map(repr, column.tolist())]
+
+
+def serialize_columns(measurement: str, tags: Dict[str, Sequence[str]], fields: Dict[str, np.ndarray],
+                      timestamps: np.ndarray) -> List[str]:
+    """Serialize a columnar batch of points into line protocol (nanosecond precision).
+
+    ``tags`` maps tag keys to per-row string values, ``fields`` maps field keys to float64
+    arrays and ``timestamps`` is an int64 array of epoch nanoseconds. Empty tag values and
+    non-finite field values are skipped, matching the Point builder; rows without any
+    finite field are dropped.
+    """
+    rows = len(timestamps)
+    if rows == 0:
+        return []
+
+    # Tag sets: escape each distinct value once, then build every row's series key column-wise
+    measurement = measurement.translate(_ESCAPE_MEASUREMENT)
+    prefixes = [measurement] * rows
+    escaped = {}
+    for key in sorted(tags):
+        tag_key = f",{escape_tag(key)}="
+        column = []
+        for value in tags[key]:
+            if value is None or value == "":
+                column.append("")
+                continue
+            part = escaped.get(value)
+            if part is None:
+                part = escaped[value] = escape_tag(value)
+            column.append(tag_key + part)
+        prefixes = [prefix + part for prefix, part in zip(prefixes, column)]
+
+    field_keys = sorted(fields)
+    matrix = np.column_stack([fields[key] for key in field_keys]).astype(np.float64, copy=False)
+    finite = np.isfinite(matrix)
+    formatted = [_format_column(matrix[:, i]) for i in range(len(field_keys))]
+    times = np.asarray(timestamps, dtype=np.int64).tolist()
+
+    # Fast path: one format template for every row whose fields are all finite
+    template = "%s " + ",".join(f"{escape_tag(key)}=%s" for key in field_keys) + " %d"
+    all_finite = finite.all(axis=1)
+    if all_finite.all():
+        return [template % row for row in zip(prefixes, *formatted, times)]
+
+    lines = []
+    escaped_keys = [escape_tag(key) for key in field_keys]
+    for i in np.flatnonzero(finite.any(axis=1)).tolist():
+        if all_finite[i]:
+            lines.append(template % (prefixes[i], *(column[i] for column in formatted), times[i]))
+            continue
+        fieldset = ",".join(
+            f"{key}={column[i]}" for key, column, ok in zip(escaped_keys, formatted, finite[i]) if ok
+        )
+        lines.append(f"{prefixes[i]} {fieldset} {times[i]}")
+    return lines
+
+
+_UNESCAPE = {"n": "\n", "r": "\r", "t": "\t"}
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    chars = []
+    i = 0
+    while i < len(text):
+        if text[i] == "\\" and i + 1 < len(text):
+            chars.append(_UNESCAPE.get(text[i + 1], text[i + 1]))
+            i += 2
+            continue
+        chars.append(text[i])
+        i += 1
+    return "".join(chars)
+
+
+def _split(text: str, separator: str) -> List[str]:
+    """Split on ``separator`` outside backslash escapes and double-quoted field strings"""
+    if "\\" not in text and '"' not in text:
+        return text.split(separator)
+    parts, current, quoted, i = [], [], False, 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and i + 1 < len(text):
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif char == separator and not quoted:
+            parts.append("".join(current))
+            current = []
+            i += 1
+            continue
+        current.append(char)
+        i += 1
+    parts.append("".join(current))
+    return parts
+
+
+def _pair(text: str) -> Tuple[str, str]:
+    key, *value = _split(text, "=")
+    return _unescape(key), "=".join(value)
+
+
+def _field_value(text: str):
+    if not text:
+        raise ValueError("Empty field value")
+    if text.startswith('"'):
+        if len(text) < 2 or not text.endswith('"'):
+            raise ValueError(f"Unterminated string field value: {text!r}")
+        return _unescape(text[1:-1])
+    if text[-1] in "iu" and text[:-1].lstrip("-").isdigit():
+        return int(text[:-1])
+    if text in ("t", "T", "true", "True", "TRUE"):
+        return True
+    if text in ("f", "F", "false", "False", "FALSE"):
+        return False
+    return float(text)
+
+
+def parse_line(line: str) -> Tuple[str, Dict[str, str], Dict[str, Any], Optional[int]]:
+    """Parse one line of line protocol into (measurement, tags, fields, epoch ns or None)"""
+    sections = _split(line.strip(), " ")
+    if len(sections) not in (2, 3):
+        raise ValueError(f"Malformed line protocol: {line!r}")
+    series = _split(sections[0], ",")
+    tags = {}
+    for pair in series[1:]:
+        key, value = _pair(pair)
+        tags[key] = _unescape(value)
+    fields = {}
+    for pair in _split(sections[1], ","):
+        key, value = _pair(pair)
+        fields[key] = _field_value(value)
+    timestamp = int(sections[2]) if len(sections) == 3 else None
+    return _unescape(series[0]), tags, fields, timestamp
@@ -0,0 +1,107 @@
+"""Prometheus metrics for the backend API, Influx access and Docker operations.
+
+Everything is registered on the default registry and served by ``GET /metrics``.
+"""
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Influx and HTTP calls sit in the milliseconds, Docker builds take minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DOCKER_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "solar_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+INFLUX_QUERY_SECONDS = Histogram(
+    "solar_influx_query_duration_seconds",
+    "Flux query latency by API handler",
+    ["handler"],
+    buckets=LATENCY_BUCKETS,
+)
+INFLUX_QUERY_ERRORS = Counter(
+    "solar_influx_query_errors_total",
+    "Flux queries that raised, by API handler",
+    ["handler"],
+)
+INFLUX_WRITE_SECONDS = Histogram(
+    "solar_influx_write_duration_seconds",
+    "InfluxDB write latency by API handler",
+    ["handler"],
+    buckets=LATENCY_BUCKETS,
+)
+POINTS_WRITTEN = Counter(
+    "solar_influx_points_written_total",
+    "Points written to InfluxDB by API handler",
+    ["handler"],
+)
+FLUX_CACHE_CHUNKS = Counter(
+    "solar_flux_cache_chunks_total",
+    "Flux result cache chunk lookups by outcome (hit, shared_hit, refresh, miss)",
+    ["outcome"],
+)
+ALERT_TRANSITIONS = Counter(
+    "solar_alert_transitions_total",
+    "Alerts opened and resolved, by rule",
+    ["rule", "status"],
+)
+CONTROL_COMMANDS = Counter(
+    "solar_control_commands_total",
+    "Remote control commands by action and final status (confirmed, unconfirmed, failed)",
+    ["action", "status"],
+)
+DOCKER_OPERATION_SECONDS = Histogram(
+    "solar_docker_operation_duration_seconds",
+    "Docker API latency by operation",
+    ["operation"],
+    buckets=DOCKER_BUCKETS,
+)
+DOCKER_OPERATION_ERRORS = Counter(
+    "solar_docker_operation_errors_total",
+    "Docker API calls that raised, by operation",
+    ["operation"],
+)
+
+
+class timed:
+    """Observe the block's duration on ``histogram`` and count exceptions on ``errors``"""
+
+    def __init__(self, histogram, errors=None, **labels):
+        self.histogram = histogram.labels(**labels)
+        self.errors = errors.labels(**labels) if errors is not None else None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc()
+        return False
+
+
+async def metrics_middleware(request: Request, call_next):
+    """Record request latency labelled by route template rather than raw path"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        ).observe(time.perf_counter() - start)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,39 @@
+"""Add alerts
+
+Revision ID: add_alerts
+Revises: add_property_timezones
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_alerts'
+down_revision = 'add_property_timezones'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'alerts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('inverter_id', sa.Integer(), nullable=False),
+        sa.Column('rule', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('message', sa.String(), nullable=True),
+        sa.Column('value', sa.Float(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('resolved_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['inverter_id'], ['inverters.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_alerts_id'), 'alerts', ['id'], unique=False)
+    op.create_index(op.f('ix_alerts_inverter_id'), 'alerts', ['inverter_id'], unique=False)
+    op.create_index(op.f('ix_alerts_status'), 'alerts', ['status'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_alerts_status'), table_name='alerts')
+    op.drop_index(op.f('ix_alerts_inverter_id'), table_name='alerts')
+    op.drop_index(op.f('ix_alerts_id'), table_name='alerts')
+    op.drop_table('alerts')
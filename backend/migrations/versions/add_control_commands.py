@@ -0,0 +1,45 @@
+"""Add control commands
+
+Revision ID: add_control_commands
+Revises: add_alerts
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_control_commands'
+down_revision = 'add_alerts'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'control_commands',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('inverter_id', sa.Integer(), nullable=False),
+        sa.Column('batch_id', sa.String(), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('idempotency_key', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['inverter_id'], ['inverters.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key', 'inverter_id', name='uq_control_commands_key_inverter')
+    )
+    op.create_index(op.f('ix_control_commands_id'), 'control_commands', ['id'], unique=False)
+    op.create_index(op.f('ix_control_commands_inverter_id'), 'control_commands', ['inverter_id'], unique=False)
+    op.create_index(op.f('ix_control_commands_batch_id'), 'control_commands', ['batch_id'], unique=False)
+    op.create_index(op.f('ix_control_commands_status'), 'control_commands', ['status'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_control_commands_status'), table_name='control_commands')
+    op.drop_index(op.f('ix_control_commands_batch_id'), table_name='control_commands')
+    op.drop_index(op.f('ix_control_commands_inverter_id'), table_name='control_commands')
+    op.drop_index(op.f('ix_control_commands_id'), table_name='control_commands')
+    op.drop_table('control_commands')
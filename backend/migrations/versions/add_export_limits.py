@@ -0,0 +1,27 @@
+"""Add export limits to properties and a source to control commands
+
+Revision ID: add_export_limits
+Revises: add_control_commands
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_export_limits'
+down_revision = 'add_control_commands'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('properties') as batch_op:
+        batch_op.add_column(sa.Column('export_limit_w', sa.Float(), nullable=True))
+    with op.batch_alter_table('control_commands') as batch_op:
+        batch_op.add_column(sa.Column('source', sa.String(), nullable=True))
+
+def downgrade() -> None:
+    with op.batch_alter_table('control_commands') as batch_op:
+        batch_op.drop_column('source')
+    with op.batch_alter_table('properties') as batch_op:
+        batch_op.drop_column('export_limit_w')
@@ -0,0 +1,44 @@
+"""Add inverters table
+
+Revision ID: add_inverters
+Revises: initial_migration
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_inverters'
+down_revision = 'initial_migration'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Older deployments created this table with create_all at app startup
+    if sa.inspect(op.get_bind()).has_table('inverters'):
+        return
+
+    op.create_table(
+        'inverters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('inverter_type', sa.String(), nullable=True),
+        sa.Column('region', sa.String(), nullable=True),
+        sa.Column('timezone', sa.String(), nullable=True),
+        sa.Column('sems_username', sa.String(), nullable=True),
+        sa.Column('sems_password', sa.String(), nullable=True),
+        sa.Column('container_id', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_update', sa.DateTime(), nullable=True),
+        sa.Column('interval', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_inverters_id'), 'inverters', ['id'], unique=False)
+    op.create_index(op.f('ix_inverters_name'), 'inverters', ['name'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_inverters_name'), table_name='inverters')
+    op.drop_index(op.f('ix_inverters_id'), table_name='inverters')
+    op.drop_table('inverters')
@@ -0,0 +1,23 @@
+"""Add per-kWh tariff to properties
+
+Revision ID: add_property_tariffs
+Revises: add_telemetry_gaps
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_property_tariffs'
+down_revision = 'add_telemetry_gaps'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('properties') as batch_op:
+        batch_op.add_column(sa.Column('tariff_per_kwh', sa.Float(), nullable=True))
+
+def downgrade() -> None:
+    with op.batch_alter_table('properties') as batch_op:
+        batch_op.drop_column('tariff_per_kwh')
@@ -0,0 +1,23 @@
+"""Add timezone to properties
+
+Revision ID: add_property_timezones
+Revises: add_property_tariffs
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_property_timezones'
+down_revision = 'add_property_tariffs'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('properties') as batch_op:
+        batch_op.add_column(sa.Column('timezone', sa.String(), nullable=True))
+
+def downgrade() -> None:
+    with op.batch_alter_table('properties') as batch_op:
+        batch_op.drop_column('timezone')
@@ -0,0 +1,63 @@
+"""Add SEMS accounts shared by inverters
+
+Revision ID: add_sems_accounts
+Revises: add_inverters
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_sems_accounts'
+down_revision = 'add_inverters'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'sems_accounts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=True),
+        sa.Column('region', sa.String(), nullable=False),
+        sa.Column('container_id', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username', 'region', name='uq_sems_accounts_username_region')
+    )
+    op.create_index(op.f('ix_sems_accounts_id'), 'sems_accounts', ['id'], unique=False)
+
+    with op.batch_alter_table('inverters') as batch_op:
+        batch_op.add_column(sa.Column('inverter_sn', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('account_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_inverters_account_id'), ['account_id'], unique=False)
+        batch_op.create_foreign_key('fk_inverters_account_id', 'sems_accounts', ['account_id'], ['id'])
+
+    # One account per distinct login; the most recently created inverter's password wins
+    op.execute("""
+        INSERT INTO sems_accounts (username, password, region, created_at)
+        SELECT i.sems_username, i.sems_password, i.region,
+               (SELECT MIN(k.created_at) FROM inverters k
+                WHERE k.sems_username = i.sems_username AND k.region = i.region)
+        FROM inverters i
+        WHERE i.sems_username IS NOT NULL AND i.region IS NOT NULL
+          AND i.id = (SELECT MAX(j.id) FROM inverters j
+                      WHERE j.sems_username = i.sems_username AND j.region = i.region)
+    """)
+    op.execute("""
+        UPDATE inverters SET account_id = (
+            SELECT a.id FROM sems_accounts a
+            WHERE a.username = inverters.sems_username AND a.region = inverters.region
+        )
+    """)
+
+def downgrade() -> None:
+    with op.batch_alter_table('inverters') as batch_op:
+        batch_op.drop_constraint('fk_inverters_account_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_inverters_account_id'))
+        batch_op.drop_column('account_id')
+        batch_op.drop_column('inverter_sn')
+
+    op.drop_index(op.f('ix_sems_accounts_id'), table_name='sems_accounts')
+    op.drop_table('sems_accounts')
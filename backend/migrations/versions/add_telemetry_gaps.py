@@ -0,0 +1,44 @@
+"""Add telemetry gaps and inverter power station ids
+
+Revision ID: add_telemetry_gaps
+Revises: add_sems_accounts
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_telemetry_gaps'
+down_revision = 'add_sems_accounts'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('inverters') as batch_op:
+        batch_op.add_column(sa.Column('power_station_id', sa.String(), nullable=True))
+
+    op.create_table(
+        'telemetry_gaps',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('inverter_id', sa.Integer(), nullable=False),
+        sa.Column('start', sa.DateTime(), nullable=False),
+        sa.Column('end', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('points_refetched', sa.Integer(), nullable=True),
+        sa.Column('detected_at', sa.DateTime(), nullable=True),
+        sa.Column('resolved_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['inverter_id'], ['inverters.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_telemetry_gaps_id'), 'telemetry_gaps', ['id'], unique=False)
+    op.create_index(op.f('ix_telemetry_gaps_inverter_id'), 'telemetry_gaps', ['inverter_id'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_telemetry_gaps_inverter_id'), table_name='telemetry_gaps')
+    op.drop_index(op.f('ix_telemetry_gaps_id'), table_name='telemetry_gaps')
+    op.drop_table('telemetry_gaps')
+
+    with op.batch_alter_table('inverters') as batch_op:
+        batch_op.drop_column('power_station_id')
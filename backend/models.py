@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum as SQLAlchemyEnum
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, UniqueConstraint, Enum as SQLAlchemyEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -63,6 +63,9 @@ class Property(Base):
     total_earnings = Column(Float, default=0.0)
     total_generation = Column(Float, default=0.0)
     total_used = Column(Float, default=0.0)
+    tariff_per_kwh = Column(Float, default=0.0)  # Feed-in/avoided cost per kWh generated
+    timezone = Column(String, default="UTC")  # IANA name; daily/monthly windows use local midnight
+    export_limit_w = Column(Float, nullable=True)  # Grid export cap enforced by curtailment; None is uncapped
     user_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -129,4 +132,99 @@ class MyHome(Base):
 
     # Relationships
     property = relationship("Property", back_populates="home_metrics")
-    user = relationship("User", back_populates="home_metrics") 
\ No newline at end of file
+    user = relationship("User", back_populates="home_metrics")
+
+class SemsAccount(Base):
+    """One SEMS portal login; its scraper container polls every inverter that references it"""
+    __tablename__ = "sems_accounts"
+    __table_args__ = (UniqueConstraint("username", "region", name="uq_sems_accounts_username_region"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, nullable=False)
+    password = Column(String)
+    region = Column(String, nullable=False)
+    container_id = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    inverters = relationship("Inverter", back_populates="account")
+
+class Inverter(Base):
+    __tablename__ = "inverters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    inverter_type = Column(String)
+    region = Column(String)
+    timezone = Column(String, default="UTC")
+    sems_username = Column(String)
+    sems_password = Column(String)
+    inverter_sn = Column(String, nullable=True)  # Serial number used to fan account sweeps out
+    power_station_id = Column(String, nullable=True)  # SEMS station, needed for history re-fetches
+    account_id = Column(Integer, ForeignKey("sems_accounts.id"), nullable=True, index=True)
+    container_id = Column(String, nullable=True)
+    status = Column(String, default="inactive")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_update = Column(DateTime, default=datetime.utcnow)
+    interval = Column(Integer, default=300)
+
+    # Relationships
+    account = relationship("SemsAccount", back_populates="inverters")
+    gaps = relationship("TelemetryGap", back_populates="inverter", cascade="all, delete-orphan")
+    alerts = relationship("Alert", back_populates="inverter", cascade="all, delete-orphan")
+    control_commands = relationship("ControlCommand", back_populates="inverter", cascade="all, delete-orphan")
+
+class TelemetryGap(Base):
+    """A window with no inverter_status points, and the state of its re-fetch"""
+    __tablename__ = "telemetry_gaps"
+
+    id = Column(Integer, primary_key=True, index=True)
+    inverter_id = Column(Integer, ForeignKey("inverters.id"), nullable=False, index=True)
+    start = Column(DateTime, nullable=False)
+    end = Column(DateTime, nullable=False)
+    status = Column(String, default="open")  # open, filled, unfillable, failed
+    attempts = Column(Integer, default=0)
+    points_refetched = Column(Integer, default=0)
+    detected_at = Column(DateTime, default=datetime.utcnow)
+    resolved_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    inverter = relationship("Inverter", back_populates="gaps")
+
+class Alert(Base):
+    """A fault raised by the alert engine, open until its condition clears"""
+    __tablename__ = "alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    inverter_id = Column(Integer, ForeignKey("inverters.id"), nullable=False, index=True)
+    rule = Column(String, nullable=False)  # offline, low_production, no_data
+    status = Column(String, default="open", index=True)  # open, resolved
+    message = Column(String)
+    value = Column(Float, nullable=True)  # Reading that raised the alert, if any
+    started_at = Column(DateTime, nullable=False)
+    resolved_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    inverter = relationship("Inverter", back_populates="alerts")
+
+class ControlCommand(Base):
+    """A remote on/off command for one inverter, from queue to confirmed read-back"""
+    __tablename__ = "control_commands"
+    __table_args__ = (UniqueConstraint("idempotency_key", "inverter_id", name="uq_control_commands_key_inverter"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    inverter_id = Column(Integer, ForeignKey("inverters.id"), nullable=False, index=True)
+    batch_id = Column(String, nullable=False, index=True)  # Commands submitted together
+    action = Column(String, nullable=False)  # on, off
+    idempotency_key = Column(String, nullable=True)
+    source = Column(String, default="api")  # api, curtailment
+    # queued, sending, sent, confirmed, unconfirmed, failed, superseded
+    status = Column(String, default="queued", index=True)
+    attempts = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    inverter = relationship("Inverter", back_populates="control_commands")
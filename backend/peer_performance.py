@@ -0,0 +1,345 @@
+# backend/peer_performance.py
+"""Hourly performance ratio of every inverter against its nearest peers.
+
+Sites a few kilometres apart see nearly the same sun, so an inverter's normalized yield (kWh
+per kW of capacity in an hour) divided by the median of its ``PEER_K`` nearest peers within
+``PEER_RADIUS_KM`` shows underperformance without any weather data. Peers come from a uniform
+latitude/longitude grid over device (or else property) coordinates; the ratios of the whole
+fleet are one NumPy expression over an (inverter, peer, hour) array.
+
+Capacity is ``capacity_kw`` from the inverter device's JSON config. Without it, the
+``PEER_CAPACITY_QUANTILE`` of the inverter's hourly energy over ``PEER_CAPACITY_DAYS`` stands in,
+which hides faults older than that window. Results are written to ``peer_performance``.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+import warnings
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from flux_query import FluxRunner, INVERTER_ENERGY, INVERTER_PEAK_ENERGY, get_influx_client, get_runner
+from line_protocol import serialize_columns
+from models import Device, DeviceType, Property
+
+logger = logging.getLogger(__name__)
+
+PEER_INTERVAL = int(os.getenv("PEER_INTERVAL", "3600"))  # Seconds between runs; 0 disables
+PEER_K = int(os.getenv("PEER_K", "8"))
+PEER_RADIUS_KM = float(os.getenv("PEER_RADIUS_KM", "50"))
+PEER_MIN = int(os.getenv("PEER_MIN", "3"))
+# Peer median below this many kWh per kW in an hour is night or heavy cloud: no ratio
+PEER_MIN_YIELD = float(os.getenv("PEER_MIN_YIELD", "0.05"))
+PEER_FLAG_RATIO = float(os.getenv("PEER_FLAG_RATIO", "0.8"))
+PEER_WINDOW_HOURS = int(os.getenv("PEER_WINDOW_HOURS", "3"))
+PEER_CAPACITY_DAYS = int(os.getenv("PEER_CAPACITY_DAYS", "30"))
+PEER_CAPACITY_QUANTILE = 0.99
+PEER_MEASUREMENT = "peer_performance"
+QUERY_BATCH = 500
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Rows of one distance block, so a dense city cell does not allocate a huge matrix
+DISTANCE_BLOCK = 512
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+class SpatialGrid:
+    """Points bucketed into latitude/longitude cells sized to the fleet's density.
+
+    Cells start at ``cell_km`` and are halved while a typical point shares its cell with more
+    than ``occupancy`` others, so a dense city does not compare thousands of sites pairwise.
+    Cells are numbered row-major, and a band of neighbouring cells in one row is a contiguous
+    range of the sorted keys.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_km: float = PEER_RADIUS_KM,
+                 occupancy: int = 4 * PEER_K, min_cell_km: float = 0.5):
+        self.lat = np.asarray(latitudes, dtype=np.float64)
+        self.lon = np.asarray(longitudes, dtype=np.float64)
+        counts = self._index(cell_km)
+        while len(counts) and (counts ** 2).sum() / counts.sum() > occupancy and cell_km / 2 >= min_cell_km:
+            cell_km /= 2
+            counts = self._index(cell_km)
+
+    def _index(self, cell_km: float) -> np.ndarray:
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEGREE
+        self.columns = int(math.ceil(360 / self.cell_deg))
+        rows = np.floor((self.lat + 90) / self.cell_deg).astype(np.int64)
+        cols = np.floor((self.lon + 180) / self.cell_deg).astype(np.int64) % self.columns
+        keys = rows * self.columns + cols
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+        self.cell_keys, self.cell_starts, counts = np.unique(self.keys, return_index=True, return_counts=True)
+        return counts
+
+    def _candidates(self, row: int, col: int, reach_km: float) -> np.ndarray:
+        """Points in every cell that may hold a point within ``reach_km`` of cell (row, col)"""
+        row_reach = int(math.ceil(reach_km / self.cell_km))
+        # Longitude degrees shrink towards the poles: widen by the most poleward row in reach
+        edge = min(89.0, max(abs(-90 + (row - row_reach) * self.cell_deg),
+                             abs(-90 + (row + row_reach + 1) * self.cell_deg)))
+        col_reach = int(math.ceil(reach_km / (KM_PER_DEGREE * math.cos(math.radians(edge))) / self.cell_deg))
+        columns = self.columns
+        ranges = []
+        for r in range(row - row_reach, row + row_reach + 1):
+            base = r * columns
+            if 2 * col_reach + 1 >= columns:
+                ranges.append((base, base + columns - 1))
+                continue
+            low, high = col - col_reach, col + col_reach
+            if low < 0:
+                ranges.append((base + low + columns, base + columns - 1))
+                low = 0
+            if high >= columns:
+                ranges.append((base, base + high - columns))
+                high = columns - 1
+            ranges.append((base + low, base + high))
+        bounds = np.array(ranges, dtype=np.int64)
+        starts = np.searchsorted(self.keys, bounds[:, 0], side="left")
+        stops = np.searchsorted(self.keys, bounds[:, 1], side="right")
+        found = [self.order[start:stop] for start, stop in zip(starts.tolist(), stops.tolist()) if stop > start]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def neighbors(self, k: int, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and distances of up to ``k`` nearest other points within ``radius_km``.
+
+        Rows are sorted by distance and padded with -1 / inf. Each cell searches a doubling
+        reach until its points' k-th neighbours are closer than anything outside the reach.
+        """
+        count = len(self.lat)
+        indices = np.full((count, k), -1, dtype=np.int64)
+        distances = np.full((count, k), np.inf)
+        stops = np.append(self.cell_starts[1:], len(self.keys))
+        for key, start, stop in zip(self.cell_keys.tolist(), self.cell_starts.tolist(), stops.tolist()):
+            row, col = divmod(key, self.columns)
+            pending = self.order[start:stop]
+            reach = self.cell_km
+            while len(pending):
+                reach = min(reach, radius_km)
+                candidates = self._candidates(row, col, reach)
+                done = np.concatenate([
+                    self._nearest(pending[offset:offset + DISTANCE_BLOCK], candidates, k, radius_km,
+                                  None if reach >= radius_km else reach, indices, distances)
+                    for offset in range(0, len(pending), DISTANCE_BLOCK)
+                ])
+                pending = pending[~done]
+                reach *= 2
+        return indices, distances
+
+    def _nearest(self, block: np.ndarray, candidates: np.ndarray, k: int, radius_km: float,
+                 reach_km: Optional[float], indices: np.ndarray, distances: np.ndarray) -> np.ndarray:
+        """Store the nearest candidates of ``block`` rows that are settled; returns which were"""
+        take = min(k, len(candidates))
+        d = haversine_km(self.lat[block, None], self.lon[block, None],
+                         self.lat[None, candidates], self.lon[None, candidates])
+        d[(block[:, None] == candidates[None, :]) | (d > radius_km)] = np.inf
+        nearest = np.argpartition(d, take - 1, axis=1)[:, :take]
+        nearest_d = np.take_along_axis(d, nearest, axis=1)
+        order = np.argsort(nearest_d, axis=1)
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        nearest_d = np.take_along_axis(nearest_d, order, axis=1)
+        # Anything outside the reach is farther than reach_km, so closer k-th neighbours are final
+        done = np.ones(len(block), dtype=bool) if reach_km is None else \
+            (take == k) & (nearest_d[:, -1] <= reach_km)
+        rows = block[done]
+        distances[rows, :take] = nearest_d[done]
+        indices[rows, :take] = np.where(np.isfinite(nearest_d[done]), candidates[nearest[done]], -1)
+        return done
+
+def peer_ratios(yields: np.ndarray, neighbors: np.ndarray, min_peers: int = PEER_MIN,
+                min_yield: float = PEER_MIN_YIELD) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ratio, peer median yield, peer count) per (inverter, hour) for ``yields`` of shape (N, H).
+
+    ``neighbors`` is (N, k) with -1 for missing peers. Ratios are NaN where the inverter has no
+    yield, fewer than ``min_peers`` peers reported or the peer median is below ``min_yield``.
+    """
+    hours = yields.shape[1]
+    # Index -1 lands on an all-NaN row
+    padded = np.vstack([yields, np.full((1, hours), np.nan)])
+    peer_yields = padded[neighbors]  # (N, k, H)
+    peers = np.isfinite(peer_yields).sum(axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN slices
+        median = np.nanmedian(peer_yields, axis=1)
+    valid = (peers >= min_peers) & (median >= min_yield) & np.isfinite(yields)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(valid, yields / median, np.nan)
+    return ratio, median, peers
+
+def _epoch_ns(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp()) * 1_000_000_000
+
+class InverterSite:
+    __slots__ = ("serial", "property_id", "latitude", "longitude", "capacity_kw")
+
+    def __init__(self, serial: str, property_id: Optional[int], latitude: float, longitude: float,
+                 capacity_kw: Optional[float]):
+        self.serial = serial
+        self.property_id = property_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.capacity_kw = capacity_kw
+
+def load_sites(db: Session) -> List[InverterSite]:
+    """Inverter devices with a location (device coordinates, else their property's)"""
+    sites = []
+    rows = db.query(Device, Property).outerjoin(Property, Device.property_id == Property.id).filter(
+        Device.device_type == DeviceType.INVERTER
+    ).all()
+    for device, prop in rows:
+        latitude = device.device_latitude if device.device_latitude is not None else getattr(prop, "latitude", None)
+        longitude = device.device_longitude if device.device_longitude is not None else getattr(prop, "longitude", None)
+        if not device.device_id or latitude is None or longitude is None:
+            continue
+        try:
+            capacity = float(json.loads(device.config or "{}").get("capacity_kw") or 0) or None
+        except (TypeError, ValueError, AttributeError):
+            capacity = None
+        sites.append(InverterSite(device.device_id, device.property_id, latitude, longitude, capacity))
+    return sites
+
+def hourly_energy(runner: FluxRunner, serials: List[str], start: datetime, stop: datetime) -> np.ndarray:
+    """kWh per (serial, hour) for the whole hours in [start, stop); NaN where nothing was reported"""
+    hours = int((stop - start) // timedelta(hours=1))
+    energy = np.full((len(serials), hours), np.nan)
+    row_of = {serial: row for row, serial in enumerate(serials)}
+    start_ns = _epoch_ns(start)
+    for offset in range(0, len(serials), QUERY_BATCH):
+        batch = serials[offset:offset + QUERY_BATCH]
+        for record in runner.rows(INVERTER_ENERGY, start, stop, serials=batch, every="1h", timezone="UTC"):
+            row = row_of.get(record.get("inverter_sn"))
+            hour = (_epoch_ns(record["_time"]) - start_ns) // 3_600_000_000_000
+            if row is not None and 0 <= hour < hours:
+                energy[row, hour] = record.get("_value") or 0.0
+    return energy
+
+class CapacityEstimates:
+    """Per-serial stand-in capacity, refreshed once a day.
+
+    Serials without data in the window are remembered as checked too, so a new inverter does
+    not send every run back to the full quantile query; serials not seen before are queried
+    on their own.
+    """
+
+    def __init__(self, days: int = PEER_CAPACITY_DAYS, ttl: float = 86400.0):
+        self.days = days
+        self.ttl = ttl
+        self._values: Dict[str, float] = {}
+        self._checked: Set[str] = set()
+        self._refreshed = float("-inf")
+
+    def get(self, runner: FluxRunner, serials: List[str], now: datetime) -> Dict[str, float]:
+        if time.monotonic() - self._refreshed > self.ttl:
+            self._values, self._checked = {}, set()
+            self._refreshed = time.monotonic()
+        missing = [serial for serial in serials if serial not in self._checked]
+        for offset in range(0, len(missing), QUERY_BATCH):
+            for record in runner.rows(INVERTER_PEAK_ENERGY, now - timedelta(days=self.days), now,
+                                      serials=missing[offset:offset + QUERY_BATCH], every="1h",
+                                      q=PEER_CAPACITY_QUANTILE):
+                if record.get("_value"):
+                    self._values[record["inverter_sn"]] = float(record["_value"])
+        self._checked.update(missing)
+        return self._values
+
+def performance_lines(sites: List[InverterSite], hour_starts: np.ndarray, yields: np.ndarray,
+                      ratio: np.ndarray, median: np.ndarray, peers: np.ndarray,
+                      flag_ratio: float = PEER_FLAG_RATIO) -> List[str]:
+    """peer_performance line protocol for every (inverter, hour) with a ratio"""
+    rows, hours = np.nonzero(np.isfinite(ratio))
+    if not len(rows):
+        return []
+    return serialize_columns(
+        PEER_MEASUREMENT,
+        {"inverter_sn": [sites[row].serial for row in rows.tolist()],
+         "property_id": [str(sites[row].property_id or "") for row in rows.tolist()]},
+        {"ratio": ratio[rows, hours], "yield": yields[rows, hours], "peer_yield": median[rows, hours],
+         "peers": peers[rows, hours].astype(np.float64),
+         "underperforming": (ratio[rows, hours] < flag_ratio).astype(np.float64)},
+        hour_starts[hours]
+    )
+
+def run_peer_performance(db: Session, runner: FluxRunner, write_lines: Callable[[List[str]], None],
+                         capacities: Optional[CapacityEstimates] = None, now: Optional[datetime] = None,
+                         window_hours: int = PEER_WINDOW_HOURS) -> int:
+    """Ratios for the last ``window_hours`` whole hours; returns the number of points written"""
+    now = (now or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    start = now - timedelta(hours=window_hours)
+    sites = load_sites(db)
+    if len(sites) <= PEER_MIN:
+        return 0
+
+    serials = [site.serial for site in sites]
+    unrated = [site.serial for site in sites if not site.capacity_kw]
+    estimated = (capacities or CapacityEstimates()).get(runner, unrated, now) if unrated else {}
+    capacity = np.array([site.capacity_kw or estimated.get(site.serial, np.nan) for site in sites])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        yields = hourly_energy(runner, serials, start, now) / capacity[:, None]
+    yields[~np.isfinite(yields)] = np.nan
+
+    grid = SpatialGrid([site.latitude for site in sites], [site.longitude for site in sites])
+    neighbors, _ = grid.neighbors(PEER_K, PEER_RADIUS_KM)
+    ratio, median, peers = peer_ratios(yields, neighbors)
+    hour_starts = _epoch_ns(start) + np.arange(window_hours, dtype=np.int64) * 3_600_000_000_000
+    lines = performance_lines(sites, hour_starts, yields, ratio, median, peers)
+    if lines:
+        write_lines(lines)
+    flagged = int(np.nansum(ratio[:, -1] < PEER_FLAG_RATIO)) if window_hours else 0
+    logger.info(f"Peer performance: {len(lines)} ratios for {len(sites)} inverters, "
+                f"{flagged} under {PEER_FLAG_RATIO:.0%} of their peers in the last hour")
+    return len(lines)
+
+class PeerPerformanceJob:
+    """Background thread computing peer ratios every ``PEER_INTERVAL`` seconds"""
+
+    def __init__(self, session_factory, interval: int = PEER_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.capacities = CapacityEstimates()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="peer-performance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Peer performance failed: {e}")
+
+    def run_once(self) -> int:
+        from backfill import influx_line_writer
+
+        db = self.session_factory()
+        try:
+            return run_peer_performance(db, get_runner(), influx_line_writer(get_influx_client(),
+                                                                                handler="peer_performance"),
+                                        self.capacities)
+        finally:
+            db.close()
@@ -0,0 +1,201 @@
+# backend/schema_migration.py
+"""Series cardinality report and rewrite of old-layout points into the tag schema.
+
+The layout of every measurement is defined in ``influx_schema.SCHEMAS``. InfluxDB cannot
+change the tags of stored points, so migrating a measurement reads its old-layout points
+(those carrying the schema's ``legacy_marker`` tag) one time chunk at a time as a stream,
+writes them back in the current layout in batches and then deletes the old series in that
+chunk. A chunk is only deleted after all of its points were written, and rewriting a point
+twice is harmless, so an interrupted run can simply be started again.
+
+    python schema_migration.py report --days 30
+    python schema_migration.py migrate --measurement inverter_status --start 2024-01-01
+"""
+import json
+import logging
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from flux_query import (
+    FluxRunner, FluxTemplate, PIVOT_FIELDS, SERIES_COUNT, TAG_KEYS, TAG_VALUE_COUNT, TEMPLATES, register, tag_exists
+)
+from influx_schema import SCHEMAS, MeasurementSchema
+from line_protocol import serialize_columns, to_float_column
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_LINES = 5000
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Columns every Flux row carries that are neither tags nor fields
+_SYSTEM_COLUMNS = {"_start", "_stop", "_time", "_measurement", "_field", "_value", "result", "table"}
+
+DeleteFn = Callable[[str, str, str], None]
+
+def legacy_template(schema: MeasurementSchema) -> FluxTemplate:
+    """Old-layout points of ``schema``, one row per series and timestamp with every field"""
+    name = f"{schema.name}.legacy"
+    if name not in TEMPLATES:
+        register(FluxTemplate(name, schema.name, (tag_exists(schema.legacy_marker), PIVOT_FIELDS)))
+    return TEMPLATES[name]
+
+def _epoch_ns(value: datetime) -> int:
+    # Flux records carry microsecond datetimes, so rewritten points lose any sub-microsecond part
+    return (value - EPOCH) // timedelta(microseconds=1) * 1000
+
+def _rfc3339_ns(ns: int) -> str:
+    seconds, fraction = divmod(ns, 1_000_000_000)
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S") + f".{fraction:09d}Z"
+
+def _quote(value: str) -> str:
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def rewrite_lines(schema: MeasurementSchema, rows: List[Dict[str, Any]]) -> List[str]:
+    """Line protocol for pivoted old-layout rows in the schema's current layout"""
+    if not rows:
+        return []
+    tags = {tag: [str(row.get(tag) or "") for row in rows] for tag in schema.tags}
+    fields = {name: to_float_column([row.get(name) for row in rows]) for name in schema.fields}
+    for tag, target in schema.legacy_tags.items():
+        if target is None:
+            continue
+        name, convert = target
+        fields[name] = np.array([convert(row[tag]) if row.get(tag) is not None else np.nan for row in rows])
+    timestamps = np.array([_epoch_ns(row["_time"]) for row in rows], dtype=np.int64)
+    return serialize_columns(schema.name, tags, fields, timestamps)
+
+@dataclass
+class MigrationStats:
+    measurement: str
+    chunks: int = 0
+    points_read: int = 0
+    lines_written: int = 0
+    deletes: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def migrate(runner: FluxRunner, schema: MeasurementSchema, start: datetime, stop: datetime,
+            write_lines: Callable[[List[str]], None], delete: Optional[DeleteFn],
+            chunk: timedelta = timedelta(days=1), batch_lines: int = MIGRATION_BATCH_LINES) -> MigrationStats:
+    """Rewrite old-layout points of ``schema`` in [start, stop), oldest chunk first.
+
+    ``delete(start, stop, predicate)`` removes the old series of a chunk once it is written;
+    without it (a dry run when ``write_lines`` discards) nothing is deleted.
+    """
+    if schema.legacy_marker is None:
+        raise ValueError(f"{schema.name} has no earlier layout to migrate")
+    template = legacy_template(schema)
+    stats = MigrationStats(schema.name)
+
+    chunk_start = start
+    while chunk_start < stop:
+        chunk_stop = min(chunk_start + chunk, stop)
+        markers = set()
+        batch: List[Dict[str, Any]] = []
+        for row in runner.stream(template, chunk_start, chunk_stop):
+            markers.add(row[schema.legacy_marker])
+            batch.append(row)
+            if len(batch) >= batch_lines:
+                lines = rewrite_lines(schema, batch)
+                write_lines(lines)
+                stats.points_read += len(batch)
+                stats.lines_written += len(lines)
+                batch = []
+        if batch:
+            lines = rewrite_lines(schema, batch)
+            write_lines(lines)
+            stats.points_read += len(batch)
+            stats.lines_written += len(lines)
+
+        if delete is not None:
+            # The delete range includes its stop, so end one nanosecond before the next chunk
+            delete_start = _rfc3339_ns(_epoch_ns(chunk_start))
+            delete_stop = _rfc3339_ns(_epoch_ns(chunk_stop) - 1)
+            for marker in sorted(markers):
+                delete(delete_start, delete_stop,
+                       f'_measurement="{schema.name}" AND {schema.legacy_marker}={_quote(marker)}')
+                stats.deletes += 1
+        stats.chunks += 1
+        logger.info(f"Migrated {schema.name} {chunk_start.isoformat()}..{chunk_stop.isoformat()}: "
+                    f"{stats.points_read} points so far")
+        chunk_start = chunk_stop
+    return stats
+
+def cardinality_report(runner: FluxRunner, start: datetime, stop: datetime,
+                       schemas: Iterable[MeasurementSchema] = SCHEMAS.values()) -> List[Dict[str, Any]]:
+    """Series and distinct tag values per measurement, with each tag classified against its schema"""
+    report = []
+    for schema in schemas:
+        rows = runner.rows(SERIES_COUNT, start, stop, measurement=schema.name)
+        series = int(rows[0]["_measurement"]) if rows else 0
+        keys = sorted({row["_value"] for row in runner.rows(TAG_KEYS, start, stop, measurement=schema.name)}
+                      - _SYSTEM_COLUMNS)
+        tags = {}
+        for key in keys:
+            counted = runner.rows(TAG_VALUE_COUNT, start, stop, measurement=schema.name, tag=key)
+            kind = "tag" if key in schema.tags else "legacy" if key in schema.legacy_tags else "undeclared"
+            tags[key] = {"values": int(counted[0]["_value"]) if counted else 0, "kind": kind}
+        report.append({"measurement": schema.name, "series": series, "tags": tags})
+    return report
+
+def influx_deleter(client) -> DeleteFn:
+    from influx_config import get_influx_config
+
+    influx_config = get_influx_config()
+    delete_api = client.delete_api()
+
+    def delete(start: str, stop: str, predicate: str) -> None:
+        delete_api.delete(start, stop, predicate, bucket=influx_config["bucket"], org=influx_config["org"])
+    return delete
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from backfill import influx_line_writer
+    from flux_query import get_influx_client, get_runner
+
+    parser = argparse.ArgumentParser(description="InfluxDB tag schema tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="Series cardinality per measurement")
+    report_parser.add_argument("--days", type=int, default=30, help="Look-back window")
+    report_parser.add_argument("--json", action="store_true")
+    migrate_parser = commands.add_parser("migrate", help="Rewrite old-layout points into the current schema")
+    migrate_parser.add_argument("--measurement", required=True, choices=sorted(
+        name for name, schema in SCHEMAS.items() if schema.legacy_marker))
+    migrate_parser.add_argument("--start", required=True, help="First day, YYYY-MM-DD")
+    migrate_parser.add_argument("--stop", help="Day after the last, YYYY-MM-DD (default now)")
+    migrate_parser.add_argument("--chunk-hours", type=int, default=24)
+    migrate_parser.add_argument("--batch-lines", type=int, default=MIGRATION_BATCH_LINES)
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Count old-layout points only")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    runner = get_runner()
+    if args.command == "report":
+        now = datetime.now(timezone.utc)
+        result = cardinality_report(runner, now - timedelta(days=args.days), now)
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            for entry in result:
+                print(f"{entry['measurement']:<20} {entry['series']:>10} series")
+                for key, tag in entry["tags"].items():
+                    print(f"  {key:<18} {tag['values']:>10} values  {tag['kind']}")
+        sys.exit(0)
+
+    def parse_day(value: str) -> datetime:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+    client = get_influx_client()
+    stats = migrate(
+        runner, SCHEMAS[args.measurement], parse_day(args.start),
+        parse_day(args.stop) if args.stop else datetime.now(timezone.utc),
+        (lambda lines: None) if args.dry_run else influx_line_writer(client, handler="schema_migration"),
+        None if args.dry_run else influx_deleter(client),
+        chunk=timedelta(hours=args.chunk_hours), batch_lines=args.batch_lines
+    )
+    print(json.dumps(stats.to_dict(), indent=2))
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 from models import Gender, PropertyType, DeviceType, DeviceStatus
@@ -34,11 +34,17 @@ class PropertyBase(BaseModel):
     total_earnings: float = 0.0
     total_generation: float = 0.0
     total_used: float = 0.0
+    tariff_per_kwh: Optional[float] = 0.0
+    timezone: Optional[str] = "UTC"
+    export_limit_w: Optional[float] = None
     user_id: int
 
 class PropertyCreate(PropertyBase):
     pass
 
+class ExportLimit(BaseModel):
+    export_limit_w: Optional[float] = Field(None, gt=0)  # None removes the cap
+
 class Property(PropertyBase):
     id: int
     created_at: datetime
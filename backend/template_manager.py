@@ -1,49 +1,199 @@
 # backend/template_manager.py
+import hashlib
 import json
 import shutil
 import logging
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+
+from config_schema import CompiledSchema, ConfigError, compile_schema
 
 logger = logging.getLogger(__name__)
 
+IGNORED_NAMES = {"__pycache__", ".git", ".DS_Store"}
+
+@dataclass
+class TemplateEntry:
+    """Indexed template: parsed template.json plus a hash of everything in its directory"""
+    name: str
+    path: Path
+    manifest: Dict[str, Any]
+    content_hash: str
+    signature: Tuple
+    validator: Optional[CompiledSchema] = None
+    errors: List[str] = field(default_factory=list)
+    # Shared runtime package (a directory next to the templates) bundled into the image
+    runtime: Optional[Path] = None
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+def _template_files(template_dir: Path) -> List[Path]:
+    return sorted(
+        p for p in template_dir.rglob("*")
+        if p.is_file() and not IGNORED_NAMES.intersection(p.relative_to(template_dir).parts)
+    )
+
+def _bundle_files(template_dir: Path, runtime: Optional[Path]) -> List[Tuple[str, Path]]:
+    """(path in the build context, source file) of a template plus its runtime package"""
+    files = [(str(p.relative_to(template_dir)), p) for p in _template_files(template_dir)]
+    if runtime is not None and runtime.is_dir():
+        files += [(str(Path(runtime.name) / p.relative_to(runtime)), p) for p in _template_files(runtime)]
+    return files
+
+def _signature(template_dir: Path, runtime: Optional[Path] = None) -> Tuple:
+    """Cheap change detector: (relative path, mtime, size) of every file"""
+    signature = []
+    for name, path in _bundle_files(template_dir, runtime):
+        stat = path.stat()
+        signature.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def _content_hash(template_dir: Path, runtime: Optional[Path] = None) -> str:
+    digest = hashlib.sha256()
+    for name, path in _bundle_files(template_dir, runtime):
+        digest.update(name.encode())
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
 class TemplateManager:
-    def __init__(self, templates_dir: str = "/app/templates"):
+    """Registry of scraper templates.
+
+    All templates are indexed up front; lookups are dict hits. The template directories are
+    re-stat'ed at most every ``poll_interval`` seconds and any template whose files changed
+    is re-parsed and re-hashed.
+    """
+
+    def __init__(self, templates_dir: str = "/app/templates", poll_interval: float = 2.0):
         self.templates_dir = Path(templates_dir)
         if not self.templates_dir.exists():
             raise FileNotFoundError(f"Templates directory not found: {templates_dir}")
+        self.poll_interval = poll_interval
+        self._index: Dict[str, TemplateEntry] = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Re-index templates whose files changed since the last scan"""
+        with self._lock:
+            index = {}
+            for template_dir in self.templates_dir.iterdir():
+                if not template_dir.is_dir() or not (template_dir / "template.json").exists():
+                    continue
+                entry = self._index.get(template_dir.name)
+                signature = _signature(template_dir, entry.runtime if entry else None)
+                if entry is None or entry.signature != signature:
+                    entry = self._load_entry(template_dir, signature)
+                    if entry is None:
+                        continue
+                    logger.info(f"Indexed template {entry.name} ({entry.content_hash[:12]})")
+                index[template_dir.name] = entry
+            self._index = index
+            self._last_check = time.monotonic()
+
+    def _load_entry(self, template_dir: Path, signature: Tuple) -> Optional[TemplateEntry]:
+        try:
+            with open(template_dir / "template.json", 'r') as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load template {template_dir.name}: {e}")
+            return None
+
+        validator, errors = compile_schema(manifest.get("config_schema", {}))
+        for actual_file in manifest.get("files", {}).values():
+            if not (template_dir / actual_file).exists():
+                errors.append(f"Missing template file: {actual_file}")
+        runtime = self.templates_dir / manifest["runtime"] if manifest.get("runtime") else None
+        if runtime is not None:
+            if not runtime.is_dir():
+                errors.append(f"Missing runtime package: {manifest['runtime']}")
+            # Include the runtime in the signature so editing it re-indexes the template
+            signature = _signature(template_dir, runtime)
+        for error in errors:
+            logger.error(f"Template {template_dir.name}: {error}")
+
+        return TemplateEntry(
+            name=template_dir.name,
+            path=template_dir,
+            manifest=manifest,
+            content_hash=_content_hash(template_dir, runtime),
+            signature=signature,
+            validator=validator,
+            errors=errors,
+            runtime=runtime
+        )
+
+    def _entries(self) -> Dict[str, TemplateEntry]:
+        if time.monotonic() - self._last_check >= self.poll_interval:
+            self.refresh()
+        return self._index
+
+    def get_entry(self, template_name: str) -> Optional[TemplateEntry]:
+        return self._entries().get(template_name)
+
+    def get_template_hash(self, template_name: str) -> Optional[str]:
+        """Content hash of the template directory, usable as an image cache key"""
+        entry = self.get_entry(template_name)
+        return entry.content_hash if entry else None
+
+    def image_tag(self, template_name: str) -> Optional[str]:
+        entry = self.get_entry(template_name)
+        if not entry:
+            return None
+        return f"solar-scraper-{entry.name}:{entry.content_hash[:12]}"
+
+    @contextmanager
+    def build_context(self, template_name: str):
+        """Temporary directory holding the template with its runtime package, for docker build"""
+        entry = self.get_entry(template_name)
+        if entry is None:
+            raise FileNotFoundError(f"Template not found: {template_name}")
+        if entry.runtime is None:
+            yield entry.path
+            return
+        with tempfile.TemporaryDirectory(prefix=f"build-{entry.name}-") as context:
+            self._copy_bundle(entry, Path(context) / entry.name)
+            yield Path(context) / entry.name
+
+    @staticmethod
+    def _copy_bundle(entry: TemplateEntry, destination: Path) -> None:
+        shutil.copytree(entry.path, destination, ignore=shutil.ignore_patterns(*IGNORED_NAMES))
+        if entry.runtime is not None:
+            shutil.copytree(entry.runtime, destination / entry.runtime.name,
+                            ignore=shutil.ignore_patterns(*IGNORED_NAMES))
 
     def get_template_types(self) -> list:
         """Get list of available template types"""
-        return [d.name for d in self.templates_dir.iterdir() if d.is_dir()]
+        return list(self._entries())
 
-    def validate_config(self, template_type: str, config: Dict[str, Any]) -> bool:
-        """Validate configuration against template requirements"""
-        required_fields = {
-            "goodwe": {
-                "sems": ["username", "password", "region"],
-                "influxdb": ["url", "token", "org", "bucket"],
-                "settings": ["interval", "timezone"]
-            }
-        }
-
-        if template_type not in required_fields:
-            logger.error(f"Unknown template type: {template_type}")
-            return False
+    def config_errors(self, template_type: str, config: Dict[str, Any]) -> List[ConfigError]:
+        """Structured errors for one config against the template's compiled config_schema"""
+        return self.validate_configs(template_type, [config])[0]
 
-        for section, fields in required_fields[template_type].items():
-            if section not in config:
-                logger.error(f"Missing section in config: {section}")
-                return False
-            for field in fields:
-                if field not in config[section]:
-                    logger.error(f"Missing field in config: {section}.{field}")
-                    return False
-                if not config[section][field] and field not in ["password"]:
-                    logger.error(f"Empty field in config: {section}.{field}")
-                    return False
+    def validate_configs(self, template_type: str, configs: Iterable[Dict[str, Any]]) -> List[List[ConfigError]]:
+        """Bulk-validate configs (e.g. a fleet import), one error list per config"""
+        entry = self.get_entry(template_type)
+        if entry is None:
+            return [[ConfigError("", f"Unknown template type: {template_type}")] for _ in configs]
+        if entry.validator is None:
+            return [[ConfigError("", f"Template {template_type} has an invalid config_schema")] for _ in configs]
+        return entry.validator.validate_many(configs)
 
-        return True
+    def validate_config(self, template_type: str, config: Dict[str, Any]) -> bool:
+        """Validate configuration against template requirements"""
+        errors = self.config_errors(template_type, config)
+        for error in errors:
+            logger.error(f"Invalid config {error.field}: {error.message}")
+        return not errors
 
     def create_container(self, template_type: str, container_name: str, config: Dict[str, Any]) -> Optional[str]:
         """Create a new container from template"""
@@ -65,8 +215,8 @@ class TemplateManager:
             if container_dir.exists():
                 raise FileExistsError(f"Container already exists: {container_name}")
 
-            # Copy template files
-            shutil.copytree(template_dir, container_dir)
+            # Copy template files along with the runtime package they import
+            self._copy_bundle(self.get_entry(template_type), container_dir)
 
             # Write configuration
             config_file = container_dir / "config.json"
@@ -112,24 +262,13 @@ class TemplateManager:
         return [d.name for d in containers_dir.iterdir() if d.is_dir()]
 
     def load_template(self, template_name: str) -> Optional[Dict]:
-        """Load template configuration"""
-        template_path = self.templates_dir / template_name / "template.json"
-        if not template_path.exists():
-            return None
-            
-        try:
-            with open(template_path, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return None
+        """Template configuration from the index (shared, do not mutate)"""
+        entry = self.get_entry(template_name)
+        return entry.manifest if entry else None
     
     def list_templates(self) -> List[str]:
         """List available templates"""
-        templates = []
-        for template_dir in self.templates_dir.iterdir():
-            if template_dir.is_dir() and (template_dir / "template.json").exists():
-                templates.append(template_dir.name)
-        return templates
+        return list(self._entries())
     
     def copy_template_files(self, template_name: str, destination: Path) -> bool:
         """Copy template files to destination"""
@@ -151,12 +290,6 @@ class TemplateManager:
             return False
     
     def validate_template(self, template_name: str) -> bool:
-        """Validate template has required files"""
-        template = self.load_template(template_name)
-        if not template:
-            return False
-            
-        source_dir = self.templates_dir / template_name
-        required_files = template.get("files", {}).values()
-        
-        return all((source_dir / file).exists() for file in required_files)
\ No newline at end of file
+        """Validate template has required files and a well-formed config_schema"""
+        entry = self.get_entry(template_name)
+        return entry is not None and entry.valid
\ No newline at end of file
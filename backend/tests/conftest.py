@@ -0,0 +1,36 @@
+"""Shared fixtures: backend modules import flat, against an in-memory SQLite database"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+BACKEND = Path(__file__).resolve().parents[1]
+ROOT = BACKEND.parent
+# Benchmarks provide the protocol simulators
+for path in (ROOT / "benchmarks", ROOT / "templates" / "goodwe", ROOT / "templates", BACKEND):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# database.py builds its engine at import; keep it off the postgres default
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import models  # noqa: E402
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from alerts import AlertEngine, points_from_lines
+from models import Alert, Inverter
+
+T0 = datetime(2024, 6, 1, 12, 0)
+
+
+def make_engine(session_factory, db, count=1):
+    inverters = [Inverter(name=f"inv{i}", region="au", timezone="UTC", interval=300) for i in range(count)]
+    db.add_all(inverters)
+    db.commit()
+    return AlertEngine(session_factory, sinks=[], check_interval=0), [inverter.id for inverter in inverters]
+
+
+def online(inverter_id, at, power=1000.0):
+    return (inverter_id, at, {"online": True, "current_power": power})
+
+
+def test_no_data_resolves_once_for_a_multi_point_batch(session_factory, db):
+    engine, (inverter_id,) = make_engine(session_factory, db)
+    engine.observe([online(inverter_id, T0)])
+    opened = engine.expire(T0 + timedelta(days=1))
+    assert [(event["rule"], event["status"]) for event in opened] == [("no_data", "open")]
+
+    events = engine.observe([online(inverter_id, T0 + timedelta(hours=25)),
+                             online(inverter_id, T0 + timedelta(hours=25, minutes=5))])
+
+    assert [(event["rule"], event["status"]) for event in events] == [("no_data", "resolved")]
+    alert = db.query(Alert).one()
+    assert alert.status == "resolved"
+    assert alert.resolved_at == T0 + timedelta(hours=25)
+    assert engine._states[inverter_id].open == {}
+
+
+def test_offline_opened_and_resolved_in_one_batch(session_factory, db):
+    engine, (inverter_id,) = make_engine(session_factory, db)
+    offline = {"online": False, "current_power": 0}
+    points = [(inverter_id, T0 + timedelta(minutes=5 * i), offline) for i in range(12)]
+    points += [online(inverter_id, T0 + timedelta(hours=1)), online(inverter_id, T0 + timedelta(hours=1, minutes=5))]
+
+    events = engine.observe(points)
+
+    assert [(event["rule"], event["status"]) for event in events] == [("offline", "open"), ("offline", "resolved")]
+    assert db.query(Alert).one().status == "resolved"
+    assert engine._states[inverter_id].open == {}
+
+
+def test_open_alert_is_reloaded_and_resolved(session_factory, db):
+    engine, (inverter_id,) = make_engine(session_factory, db)
+    db.add(Alert(inverter_id=inverter_id, rule="offline", status="open", message="down", started_at=T0))
+    db.commit()
+
+    events = engine.observe([online(inverter_id, T0 + timedelta(minutes=5)),
+                             online(inverter_id, T0 + timedelta(minutes=10))])
+
+    assert [(event["rule"], event["status"]) for event in events] == [("offline", "resolved")]
+    db.expire_all()
+    assert db.query(Alert).one().status == "resolved"
+
+
+def test_points_from_lines_keeps_tagged_inverter_status_points():
+    points = points_from_lines([
+        "inverter_status,inverter_id=7,inverter_sn=SN1 current_power=10,online=1 1717243200000000000",
+        "inverter_status,inverter_sn=SN2 current_power=5 1717243200000000000",
+        "home_metrics,property_id=1 exporting=3 1717243200000000000",
+        "",
+    ])
+    assert points == [(7, datetime(2024, 6, 1, 12, 0), {"current_power": 10.0, "online": 1.0})]
@@ -0,0 +1,91 @@
+import zoneinfo
+from datetime import date, datetime, timezone
+
+import backfill
+from backfill import BackfillProgress, chart_to_lines, get_progress, run_backfill
+from influx_schema import SCHEMAS
+from line_protocol import parse_line
+from schema_migration import rewrite_lines
+
+UTC = zoneinfo.ZoneInfo("UTC")
+
+
+class FakeClient:
+    token = "token"
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def get_plant_power_chart(self, station, day):
+        if day in self.failing:
+            return None
+        return [{"x": "12:00", "y": 1500}, {"x": "12:05", "y": 1600.5}]
+
+
+def test_chart_is_written_as_station_power():
+    measurement, tags, fields, timestamp = parse_line(
+        chart_to_lines([{"x": "12:00", "y": 1500}], date(2024, 6, 1), UTC, "station")[0]
+    )
+    assert measurement == "station_power"
+    assert tags == {"power_station_id": "station", "source": "backfill"}
+    assert fields == {"power": 1500.0}
+    assert timestamp == 1717243200 * 10**9
+
+
+def test_inverters_of_one_station_write_the_same_series(tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill, "_jobs", {})
+    written = {}
+    for inverter_id in (7, 8, 9):
+        lines = written.setdefault(inverter_id, [])
+        run_backfill(FakeClient(), BackfillProgress(inverter_id, "station", "2024-06-01", "2024-06-01"), rate=1000,
+                     write_lines=lines.extend, checkpoint_dir=str(tmp_path))
+
+    # Points with the same series and timestamp overwrite each other, so the total is not multiplied
+    assert written[7] == written[8] == written[9]
+    assert all("inverter_id" not in parse_line(line)[1] for line in written[7])
+
+
+def test_per_inverter_copies_migrate_to_one_station_series():
+    rows = [{"_time": datetime(2024, 6, 1, 12, tzinfo=timezone.utc), "inverter_id": inverter_id,
+             "power_station_id": "station", "source": "backfill", "power": 1500}
+            for inverter_id in ("7", "8")]
+
+    lines = rewrite_lines(SCHEMAS["station_power"], rows)
+
+    assert lines[0] == lines[1] == chart_to_lines([{"x": "12:00", "y": 1500}], date(2024, 6, 1), UTC, "station")[0]
+
+
+def test_progress_survives_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill, "_jobs", {})
+    written = []
+    progress = BackfillProgress(7, "station", "2024-06-01", "2024-06-03")
+
+    run_backfill(FakeClient(failing={"2024-06-02"}), progress, rate=1000, write_lines=written.extend,
+                 checkpoint_dir=str(tmp_path))
+
+    assert len(written) == 4
+    backfill._jobs.clear()
+    saved = get_progress(7, str(tmp_path))
+    assert saved.to_dict() == progress.to_dict()
+    assert (saved.status, saved.days_done, saved.failed_days) == ("partial", 2, ["2024-06-02"])
+
+
+def test_job_cut_short_reports_interrupted(tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill, "_jobs", {})
+    backfill.save_progress(BackfillProgress(7, "station", "2024-06-01", "2024-06-03", status="running"),
+                           str(tmp_path))
+
+    assert get_progress(7, str(tmp_path)).status == "interrupted"
+    assert get_progress(8, str(tmp_path)) is None
+
+
+def test_rerun_only_fetches_failed_days(tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill, "_jobs", {})
+    first = BackfillProgress(7, "station", "2024-06-01", "2024-06-03")
+    run_backfill(FakeClient(failing={"2024-06-02"}), first, rate=1000, write_lines=lambda lines: None,
+                 checkpoint_dir=str(tmp_path))
+
+    second = run_backfill(FakeClient(), BackfillProgress(7, "station", "2024-06-01", "2024-06-03"), rate=1000,
+                          write_lines=lambda lines: None, checkpoint_dir=str(tmp_path))
+
+    assert (second.status, second.days_skipped, second.days_done) == ("completed", 2, 1)
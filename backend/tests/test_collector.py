@@ -0,0 +1,42 @@
+import pytest
+
+from collector import Driver, InverterMap, Reading, readings_to_lines
+from line_protocol import parse_line
+from scraper import GoodWeDriver, driver_from_config
+
+
+class NoFactory(Driver):
+    def login(self):
+        return True
+
+    def discover(self):
+        return []
+
+    def poll(self, target):
+        return None
+
+    def parse(self, payloads):
+        return []
+
+
+def test_drivers_must_implement_from_config():
+    with pytest.raises(TypeError):
+        NoFactory()
+
+
+def test_driver_from_config_picks_the_mode():
+    sems = {"username": "user", "password": "password", "region": "eu"}
+    assert type(driver_from_config({"sems": sems})) is GoodWeDriver
+    local = driver_from_config({"settings": {"mode": "local", "local": {"hosts": [{"host": "10.0.0.2"}]}}})
+    assert local.name == "goodwe_local" and local.inverters[0].host == "10.0.0.2"
+
+
+def test_readings_are_tagged_with_mapped_inverter_ids():
+    readings = [Reading("SN 1", [1500, 3.2, None, float("nan"), "x"], True), Reading("SN2", [0] * 5, False)]
+
+    lines = readings_to_lines(readings, 10**18, InverterMap([{"id": 7, "sn": "SN 1"}]))
+
+    assert len(lines) == 1  # SN2 belongs to no configured inverter
+    measurement, tags, fields, timestamp = parse_line(lines[0])
+    assert (measurement, tags, timestamp) == ("inverter_status", {"inverter_id": "7", "inverter_sn": "SN 1"}, 10**18)
+    assert fields == {"current_power": 1500.0, "daily_energy": 3.2, "online": 1.0}
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pytest
+
+from config_schema import compile_schema
+from template_manager import TemplateManager
+
+TEMPLATES = Path(__file__).resolve().parents[2] / "templates"
+
+SCHEMA = {
+    "sems": {"username": "string", "password": {"type": "string", "allow_empty": True}},
+    "settings": {
+        "interval": {"type": "integer", "minimum": 30, "maximum": 86400},
+        "timezone": {"type": "string", "format": "timezone"},
+        "mode": {"type": "string", "enum": ["cloud", "local"], "required": False},
+    },
+}
+
+
+def errors_of(validator, config):
+    return [(error.field, error.message) for error in validator.validate(config)]
+
+
+@pytest.fixture
+def validator():
+    compiled, errors = compile_schema(SCHEMA)
+    assert errors == []
+    return compiled
+
+
+def test_valid_config(validator):
+    config = {"sems": {"username": "u", "password": ""}, "settings": {"interval": 300, "timezone": "Australia/Perth"}}
+    assert validator.validate(config) == []
+
+
+def test_every_problem_is_reported(validator):
+    config = {"sems": {"username": "  ", "password": None},
+              "settings": {"interval": True, "timezone": "Mars/Olympus", "mode": "hybrid"}}
+    assert errors_of(validator, config) == [
+        ("sems.username", "must not be empty"),
+        ("sems.password", "missing field"),
+        ("settings.interval", "expected integer, got boolean"),
+        ("settings.timezone", "unknown IANA timezone 'Mars/Olympus'"),
+        ("settings.mode", "must be one of ['cloud', 'local']"),
+    ]
+
+
+def test_missing_sections_and_bounds(validator):
+    assert errors_of(validator, {"settings": {"interval": 10, "timezone": "UTC"}}) == [
+        ("sems", "missing section"), ("settings.interval", "must be >= 30")
+    ]
+    assert errors_of(validator, []) == [("", "config must be an object")]
+
+
+def test_schema_errors():
+    compiled, errors = compile_schema({"a": {"x": "text", "y": {"type": "string", "minimum": 1, "nope": 1},
+                                             "z": {"type": "integer", "format": "email"}}})
+    assert compiled is None
+    assert errors == [
+        "config_schema.a.x: unknown type 'text'",
+        "config_schema.a.y: unknown keys ['nope']",
+        "config_schema.a.y: minimum only applies to integer and number fields",
+        "config_schema.a.z: unknown format 'email'",
+    ]
+
+
+def test_shipped_templates_compile_and_accept_account_configs():
+    from main import ContainerManager
+    from models import Inverter, SemsAccount
+
+    manager = TemplateManager(str(TEMPLATES))
+    names = manager.get_template_types()
+    assert "goodwe" in names
+    for name in names:
+        assert manager.get_entry(name).validator is not None, name
+
+    account = SemsAccount(id=1, username="owner", password="secret", region="au")
+    inverters = [Inverter(id=1, name="roof", inverter_sn="SN1", timezone="Australia/Perth", interval=300)]
+    assert manager.config_errors("goodwe", ContainerManager.build_account_config(account, inverters)) == []
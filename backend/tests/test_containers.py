@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from models import Inverter, SemsAccount
+
+
+@pytest.fixture
+def stopped(monkeypatch):
+    stopped = []
+    monkeypatch.setattr(main.container_manager, "stop_container", stopped.append)
+    return stopped
+
+
+@pytest.fixture
+def account(db, stopped):
+    account = SemsAccount(username="owner", password="secret", region="au", container_id="old")
+    account.inverters = [Inverter(name=f"inv{i}", inverter_type="goodwe", status="active", container_id="old")
+                         for i in range(2)]
+    db.add(account)
+    db.commit()
+    return account
+
+
+def test_stop_commits_error_state_when_restart_fails(db, account, stopped, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("image build failed")
+    monkeypatch.setattr(main.container_manager, "create_account_container", fail)
+    stopping, sibling = account.inverters
+
+    with pytest.raises(HTTPException):
+        main.stop_inverter(stopping.id, db)
+
+    db.rollback()  # Anything left uncommitted would be lost here
+    assert stopped == ["old"]
+    assert account.container_id is None
+    assert (stopping.status, stopping.container_id) == ("inactive", None)
+    assert (sibling.status, sibling.container_id) == ("error", None)
+
+
+def test_stop_restarts_remaining_inverters(db, account, monkeypatch):
+    monkeypatch.setattr(main.container_manager, "create_account_container",
+                        lambda account, inverters: "new")
+    stopping, sibling = account.inverters
+
+    assert main.stop_inverter(stopping.id, db) == {"message": "Container stopped"}
+
+    db.rollback()
+    assert account.container_id == "new"
+    assert (stopping.status, sibling.status, sibling.container_id) == ("inactive", "active", "new")
+
+
+def test_delete_keeps_error_state_when_restart_fails(db, account, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("docker unavailable")
+    monkeypatch.setattr(main.container_manager, "create_account_container", fail)
+    deleted, sibling = account.inverters
+    deleted_id = deleted.id
+
+    main.delete_inverter(deleted_id, db)
+
+    assert db.get(Inverter, deleted_id) is None
+    assert (sibling.status, sibling.container_id) == ("error", None)
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_background_jobs_start_only_when_enabled(monkeypatch, enabled):
+    started = []
+    for job in (main.gap_detector, main.alert_engine, main.peer_performance, main.forecast_job,
+                main.control_queue, main.curtailer):
+        monkeypatch.setattr(job, "start", lambda job=job: started.append(job))
+    monkeypatch.setattr(main, "BACKGROUND_JOBS", enabled)
+    monkeypatch.setattr(main.engine, "dispose", lambda: None)
+
+    async def run():
+        async with main.lifespan(main.app):
+            pass
+    asyncio.run(run())
+
+    assert len(started) == (6 if enabled else 0)
@@ -0,0 +1,85 @@
+import pytest
+
+import curtailment
+from curtailment import PropertyControl, Sample, load_controls, simulate
+from models import ControlCommand, Device, DeviceType, Inverter, Property
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    for name, value in (("CURTAIL_TRIGGER_SAMPLES", 2), ("CURTAIL_RESTORE_SAMPLES", 3), ("CURTAIL_HOLD_SECONDS", 60),
+                        ("CURTAIL_HYSTERESIS", 0.1), ("CURTAIL_STALE_SECONDS", 120)):
+        monkeypatch.setattr(curtailment, name, value)
+
+
+def feed(control, readings, start=0.0, step=10.0):
+    """(exporting, producing) readings at ``step`` seconds; returns (time, action) of each action"""
+    actions = []
+    for i, (exporting, producing) in enumerate(readings):
+        at = start + i * step
+        action = control.step(Sample(at, exporting, producing), at)
+        if action:
+            actions.append((at, action))
+    return actions
+
+
+def test_switches_off_enough_inverters_after_the_trigger_samples():
+    control = PropertyControl(1, 3000, [1, 2, 3, 4])
+    # 2500 W over the cap with 1000 W per inverter: three inverters
+    assert feed(control, [(5500, 4000), (5500, 4000)]) == [(10.0, ("off", [2, 3, 4]))]
+    assert control.running == [1]
+    assert [inverter_id for inverter_id, _ in control.curtailed] == [4, 3, 2]
+
+
+def test_single_sample_over_the_cap_does_nothing():
+    control = PropertyControl(1, 3000, [1, 2])
+    assert feed(control, [(5000, 4000), (2000, 3000), (5000, 4000)]) == []
+
+
+def test_restores_last_off_first_after_hold_and_hysteresis():
+    control = PropertyControl(1, 3000, [1, 2])
+    assert feed(control, [(4000, 4000), (4000, 4000)]) == [(10.0, ("off", [2]))]
+    # Export plus the 2000 W share must stay under 2700 W; 1000 W does not, 500 W does
+    actions = feed(control, [(1000, 2000)] * 3 + [(500, 2000)] * 8, start=20.0)
+    # Three samples under the cap from 50 s, but the hold lasts until 70 s
+    assert actions == [(70.0, ("on", [2]))]
+    assert control.curtailed == []
+
+
+def test_stale_and_repeated_samples_are_ignored():
+    control = PropertyControl(1, 3000, [1, 2])
+    assert control.step(Sample(0.0, 9000, 9000), 500.0) is None
+    control.step(Sample(600.0, 9000, 9000), 600.0)
+    assert control.step(Sample(600.0, 9000, 9000), 610.0) is None
+    assert control.over == 1
+
+
+def test_simulation_keeps_export_near_the_cap():
+    samples = [Sample(i * 10.0, 6000.0, 8000.0) for i in range(60)]
+    result = simulate(samples, 3000, 4)
+    # 3000 W over with 2000 W per inverter: two off once two samples agree, then no more commands
+    assert (result.commands, result.inverter_switches) == (1, 2)
+    assert result.seconds_over_limit == 10.0
+    assert result.curtailed_energy_wh == pytest.approx(4000 * 580 / 3600)
+
+
+def test_load_controls_leaves_operator_switched_inverters_alone(db):
+    prop = Property(property_name="home", export_limit_w=3000)
+    db.add(prop)
+    db.flush()
+    inverters = [Inverter(name=f"inv{i}", inverter_sn=f"SN{i}") for i in range(3)]
+    db.add_all(inverters)
+    db.add_all(Device(device_name=f"inv{i}", device_id=f"SN{i}", device_type=DeviceType.INVERTER,
+                      property_id=prop.id) for i in range(3))
+    db.flush()
+    db.add_all([
+        ControlCommand(inverter_id=inverters[1].id, batch_id="a", action="off", source="curtailment", status="confirmed"),
+        ControlCommand(inverter_id=inverters[2].id, batch_id="b", action="off", source="api", status="confirmed"),
+    ])
+    db.commit()
+
+    control = load_controls(db, {})[prop.id]
+
+    assert control.limit == 3000
+    assert control.inverter_ids == [inverters[0].id, inverters[1].id]
+    assert control.curtailed == [(inverters[1].id, None)]
@@ -0,0 +1,59 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from energy import counter_deltas
+from flux_query import COUNTER_DELTAS, FluxRunner, FluxTemplate, SORT_BY_TIME, fields, tag_equals
+
+# (reading, energy since the previous reading) of one counter
+COUNTER = [
+    (100.0, 0.0),   # first sample
+    (102.5, 2.5),
+    (102.0, 0.0),   # small drop: noise, not paid twice
+    (104.0, 2.0),
+    (3.0, 3.0),     # reset: the new reading is the energy since
+    (5.0, 2.0),
+    (5.0, 0.0),
+]
+
+
+def test_counter_deltas_fixture():
+    readings, expected = zip(*COUNTER)
+    assert counter_deltas(readings).tolist() == list(expected)
+
+
+def test_counter_deltas_keep_series_apart_and_fill_gaps():
+    deltas = counter_deltas([10.0, np.nan, 12.0, 50.0, 51.0], series=["a", "a", "a", "b", "b"])
+    assert deltas.tolist() == [0.0, 0.0, 2.0, 0.0, 1.0]
+
+
+def test_counter_deltas_rollover():
+    assert counter_deltas([65530.0, 4.0], rollover=65536).tolist() == [0.0, 10.0]
+
+
+@pytest.mark.skipif(not os.getenv("INFLUXDB_TEST_URL"),
+                    reason="set INFLUXDB_TEST_URL, INFLUXDB_TEST_TOKEN, INFLUXDB_TEST_ORG and INFLUXDB_TEST_BUCKET")
+def test_flux_counter_deltas_match_numpy():
+    from influxdb_client import InfluxDBClient, WritePrecision
+    from influxdb_client.client.write_api import SYNCHRONOUS
+
+    bucket, org = os.environ["INFLUXDB_TEST_BUCKET"], os.environ["INFLUXDB_TEST_ORG"]
+    series = uuid.uuid4().hex
+    start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+    lines = [f"energy_test,series={series} counter={reading} {int((start + timedelta(minutes=i)).timestamp())}"
+             for i, (reading, _) in enumerate(COUNTER)]
+    template = FluxTemplate("test.counter_deltas", "energy_test",
+                            (fields("counter"), tag_equals("series"), SORT_BY_TIME, COUNTER_DELTAS))
+
+    with InfluxDBClient(url=os.environ["INFLUXDB_TEST_URL"], token=os.environ["INFLUXDB_TEST_TOKEN"],
+                        org=org) as client:
+        client.write_api(write_options=SYNCHRONOUS).write(bucket=bucket, record=lines,
+                                                          write_precision=WritePrecision.S)
+        rows = FluxRunner(client.query_api(), bucket, org).rows(template, start, start + timedelta(hours=1),
+                                                                series=series)
+
+    # difference() drops the first row, where counter_deltas reports 0
+    assert [row["_value"] for row in rows] == [energy for _, energy in COUNTER[1:]]
@@ -0,0 +1,56 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from flux_query import (
+    FluxRunner, TEMPLATES, FORECAST_SERIES, HOME_METRICS_EXPORT, HOME_METRICS_LATEST, HOME_METRICS_SERIES,
+    INVERTER_ENERGY, INVERTER_PEAK_ENERGY, INVERTER_POWER, INVERTER_WINDOW_COUNTS, POWER_GENERATION_DEVICE,
+    POWER_GENERATION_ENERGY, POWER_GENERATION_SERIES, SERIES_COUNT, STATION_POWER, TAG_KEYS, TAG_VALUE_COUNT,
+)
+
+# Params each template is run with, as its callers bind them
+CALLS = {
+    POWER_GENERATION_SERIES: dict(property_id="1"),
+    POWER_GENERATION_DEVICE: dict(device_id="d1"),
+    POWER_GENERATION_ENERGY: dict(property_id="1", every="1d", timezone="Europe/Amsterdam"),
+    HOME_METRICS_SERIES: dict(property_id="1"),
+    HOME_METRICS_LATEST: dict(property_id="1"),
+    HOME_METRICS_EXPORT: dict(property_ids=["1", "2"]),
+    INVERTER_ENERGY: dict(serials=["SN1"], every="1h", timezone="UTC"),
+    INVERTER_PEAK_ENERGY: dict(serials=["SN1"], every="1h", q=0.99),
+    INVERTER_POWER: dict(inverter_id="1", every="5m"),
+    INVERTER_WINDOW_COUNTS: dict(inverter_ids=["1"], every="5m"),
+    STATION_POWER: dict(power_station_id="station", every="5m"),
+    FORECAST_SERIES: dict(property_id="1"),
+    SERIES_COUNT: dict(measurement="inverter_status"),
+    TAG_KEYS: dict(measurement="inverter_status"),
+    TAG_VALUE_COUNT: dict(measurement="inverter_status", tag="inverter_sn"),
+}
+
+# Bare identifiers starting with "_"; column names are quoted, read as r._name or set as {r with _name: ...}
+EXTERN_REFERENCE = re.compile(r'(?<![\w".])_[A-Za-z]\w*\b(?!"|\s*:)')
+
+
+@pytest.fixture(scope="module")
+def query_api():
+    from influxdb_client import InfluxDBClient
+    # Building a query does not connect
+    with InfluxDBClient(url="http://localhost:8086", token="token", org="org") as client:
+        yield client.query_api()
+
+
+def test_every_template_has_a_call():
+    assert set(CALLS) == set(TEMPLATES.values())
+
+
+@pytest.mark.parametrize("template", list(CALLS), ids=lambda template: template.name)
+def test_template_references_only_sent_externs(query_api, template):
+    runner = FluxRunner(query_api, "bucket")
+    params = runner._bind(CALLS[template], datetime(2024, 1, 1), timedelta(0))
+    query = query_api._create_query(template.text, params=params)
+
+    externs = {statement.assignment.id.name for statement in query.extern.body}
+    assert query.params is None
+    assert "params." not in template.text
+    assert set(EXTERN_REFERENCE.findall(template.text)) <= externs
@@ -0,0 +1,15 @@
+import sys
+
+import forecast
+
+
+def test_weather_model_is_optional(monkeypatch):
+    monkeypatch.setattr(forecast, "FORECAST_WEATHER_FILE", "weather.csv")
+    monkeypatch.setitem(sys.modules, "sklearn", None)  # import sklearn raises ImportError
+
+    assert forecast._weather_enabled() is False
+
+
+def test_weather_model_needs_a_weather_file(monkeypatch):
+    monkeypatch.setattr(forecast, "FORECAST_WEATHER_FILE", "")
+    assert forecast._weather_enabled() is False
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta, timezone
+
+from gap_detector import completeness, find_gaps, refetch_gaps, scan
+from models import Inverter, TelemetryGap
+
+NOW = datetime(2024, 6, 3, 0, 0)
+INTERVAL = 300
+
+
+def windows(counts, first_stop=datetime(2024, 6, 1, 0, 5)):
+    return [(first_stop + timedelta(seconds=INTERVAL * i), count) for i, count in enumerate(counts)]
+
+
+class FakeRunner:
+    """rows() of INVERTER_WINDOW_COUNTS: every window full except the ``empty`` indexes"""
+
+    def __init__(self, empty=()):
+        self.empty = set(empty)
+        self.queried = []
+
+    def rows(self, template, start, stop, inverter_ids, every):
+        self.queried.append(inverter_ids)
+        step = int(every.rstrip("s"))
+        count = int((stop - start).total_seconds() // step)
+        return [{"inverter_id": inverter_id,
+                 "_time": (start + timedelta(seconds=step * (i + 1))).replace(tzinfo=timezone.utc),
+                 "_value": 0 if i in self.empty else 1}
+                for inverter_id in inverter_ids for i in range(count)]
+
+
+def test_find_gaps_needs_factor_consecutive_empty_windows():
+    series = windows([1, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0])
+    gaps = find_gaps(series, INTERVAL, factor=3)
+    step = timedelta(seconds=INTERVAL)
+    assert gaps == [(series[4][0] - step, series[6][0]), (series[8][0] - step, series[11][0])]
+
+
+def test_find_gaps_and_completeness_of_empty_input():
+    assert find_gaps([], INTERVAL) == []
+    assert completeness([]) == 0.0
+    assert completeness(windows([1, 0, 1, 1])) == 75.0
+
+
+def test_scan_records_gaps_for_inverters_with_a_serial(db):
+    inverter = Inverter(name="tagged", inverter_sn="SN1", status="active", interval=INTERVAL,
+                        created_at=NOW - timedelta(days=7))
+    db.add(inverter)
+    db.commit()
+
+    result = scan(db, FakeRunner(empty=range(10, 14)), now=NOW)
+
+    assert 0 < result[inverter.id] < 100
+    gap = db.query(TelemetryGap).one()
+    assert (gap.inverter_id, gap.status) == (inverter.id, "open")
+
+
+def test_scan_skips_inverters_without_a_serial(db):
+    created = NOW - timedelta(days=7)
+    untagged = Inverter(name="untagged", status="active", interval=INTERVAL, created_at=created)
+    tagged = Inverter(name="tagged", inverter_sn="SN1", status="active", interval=INTERVAL, created_at=created)
+    db.add_all([untagged, tagged])
+    db.flush()
+    # Left behind by scans that did count it
+    db.add(TelemetryGap(inverter_id=untagged.id, start=NOW - timedelta(hours=2), end=NOW, status="open"))
+    db.commit()
+    runner = FakeRunner()
+
+    result = scan(db, runner, now=NOW)
+
+    assert result == {untagged.id: None, tagged.id: 100.0}
+    assert runner.queried == [[str(tagged.id)]]
+    gap = db.query(TelemetryGap).one()
+    assert (gap.inverter_id, gap.status) == (untagged.id, "unfillable")
+
+
+class FakeClient:
+    def __init__(self):
+        self.fetched = []
+
+    def get_plant_power_chart(self, station, day):
+        self.fetched.append(station)
+        return [{"x": "12:00", "y": 1500}]
+
+
+def test_refetch_fills_only_inverters_alone_at_their_station(db):
+    alone = Inverter(name="alone", inverter_sn="SN1", power_station_id="home", sems_username="user")
+    shared = [Inverter(name=f"shared{i}", inverter_sn=f"SN{i}", power_station_id="farm", sems_username="user")
+              for i in (2, 3)]
+    db.add_all([alone, *shared])
+    db.flush()
+    gap_start, gap_end = datetime(2024, 6, 1, 11), datetime(2024, 6, 1, 13)
+    for inverter in (alone, shared[0]):
+        db.add(TelemetryGap(inverter_id=inverter.id, start=gap_start, end=gap_end, status="open"))
+    db.commit()
+    client, written = FakeClient(), []
+
+    filled = refetch_gaps(db, lambda username, password: client, written.extend, rate=1000)
+
+    assert (filled, client.fetched, len(written)) == (1, ["home"], 1)
+    statuses = {gap.inverter_id: gap.status for gap in db.query(TelemetryGap)}
+    assert statuses == {alone.id: "filled", shared[0].id: "unfillable"}
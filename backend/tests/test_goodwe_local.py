@@ -0,0 +1,43 @@
+import pytest
+
+from fake_goodwe_local import FakeLocalFleet
+from local import GoodWeLocalDriver, crc16, decode, register_blocks
+
+
+def test_crc16_matches_the_modbus_reference():
+    # Read holding registers 0..9 of unit 1; the CRC goes on the wire low byte first
+    assert crc16(bytes.fromhex("01030000000a")).to_bytes(2, "little") == bytes.fromhex("c5cd")
+    assert crc16(b"") == 0xFFFF
+
+
+def test_register_blocks_merge_close_spans_only():
+    assert register_blocks([(35138, 1), (35187, 1), (35191, 2), (35193, 2), (35197, 2)]) == [(35138, 61)]
+    assert register_blocks([(100, 1), (300, 2)]) == [(100, 1), (300, 2)]
+    # A block never exceeds the largest read a request may ask for
+    assert register_blocks([(0, 2), (60, 2), (120, 2)], max_gap=64, max_block=100) == [(0, 62), (120, 2)]
+
+
+def test_decode_types_and_scale():
+    registers = {10: 0xFFFE, 11: 0x0001, 12: 0x0002, 13: 3}
+    assert decode(registers, 10, "int16") == -2
+    assert decode(registers, 10, "uint16") == 0xFFFE
+    assert decode(registers, 11, "uint32", 0.1) == 6553.8
+    assert decode(registers, 13, "uint16", 0.1) == 0.3
+    assert decode(registers, 13, "uint32") is None  # 14 was not read
+
+
+@pytest.mark.parametrize("protocol", ["modbus_tcp", "udp"])
+def test_driver_polls_the_simulated_inverters(protocol):
+    with FakeLocalFleet(2, protocol) as fleet:
+        driver = GoodWeLocalDriver.from_config({"settings": {"local": {"hosts": fleet.hosts(), "timeout": 1}}})
+        try:
+            assert driver.login()
+            payloads = [driver.poll(target) for target in driver.discover()]
+        finally:
+            driver.close()
+
+    readings = driver.parse(payloads)
+    assert [reading.serial for reading in readings] == [inverter.serial for inverter in fleet.inverters]
+    # One read for the serial and one block for the running data per inverter
+    assert [inverter.reads for inverter in fleet.inverters] == [2, 2]
+    assert readings[0].values[2] is None  # No register for monthly energy
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from line_protocol import escape_tag, parse_line, serialize_columns, to_float_column
+
+
+def test_serialize_columns_matches_the_point_builder_format():
+    lines = serialize_columns(
+        "inverter_status",
+        {"inverter_sn": ["SN 1", "SN2"], "inverter_id": ["7", ""]},
+        {"current_power": np.array([1500.0, 0.25]), "online": np.array([1.0, 0.0])},
+        np.array([10, 20], dtype=np.int64),
+    )
+    assert lines == [
+        r"inverter_status,inverter_id=7,inverter_sn=SN\ 1 current_power=1500,online=1 10",
+        "inverter_status,inverter_sn=SN2 current_power=0.25,online=0 20",
+    ]
+
+
+def test_non_finite_fields_are_skipped_and_empty_rows_dropped():
+    lines = serialize_columns(
+        "m", {}, {"a": np.array([np.nan, 1.0, np.nan]), "b": np.array([2.0, np.inf, np.nan])},
+        np.array([1, 2, 3]),
+    )
+    assert lines == ["m b=2 1", "m a=1 2"]
+
+
+def test_to_float_column_and_escaping():
+    assert np.isnan(to_float_column(["1.5", None, "x"])[1:]).all()
+    assert to_float_column(["1.5", 2])[0] == 1.5
+    assert escape_tag("a,b=c d") == r"a\,b\=c\ d"
+    assert escape_tag("trailing\\") == "trailing\\ "
+
+
+def test_parse_line_round_trips_serialized_points():
+    line = serialize_columns("inverter_status", {"inverter_sn": ["SN,1 x"]},
+                             {"current_power": np.array([12.5])}, np.array([99]))[0]
+    assert parse_line(line) == ("inverter_status", {"inverter_sn": "SN,1 x"}, {"current_power": 12.5}, 99)
+
+
+def test_parse_line_field_types_and_missing_timestamp():
+    measurement, tags, fields, timestamp = parse_line('m,t=a i=3i,u=4u,b=t,s="x \\"y\\", z",f=1.5')
+    assert (measurement, tags, timestamp) == ("m", {"t": "a"}, None)
+    assert fields == {"i": 3, "u": 4, "b": True, "s": 'x "y", z', "f": 1.5}
+
+
+@pytest.mark.parametrize("line", ["measurement_only", "m f=", "m f=1,g= 10", 'm s="'])
+def test_parse_line_rejects_malformed_lines(line):
+    with pytest.raises(ValueError):
+        parse_line(line)
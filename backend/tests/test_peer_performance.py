@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+
+import peer_performance
+from peer_performance import CapacityEstimates
+
+NOW = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+
+
+class PeakRunner:
+    """INVERTER_PEAK_ENERGY rows for the serials that have data"""
+
+    def __init__(self, peaks):
+        self.peaks = peaks
+        self.queried = []
+
+    def rows(self, template, start, stop, serials, every, q):
+        self.queried.append(list(serials))
+        return [{"inverter_sn": serial, "_value": self.peaks[serial]} for serial in serials if serial in self.peaks]
+
+
+def test_serials_without_data_are_not_queried_again():
+    runner = PeakRunner({"A": 4.2})
+    capacities = CapacityEstimates()
+
+    assert capacities.get(runner, ["A", "NEW"], NOW) == {"A": 4.2}
+    assert capacities.get(runner, ["A", "NEW"], NOW) == {"A": 4.2}
+    assert runner.queried == [["A", "NEW"]]
+
+
+def test_only_unseen_serials_are_queried_until_the_daily_refresh(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(peer_performance.time, "monotonic", lambda: clock[0])
+    runner = PeakRunner({"A": 4.2, "B": 3.0})
+    capacities = CapacityEstimates(ttl=86400)
+
+    capacities.get(runner, ["A"], NOW)
+    capacities.get(runner, ["A", "B"], NOW)
+    clock[0] += 86401
+    capacities.get(runner, ["A", "B"], NOW)
+
+    assert runner.queried == [["A"], ["B"], ["A", "B"]]
@@ -0,0 +1,19 @@
+import time
+
+from backfill import RateLimiter
+
+
+def elapsed_for(limiter: RateLimiter, count: int) -> float:
+    start = time.monotonic()
+    for _ in range(count):
+        limiter.acquire()
+    return time.monotonic() - start
+
+
+def test_full_bucket_allows_an_initial_burst():
+    assert elapsed_for(RateLimiter(50), 50) < 0.1
+
+
+def test_burst_of_one_spaces_requests_from_the_start():
+    # 11 requests at 50/s: the first goes at once, the other ten 20 ms apart
+    assert elapsed_for(RateLimiter(50, burst=1), 11) >= 0.19
@@ -0,0 +1,109 @@
+import pytest
+from influxdb_client.rest import ApiException
+
+from collector import Collector, RejectedBatch, WriteAheadLog
+from scraper import GoodWeDriver
+
+
+class Sink:
+    """write_batch stand-in that fails, rejects or accepts batches on demand"""
+
+    def __init__(self):
+        self.written = []
+        self.error = None
+
+    def __call__(self, lines):
+        if self.error is not None:
+            raise self.error
+        self.written.extend(lines)
+
+
+@pytest.fixture
+def sink():
+    return Sink()
+
+
+def test_replays_in_order_after_an_outage(tmp_path, sink):
+    wal = WriteAheadLog(str(tmp_path))
+    sink.error = ConnectionError("influxdb down")
+    wal.append(["a 1"])
+    assert not wal.replay(sink)
+    wal.append(["b 2", "c 3"])
+    assert not wal.replay(sink)
+    assert wal.pending_lines == 3
+
+    sink.error = None
+    assert wal.replay(sink)
+    assert sink.written == ["a 1", "b 2", "c 3"]
+    assert wal.pending_lines == 0
+
+
+def test_pending_points_survive_a_restart(tmp_path, sink):
+    wal = WriteAheadLog(str(tmp_path))
+    wal.append(["a 1", "b 2"])
+    wal.active.close()
+
+    reopened = WriteAheadLog(str(tmp_path))
+    assert reopened.pending_lines == 2
+    assert reopened.replay(sink)
+    assert sink.written == ["a 1", "b 2"]
+
+
+def test_partial_tail_is_truncated_on_open(tmp_path, sink):
+    wal = WriteAheadLog(str(tmp_path))
+    wal.append(["a 1"])
+    wal.active.write(b"b 2 partia")
+    wal.active.close()
+
+    reopened = WriteAheadLog(str(tmp_path))
+    assert reopened.replay(sink)
+    assert sink.written == ["a 1"]
+
+
+def test_rejected_batch_is_set_aside_and_replay_moves_on(tmp_path, sink):
+    wal = WriteAheadLog(str(tmp_path), replay_batch=1)
+    wal.append(["bad line"])
+    sink.error = RejectedBatch("HTTP 400: unable to parse")
+    assert wal.replay(sink)
+    assert wal.pending_lines == 0
+    assert (tmp_path / WriteAheadLog.REJECTED_NAME).read_text() == "bad line\n"
+
+    sink.error = None
+    wal.append(["good 1"])
+    assert wal.replay(sink)
+    assert sink.written == ["good 1"]
+
+
+def test_cap_applies_below_the_segment_size(tmp_path, sink):
+    # A 4 KiB cap with the default 4 MiB segments: old points must still be dropped
+    wal = WriteAheadLog(str(tmp_path), max_bytes=4096)
+    sink.error = ConnectionError("influxdb down")
+    for i in range(200):
+        wal.append([f"inverter_status current_power={i} {i}"])
+        wal.replay(sink)
+
+    assert wal.size_bytes() <= 4096
+    assert 0 < wal.pending_lines < 200
+
+    sink.error = None
+    assert wal.replay(sink)
+    # What survived the cap is the newest points, still in order
+    timestamps = [int(line.rsplit(" ", 1)[1]) for line in sink.written]
+    assert timestamps == list(range(timestamps[0], 200))
+
+
+def test_collector_maps_influx_rejections(tmp_path):
+    class WriteApi:
+        def __init__(self, status):
+            self.status = status
+
+        def write(self, **kwargs):
+            raise ApiException(status=self.status, reason="refused")
+
+    collector = Collector(GoodWeDriver("user", "password"), {"bucket": "b", "org": "o"})
+    collector._write_api = WriteApi(422)
+    with pytest.raises(RejectedBatch):
+        collector._write_batch(["x v=1"])
+    collector._write_api = WriteApi(503)
+    with pytest.raises(ApiException):
+        collector._write_batch(["x v=1"])
@@ -0,0 +1,150 @@
+"""Opt-in OpenTelemetry tracing and per-request sampling profiler.
+
+Both are off unless configured through the environment:
+
+- ``TRACING_EXPORTER``: ``file`` (JSON spans appended to ``TRACING_FILE``) or ``otlp``
+  (OTLP/HTTP to ``OTEL_EXPORTER_OTLP_ENDPOINT``, e.g. a local collector)
+- ``PROFILING_ENABLED=1``: requests sent with ``X-Profile: 1`` are run under pyinstrument
+  and the HTML flamegraph is written to ``PROFILE_DIR``. ``PROFILE_SLOW_MS`` additionally
+  keeps a profile for any request slower than that many milliseconds.
+
+The opentelemetry and pyinstrument packages are only imported when enabled.
+"""
+import functools
+import inspect
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "/app/traces/spans.jsonl")
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/app/profiles"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+
+_tracer = None
+# Set by the middleware for requests that should be profiled, filled in by the endpoint wrapper
+_profile_request: ContextVar[Optional[dict]] = ContextVar("profile_request", default=None)
+
+
+def setup_tracing(service_name: str = "solar-backend"):
+    """Install a tracer provider for the configured exporter; no-op when tracing is off"""
+    global _tracer
+    if not TRACING_EXPORTER:
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+        if TRACING_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        elif TRACING_EXPORTER == "file":
+            Path(TRACING_FILE).parent.mkdir(parents=True, exist_ok=True)
+            out = open(TRACING_FILE, "a", buffering=1)
+            exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+        else:
+            logger.warning(f"Unknown TRACING_EXPORTER '{TRACING_EXPORTER}', tracing disabled")
+            return None
+    except ImportError as e:
+        logger.warning(f"Tracing requested but OpenTelemetry is not installed: {e}")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer(service_name)
+    logger.info(f"Tracing enabled with '{TRACING_EXPORTER}' exporter")
+    return _tracer
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current request; costs nothing when tracing is off"""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+async def tracing_middleware(request: Request, call_next):
+    """Root span per request; arms the profiler for the endpoint when asked to"""
+    profile = None
+    if PROFILING_ENABLED and (request.headers.get("x-profile") == "1" or PROFILE_SLOW_MS > 0):
+        profile = {"profiler": None}
+        _profile_request.set(profile)
+
+    start = time.perf_counter()
+    try:
+        with span(f"{request.method} {request.url.path}", **{"http.method": request.method,
+                                                              "http.target": request.url.path}) as current:
+            response = await call_next(request)
+            if current is not None:
+                current.set_attribute("http.status_code", response.status_code)
+                route = request.scope.get("route")
+                if route is not None:
+                    current.update_name(f"{request.method} {route.path}")
+            return response
+    finally:
+        if profile and profile["profiler"] is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if request.headers.get("x-profile") == "1" or elapsed_ms >= PROFILE_SLOW_MS:
+                write_profile(profile["profiler"], request, elapsed_ms)
+
+
+def _profiled(endpoint):
+    """Run the endpoint under pyinstrument when the middleware armed this request.
+
+    Sync endpoints execute in FastAPI's threadpool, so the profiler has to start inside
+    the endpoint call rather than in the middleware to sample the right thread.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profile = _profile_request.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            from pyinstrument import Profiler
+            profile["profiler"] = profiler = Profiler(async_mode="enabled")
+            with profiler:
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profile = _profile_request.get()
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            from pyinstrument import Profiler
+            profile["profiler"] = profiler = Profiler(async_mode="disabled")
+            with profiler:
+                return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled per request"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        if PROFILING_ENABLED:
+            self.dependant.call = _profiled(self.dependant.call)
+
+
+def write_profile(profiler, request: Request, elapsed_ms: float):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    slug = request.url.path.strip("/").replace("/", "_") or "root"
+    path = PROFILE_DIR / f"{time.strftime('%Y%m%dT%H%M%S')}_{request.method}_{slug}_{elapsed_ms:.0f}ms.html"
+    path.write_text(profiler.output_html())
+    logger.info(f"Wrote profile for {request.method} {request.url.path} ({elapsed_ms:.0f} ms) to {path}")
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""API load test and latency regression check for the backend.
+
+Seeds a scratch SQLite (or ``--database-url`` Postgres) database with synthetic
+users/properties/devices/inverters, points the app at a local InfluxDB stub, serves
+``backend/main.py`` with uvicorn on 127.0.0.1 and drives list, detail, query and ingest
+endpoints at increasing concurrency. Per-endpoint throughput and tail latency go to JSON;
+with ``--baseline`` the run fails when any endpoint regresses beyond ``--tolerance``.
+
+    python benchmarks/api_load.py --concurrency 1,8,32 --output api_load.json \\
+        --baseline benchmarks/baselines/api_load.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+
+from influx_sink import LineProtocolSink  # noqa: E402
+
+
+def annotated_csv(columns: List[Tuple[str, str]], group: List[str], rows: List[List[str]]) -> str:
+    """One annotated CSV table block as returned by /api/v2/query"""
+    names = ["", "result", "table"] + [name for name, _ in columns]
+    lines = [
+        ",".join(["#datatype", "string", "long"] + [datatype for _, datatype in columns]),
+        ",".join(["#group", "false", "false"] + ["true" if name in group else "false" for name, _ in columns]),
+        ",".join(["#default", "_result", ""] + [""] * len(columns)),
+        ",".join(names),
+    ]
+    lines.extend(",".join(["", "", str(table)] + row) for table, row in rows)
+    return "\r\n".join(lines) + "\r\n\r\n"
+
+
+class FluxStub:
+    """Canned annotated CSV answers for the Flux the API sends"""
+
+    def __init__(self, points_per_day: int = 288):
+        self.points_per_day = points_per_day
+        now = datetime.utcnow().replace(microsecond=0)
+        self.start = (now - timedelta(days=1)).isoformat() + "Z"
+        self.stop = now.isoformat() + "Z"
+        step = timedelta(days=1) / points_per_day
+        self.times = [(now - timedelta(days=1) + step * i).isoformat() + "Z" for i in range(points_per_day)]
+
+    def __call__(self, query: str) -> str:
+        if '"power_generation"' in query:
+            return self.power_generation()
+        if '"home_metrics"' in query:
+            return self.home_metrics()
+        return "\r\n"
+
+    def power_generation(self) -> str:
+        columns = [("_start", "dateTime:RFC3339"), ("_stop", "dateTime:RFC3339"), ("_time", "dateTime:RFC3339"),
+                   ("_measurement", "string"), ("property_id", "string"),
+                   ("earning", "double"), ("power_generation", "double"), ("used", "double")]
+        rows = [(0, [self.start, self.stop, t, "power_generation", "1", f"{i * 0.01:.2f}", f"{i * 0.1:.1f}",
+                     f"{i * 0.05:.2f}"]) for i, t in enumerate(self.times)]
+        return annotated_csv(columns, ["_start", "_stop"], rows)
+
+    def home_metrics(self) -> str:
+        blocks = []
+        for table, (field, datatype, value) in enumerate([
+            ("producing", "double", "3.2"), ("consuming", "double", "1.1"), ("charging", "double", "0.4"),
+            ("exporting", "double", "1.7"), ("rain_percentage", "double", "20"), ("climate", "string", "sunny"),
+        ]):
+            columns = [("_start", "dateTime:RFC3339"), ("_stop", "dateTime:RFC3339"), ("_time", "dateTime:RFC3339"),
+                       ("_value", datatype), ("_field", "string"), ("_measurement", "string"), ("property_id", "string")]
+            rows = [(table, [self.start, self.stop, self.stop, value, field, "home_metrics", "1"])]
+            blocks.append(annotated_csv(columns, ["_start", "_stop", "_field", "_measurement", "property_id"], rows))
+        return "".join(blocks)
+
+
+def seed(database_url: str, args) -> Dict[str, int]:
+    """Create tables and insert a reproducible synthetic fleet"""
+    import database
+    import models
+    from sqlalchemy import insert
+
+    # Scratch database, so skip Alembic and create the tables directly
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    with database.SessionLocal() as db:
+        db.execute(insert(models.User), [
+            {"id": i, "firstname": f"User{i}", "lastname": "Load", "address": f"{i} Solar St", "age": 20 + i % 60,
+             "gender": ("male", "female", "other")[i % 3], "is_active": True, "created_at": now, "updated_at": now}
+            for i in range(1, args.users + 1)
+        ])
+        db.execute(insert(models.Property), [
+            {"id": i, "property_name": f"Property {i}", "property_type": "residential", "address": f"{i} Panel Rd",
+             "latitude": rng.uniform(-38, -27), "longitude": rng.uniform(140, 153), "total_earnings": 0.0,
+             "total_generation": 0.0, "total_used": 0.0, "user_id": 1 + i % args.users,
+             "created_at": now, "updated_at": now}
+            for i in range(1, args.properties + 1)
+        ])
+        db.execute(insert(models.Device), [
+            {"id": i, "device_name": f"Device {i}", "device_id": f"dev-{i:06d}", "device_type": "inverter",
+             "device_status": "active", "device_address": f"{i} Panel Rd", "power_produced": 0.0,
+             "device_latitude": 0.0, "device_longitude": 0.0, "user_id": 1 + i % args.users,
+             "property_id": 1 + i % args.properties, "created_at": now, "updated_at": now}
+            for i in range(1, args.devices + 1)
+        ])
+        db.execute(insert(models.Inverter), [
+            {"id": i, "name": f"Inverter {i}", "inverter_type": "goodwe", "region": "au", "timezone": "UTC",
+             "sems_username": f"load-{i}@example.com", "sems_password": "x", "status": "inactive",
+             "created_at": now, "last_update": now, "interval": 300}
+            for i in range(1, args.inverters + 1)
+        ])
+        db.commit()
+    return {"users": args.users, "properties": args.properties, "devices": args.devices, "inverters": args.inverters}
+
+
+def endpoints(args):
+    """(name, method, path factory, body factory) for every endpoint under test"""
+    pick = random.Random(args.seed)
+    today = datetime.utcnow().isoformat()
+
+    def power_generation_body():
+        return {"today_power_generation": 12.5, "today_date": today, "today_earning": 3.1, "today_used": 8.2,
+                "property_id": 1, "user_id": 1}
+
+    def home_metrics_body():
+        return {"property_id": 1, "user_id": 1, "producing": 3.2, "consuming": 1.1, "charging": 0.4,
+                "exporting": 1.7, "climate": "sunny", "rain_percentage": 20.0}
+
+    return [
+        ("users_list", "GET", lambda: "/api/v1/users/", None),
+        ("user_detail", "GET", lambda: f"/api/v1/users/{pick.randint(1, args.users)}", None),
+        ("properties_list", "GET", lambda: "/api/v1/properties/", None),
+        ("property_detail", "GET", lambda: f"/api/v1/properties/{pick.randint(1, args.properties)}", None),
+        ("devices_list", "GET", lambda: "/api/v1/devices/", None),
+        ("device_detail", "GET", lambda: f"/api/v1/devices/{pick.randint(1, args.devices)}", None),
+        ("inverters_list", "GET", lambda: "/inverters", None),
+        ("inverter_detail", "GET", lambda: f"/inverters/{pick.randint(1, args.inverters)}", None),
+        ("power_generation", "GET", lambda: f"/api/v1/power-generation/{pick.randint(1, args.properties)}", None),
+        ("my_home", "GET", lambda: f"/api/v1/my-home/{pick.randint(1, args.properties)}", None),
+        ("ingest_power_generation", "POST",
+         lambda: f"/api/v1/power-generation/{pick.randint(1, args.properties)}", power_generation_body),
+        ("ingest_my_home", "POST", lambda: f"/api/v1/my-home/{pick.randint(1, args.properties)}", home_metrics_body),
+    ]
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_endpoint(port: int, method: str, paths: List[str], body_factory, concurrency: int) -> dict:
+    local = threading.local()
+
+    def request(path):
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        body = json.dumps(body_factory()) if body_factory else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            local.conn = None
+            ok = False
+        return time.perf_counter() - start, ok
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(request, paths))
+    wall = time.perf_counter() - wall_start
+
+    latencies = sorted(elapsed for elapsed, _ in results)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok in results if not ok),
+        "throughput_rps": round(len(results) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of the current run against a stored baseline"""
+    regressions = []
+    for name, levels in baseline.get("endpoints", {}).items():
+        for level, base in levels.items():
+            current = results["endpoints"].get(name, {}).get(level)
+            if current is None:
+                continue
+            if current["errors"] > base.get("errors", 0):
+                regressions.append(f"{name} @ {level}: errors {base.get('errors', 0)} -> {current['errors']}")
+            if current["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+                regressions.append(f"{name} @ {level}: p99 {base['p99_ms']}ms -> {current['p99_ms']}ms")
+            if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{name} @ {level}: throughput {base['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint per level")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--properties", type=int, default=500)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--inverters", type=int, default=500)
+    parser.add_argument("--endpoints", help="comma separated endpoint names to run (default: all)")
+    parser.add_argument("--points-per-day", type=int, default=288, help="rows returned by the Influx stub")
+    parser.add_argument("--database-url", help="Postgres URL of a scratch database (default: temporary SQLite)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run to --baseline")
+    args = parser.parse_args()
+    if args.update_baseline and not args.baseline:
+        parser.error("--update-baseline needs --baseline")
+    if args.baseline and not args.update_baseline and not os.path.exists(args.baseline):
+        # A gate that seeded its own baseline could never fail on a fresh checkout
+        parser.error(f"baseline {args.baseline} not found; create it with --update-baseline")
+
+    workdir = tempfile.mkdtemp(prefix="api-load-")
+    database_url = args.database_url or f"sqlite:///{workdir}/load.db"
+    sink = LineProtocolSink(query_handler=FluxStub(args.points_per_day)).start()
+
+    # The app reads these at import time
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["TEMPLATES_DIR"] = str(ROOT / "templates")
+    os.environ["CONTAINERS_DIR"] = os.path.join(workdir, "containers")
+    os.environ["INFLUXDB_URL"] = sink.url
+    logging.disable(logging.WARNING)
+
+    import uvicorn
+
+    dataset = seed(database_url, args)
+    import main as backend_main
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(backend_main.app, host="127.0.0.1", port=port,
+                                           log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    results = {"benchmark": "api_load", "dataset": dataset, "database": database_url.split(":", 1)[0],
+               "requests_per_level": args.requests, "endpoints": {}}
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    print(f"{'endpoint':<24} {'conc':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    try:
+        selected = set(args.endpoints.split(",")) if args.endpoints else None
+        for name, method, path_factory, body_factory in endpoints(args):
+            if selected and name not in selected:
+                continue
+            for level in levels:
+                paths = [path_factory() for _ in range(args.requests)]
+                stats = run_endpoint(port, method, paths, body_factory, level)
+                results["endpoints"].setdefault(name, {})[str(level)] = stats
+                print(f"{name:<24} {level:>4} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} "
+                      f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['errors']:>6}")
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        sink.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
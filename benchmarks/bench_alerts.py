@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark: alert rule evaluation cost per ingested inverter_status point.
+
+Seeds a scratch SQLite database with a fleet spread over peer groups, then feeds the alert
+engine polls the way scrapers forward them (one batch per account per poll) and reports the
+per-point cost for growing fleets. The cost should stay flat as the fleet grows.
+
+    python benchmarks/bench_alerts.py --inverters 1000,10000 --polls 20
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from alerts import AlertEngine, points_from_lines  # noqa: E402
+from models import Base, Inverter  # noqa: E402
+
+TIMEZONES = ["Australia/Sydney", "Australia/Perth", "Europe/Berlin", "America/Denver"]
+PER_ACCOUNT = 20
+
+
+def make_engine(inverters: int) -> AlertEngine:
+    db_engine = create_engine("sqlite://")
+    Base.metadata.create_all(db_engine)
+    with db_engine.begin() as connection:
+        connection.execute(insert(Inverter), [
+            {"id": i, "name": f"inv-{i}", "inverter_type": "goodwe", "region": "au",
+             "timezone": TIMEZONES[i % len(TIMEZONES)], "inverter_sn": f"GW{i:08d}", "interval": 300}
+            for i in range(1, inverters + 1)
+        ])
+    return AlertEngine(sessionmaker(bind=db_engine), sinks=[], check_interval=0)
+
+
+def poll_lines(inverters: int, poll: int, rng: random.Random):
+    """One poll of the fleet as per-account line protocol batches"""
+    timestamp_ns = int((datetime(2024, 1, 1, 2) + timedelta(minutes=5 * poll)).timestamp() * 1e9)
+    batches = []
+    for first in range(1, inverters + 1, PER_ACCOUNT):
+        lines = []
+        for i in range(first, min(first + PER_ACCOUNT, inverters + 1)):
+            # A few inverters are faulty: offline or producing a fraction of their peers
+            online = 0 if i % 500 == 0 else 1
+            power = rng.uniform(4000, 5000) * (0.1 if i % 333 == 0 else 1.0) * online
+            lines.append(f"inverter_status,inverter_id={i},inverter_sn=GW{i:08d} "
+                         f"current_power={power:.1f},online={online} {timestamp_ns}")
+        batches.append(lines)
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inverters", default="1000,10000", help="comma separated fleet sizes")
+    parser.add_argument("--polls", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"alert evaluation, {args.polls} polls per fleet (first poll loads state and is excluded)")
+    for inverters in [int(value) for value in args.inverters.split(",")]:
+        rng = random.Random(42)
+        engine = make_engine(inverters)
+        engine.observe(points_from_lines(line for batch in poll_lines(inverters, 0, rng) for line in batch))
+
+        parse = evaluate = 0.0
+        points = alerts = 0
+        for poll in range(1, args.polls):
+            for lines in poll_lines(inverters, poll, rng):
+                start = time.perf_counter()
+                batch = points_from_lines(lines)
+                parse += time.perf_counter() - start
+                start = time.perf_counter()
+                alerts += len(engine.observe(batch))
+                evaluate += time.perf_counter() - start
+                points += len(batch)
+        print(f"  {inverters:>6} inverters  parse {parse / points * 1e6:6.1f} us/point  "
+              f"evaluate {evaluate / points * 1e6:6.1f} us/point  {alerts} alert transitions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmark: switching a fleet off and back on through the control queue.
+
+Runs the queue against the fake portal (with latency and a delay before a switch shows in
+the inverter's status) on a scratch SQLite database and reports how long the fleet takes
+until every command was accepted by the portal and until every one was confirmed by
+read-back, with the portal requests that took.
+
+    python benchmarks/bench_control.py --inverters 500 --rate 50 --latency 0.05
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from sqlalchemy import create_engine, func  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from control import ControlQueue, submit  # noqa: E402
+from fake_sems import FakeFleet, FakeSEMSPortal  # noqa: E402
+from inverters.goodwe_sems import GoodWeSEMSClient  # noqa: E402
+from models import Base, ControlCommand, Inverter, SemsAccount  # noqa: E402
+
+PER_STATION = 10
+STATIONS_PER_ACCOUNT = 5
+
+
+def seed(session_factory, fleet: FakeFleet) -> None:
+    db = session_factory()
+    for username, stations in fleet.accounts.items():
+        account = SemsAccount(username=username, password="secret", region="au")
+        db.add(account)
+        for station in stations:
+            for serial in fleet.stations[station]:
+                db.add(Inverter(name=serial, inverter_type="goodwe", region="au", inverter_sn=serial,
+                                power_station_id=station, account=account))
+    db.commit()
+    db.close()
+
+
+def wait_for(session_factory, batch_id: str, statuses, total: int, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        db = session_factory()
+        done = db.query(func.count(ControlCommand.id)).filter(
+            ControlCommand.batch_id == batch_id, ControlCommand.status.in_(statuses)).scalar()
+        db.close()
+        if done >= total:
+            break
+        time.sleep(0.05)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inverters", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=50, help="portal requests per second")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="portal latency in seconds")
+    parser.add_argument("--switch-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    per_account = PER_STATION * STATIONS_PER_ACCOUNT
+    fleet = FakeFleet(max(1, -(-args.inverters // per_account)), STATIONS_PER_ACCOUNT, PER_STATION,
+                      inverters=args.inverters)
+    engine = create_engine(f"sqlite:///{tempfile.mkdtemp()}/control.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    seed(session_factory, fleet)
+
+    with FakeSEMSPortal(fleet, latency=args.latency, switch_delay=args.switch_delay) as portal:
+        queue = ControlQueue(session_factory, lambda username, password: GoodWeSEMSClient(
+            username, password, base_url=portal.base_url), rate=args.rate, workers=args.workers,
+            verify_delay=args.switch_delay / 2, verify_interval=0.5, verify_timeout=60)
+        queue.start()
+        total = fleet.inverter_count
+        print(f"{total} inverters in {len(fleet.stations)} stations, {args.rate:g} requests/s, "
+              f"{args.latency * 1e3:.0f} ms latency, {args.switch_delay:g} s switch delay")
+        for action in ("off", "on"):
+            db = session_factory()
+            commands, _ = submit(db, db.query(Inverter).all(), action)
+            batch_id = commands[0].batch_id
+            db.close()
+            before = dict(portal.requests)
+            queue.wake()
+            accepted = wait_for(session_factory, batch_id, ("sent", "confirmed"), total, 120)
+            confirmed = wait_for(session_factory, batch_id, ("confirmed",), total, 120) + accepted
+            requests = {endpoint.rsplit("/", 1)[-1]: count - before.get(endpoint, 0)
+                        for endpoint, count in portal.requests.items() if count > before.get(endpoint, 0)}
+            print(f"  {action:<3} accepted {accepted:6.2f} s  confirmed {confirmed:6.2f} s  requests {requests}")
+        queue.stop()
+
+
+if __name__ == "__main__":
+    main()
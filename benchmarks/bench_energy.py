@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Benchmark: recomputing daily energy and earnings from etotal counters.
+
+Generates 5-minute cumulative counters (with resets and noise) for a fleet, then runs
+counter deltas, daily bucketing and tariff earnings over NumPy columns in chunks of
+inverters, the way a full recompute would stream them out of InfluxDB.
+
+    python benchmarks/bench_energy.py --inverters 1000 --days 365
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+
+from energy import DAY_NS, bucket_sums, counter_deltas, earnings  # noqa: E402
+
+STEP_NS = 300 * 1_000_000_000
+
+
+def make_chunk(first: int, inverters: int, samples: int, rng: np.random.Generator):
+    """(series, timestamps, etotal) columns sorted by (series, time)"""
+    series = np.repeat(np.arange(first, first + inverters, dtype=np.int64), samples)
+    timestamps = np.tile(1_700_000_000_000_000_000 + np.arange(samples, dtype=np.int64) * STEP_NS, inverters)
+    production = rng.gamma(0.5, 0.2, size=inverters * samples)
+    etotal = np.cumsum(production.reshape(inverters, samples), axis=1).ravel()
+    # Occasional counter resets and readings lost to failed polls
+    etotal[rng.random(etotal.shape) < 1e-5] = 0.0
+    etotal[rng.random(etotal.shape) < 1e-3] = np.nan
+    return series, timestamps, etotal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inverters", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--chunk", type=int, default=100, help="inverters per chunk")
+    args = parser.parse_args()
+
+    samples = args.days * 86_400 // 300
+    rng = np.random.default_rng(42)
+    tariffs = {i: 0.08 + (i % 5) * 0.01 for i in range(args.inverters)}
+
+    generate = compute = 0.0
+    rows = days = 0
+    total_kwh = total_earnings = 0.0
+    for first in range(0, args.inverters, args.chunk):
+        count = min(args.chunk, args.inverters - first)
+        start = time.perf_counter()
+        series, timestamps, etotal = make_chunk(first, count, samples, rng)
+        generate += time.perf_counter() - start
+
+        start = time.perf_counter()
+        deltas = counter_deltas(etotal, series)
+        day_series, _, day_kwh = bucket_sums(series, timestamps, deltas, DAY_NS)
+        day_earnings = earnings(day_series, day_kwh, tariffs)
+        compute += time.perf_counter() - start
+
+        rows += len(series)
+        days += len(day_series)
+        total_kwh += float(day_kwh.sum())
+        total_earnings += float(day_earnings.sum())
+
+    print(f"energy recompute, {args.inverters} inverters x {args.days} days of 5-minute counters")
+    print(f"  samples       {rows:>14,}")
+    print(f"  daily rows    {days:>14,}")
+    print(f"  energy        {total_kwh:>14,.1f} kWh")
+    print(f"  earnings      {total_earnings:>14,.2f}")
+    print(f"  compute       {compute:>14.2f} s  ({compute / rows * 1e9:.1f} ns/sample)")
+    print(f"  (generation   {generate:>14.2f} s, not included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Benchmark: batch forecast refit for a synthetic fleet.
+
+Simulates hourly energy for inverters of random size and orientation under a daily cloud
+cover series per property, then refits every site with the baseline model (clear-sky times
+historical ratio) and, when scikit-learn is installed, with the weather model on the same
+cloud cover. Reports refit time and the error of each model on the simulated horizon.
+
+    python benchmarks/bench_forecast.py --inverters 2000 --workers 4
+"""
+import argparse
+import csv
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+
+from forecast import HOUR_NS, WeatherTable, clear_sky, fit_forecasts  # noqa: E402
+from peer_performance import InverterSite  # noqa: E402
+
+PER_PROPERTY = 4
+
+
+def simulate(inverters: int, hours: int, start_ns: int, rng: np.random.Generator):
+    properties = (inverters + PER_PROPERTY - 1) // PER_PROPERTY
+    latitude = rng.uniform(-38, -27, properties).repeat(PER_PROPERTY)[:inverters]
+    longitude = rng.uniform(115, 153, properties).repeat(PER_PROPERTY)[:inverters]
+    sites = [InverterSite(f"GW{i:08d}", i // PER_PROPERTY + 1, latitude[i], longitude[i], None)
+             for i in range(inverters)]
+    hour_starts = start_ns + np.arange(hours, dtype=np.int64) * HOUR_NS
+    irradiance = clear_sky(latitude, longitude, hour_starts)
+    # Cloud cover (0-1) drifts hour to hour and is shared by a property's inverters
+    cloud = np.clip(np.cumsum(rng.normal(0, 0.08, (properties, hours)), axis=1) % 2, 0, None)
+    cloud = np.where(cloud > 1, 2 - cloud, cloud)
+    capacity = rng.uniform(3, 10, inverters)
+    energy = capacity[:, None] / 1000 * irradiance * 0.8 * (1 - 0.75 * cloud.repeat(PER_PROPERTY, axis=0)[:inverters])
+    energy += rng.normal(0, 0.02, energy.shape) * capacity[:, None]
+    return sites, hour_starts, np.clip(energy, 0, None), cloud
+
+
+def write_weather(path: str, hour_starts: np.ndarray, cloud: np.ndarray) -> None:
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["property_id", "time", "cloud_cover"])
+        times = [datetime.fromtimestamp(ns // 1_000_000_000, timezone.utc).isoformat() for ns in hour_starts.tolist()]
+        for property_index, row in enumerate(cloud):
+            writer.writerows((property_index + 1, stamp, f"{value:.3f}") for stamp, value in zip(times, row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inverters", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=30, help="history")
+    parser.add_argument("--horizon", type=int, default=48, help="hours")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    start_ns = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+    history = args.days * 24
+    sites, hour_starts, energy, cloud = simulate(args.inverters, history + args.horizon, start_ns, rng)
+    actual = energy[:, history:]
+    daylight = actual.sum()
+
+    runs = [("baseline", None)]
+    try:
+        import sklearn  # noqa: F401
+        path = tempfile.NamedTemporaryFile(suffix=".csv", delete=False).name
+        write_weather(path, hour_starts, cloud)
+        runs.append(("weather", WeatherTable.load(path)))
+    except ImportError:
+        print("scikit-learn not installed: weather model skipped")
+
+    print(f"{args.inverters} inverters, {args.days} days history, {args.horizon} h horizon, {args.workers} workers")
+    for name, weather in runs:
+        start = time.perf_counter()
+        _, forecast = fit_forecasts(sites, energy[:, :history], start_ns, args.horizon, args.workers, weather)
+        elapsed = time.perf_counter() - start
+        error = np.nansum(np.abs(forecast - actual)) / daylight
+        print(f"  {name:<9} refit {elapsed:7.1f} s  ({elapsed / args.inverters * 1e3:6.2f} ms/site)  "
+              f"normalized MAE {error:.1%}")
+
+
+if __name__ == "__main__":
+    main()
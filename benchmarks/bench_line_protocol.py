@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Microbenchmark: per-point CPU cost of building inverter_status line protocol.
+
+Compares the Point builder chain the scraper used to run per inverter with the
+single-pass scraper serializer and the NumPy columnar batch path in the backend.
+
+    python benchmarks/bench_line_protocol.py --payloads 2000 --inverters 4
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+sys.path.insert(0, str(ROOT / "templates"))
+sys.path.insert(0, str(ROOT / "templates" / "goodwe"))
+
+from influxdb_client import Point  # noqa: E402
+
+import scraper  # noqa: E402
+from inverters.goodwe_sems import GoodWeSEMSClient, inverter_points_to_line_protocol  # noqa: E402
+
+
+def make_payloads(count: int, inverters: int, seed: int = 42):
+    """Synthetic GetInverterAllPoint payloads with a mix of numeric and string values"""
+    rng = random.Random(seed)
+    payloads = []
+    for station in range(count):
+        points = []
+        for i in range(inverters):
+            points.append({
+                "name": f"Station {station} inverter {i}",
+                "sn": f"GW{station:06d}{i:02d}",
+                "status": 1 if rng.random() > 0.1 else -1,
+                "out_pac": round(rng.uniform(0, 10000), 1),
+                "eday": str(round(rng.uniform(0, 60), 2)),
+                "emonth": round(rng.uniform(0, 1500), 2),
+                "etotal": round(rng.uniform(0, 90000), 1),
+                "hTotal": rng.randint(0, 50000),
+            })
+        payloads.append({"inverterPoints": points})
+    return payloads
+
+
+def point_builder_chain(payloads, timestamp_ns):
+    lines = []
+    for payload in payloads:
+        for inverter in payload["inverterPoints"]:
+            point = Point("inverter_status")\
+                .tag("inverter_sn", inverter.get('sn', ''))\
+                .field("online", 1.0 if inverter.get('status') == 1 else 0.0)\
+                .field("current_power", float(inverter.get('out_pac', 0)))\
+                .field("daily_energy", float(inverter.get('eday', 0)))\
+                .field("monthly_energy", float(inverter.get('emonth', 0)))\
+                .field("total_energy", float(inverter.get('etotal', 0)))\
+                .field("total_hours", float(inverter.get('hTotal', 0)))\
+                .time(timestamp_ns)
+            lines.append(point.to_line_protocol())
+    return lines
+
+
+def scraper_single_pass(payloads, timestamp_ns):
+    lines = []
+    for payload in payloads:
+        lines.extend(scraper.inverter_points_to_lines(payload["inverterPoints"], timestamp_ns))
+    return lines
+
+
+def numpy_columnar(payloads, timestamp_ns):
+    return inverter_points_to_line_protocol(payloads, timestamp_ns)
+
+
+def transform_per_dict(raw):
+    client = GoodWeSEMSClient("", "")
+    return [client.transform_data(item) for item in raw]
+
+
+def transform_columnar(raw):
+    return GoodWeSEMSClient.transform_batch(raw)
+
+
+def measure(func, *args, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.process_time_ns()
+        result = func(*args)
+        best = min(best, time.process_time_ns() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", type=int, default=2000, help="SEMS responses per batch")
+    parser.add_argument("--inverters", type=int, default=4, help="inverterPoints per response")
+    parser.add_argument("--repeat", type=int, default=5, help="best-of repetitions")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.payloads, args.inverters)
+    points = args.payloads * args.inverters
+    timestamp_ns = 1_700_000_000_000_000_000
+
+    print(f"inverter_status serialization, {points} points (best of {args.repeat})")
+    baseline = None
+    for name, func in (
+        ("point builder chain", point_builder_chain),
+        ("scraper single pass", scraper_single_pass),
+        ("numpy columnar", numpy_columnar),
+    ):
+        elapsed, lines = measure(func, payloads, timestamp_ns, repeat=args.repeat)
+        per_point = elapsed / max(len(lines), 1)
+        baseline = baseline or per_point
+        print(f"  {name:<22} {per_point:8.0f} ns/point  {baseline / per_point:5.2f}x")
+
+    raw = [
+        {"power": str(i * 0.5), "money": i * 0.1, "used": i, "current_power": i, "home_consumption": i,
+         "battery_charging": 0, "grid_export": i / 2}
+        for i in range(points)
+    ]
+    print(f"monitor detail transform, {points} responses (best of {args.repeat})")
+    baseline = None
+    for name, func in (("transform_data per dict", transform_per_dict), ("transform_batch", transform_columnar)):
+        elapsed, _ = measure(func, raw, repeat=args.repeat)
+        per_item = elapsed / points
+        baseline = baseline or per_item
+        print(f"  {name:<22} {per_item:8.0f} ns/item   {baseline / per_item:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Local polling benchmark: how fast can one collector read inverters on the LAN?
+
+Starts simulated GoodWe inverters (Modbus TCP or UDP) and a local line-protocol sink, then
+runs the goodwe local driver through the shared ``Collector`` for a number of cycles and
+reports cycle latency, register reads per cycle and the shortest interval each fleet size
+sustains, next to the SEMS portal path for comparison.
+
+    python benchmarks/bench_local_poll.py --sizes 1,10,50 --protocol udp --latency 0.01 --workers 16
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "templates"))
+sys.path.insert(0, str(ROOT / "templates" / "goodwe"))
+
+import scraper  # noqa: E402
+from collector import Collector  # noqa: E402
+from fake_goodwe_local import FakeLocalFleet  # noqa: E402
+from fake_sems import FakeFleet, FakeSEMSPortal, account_username  # noqa: E402
+from influx_sink import LineProtocolSink  # noqa: E402
+from local import GoodWeLocalDriver  # noqa: E402
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_cycles(collector: Collector, cycles: int):
+    latencies, failures = [], 0
+    for _ in range(cycles):
+        start = time.perf_counter()
+        failures += collector.poll_once() != "success"
+        latencies.append(time.perf_counter() - start)
+    collector.close()
+    latencies.sort()
+    return latencies, failures
+
+
+def summarize(mode: str, size: int, latencies, failures, lines: int, requests: int) -> dict:
+    return {
+        "mode": mode,
+        "inverters": size,
+        "cycles": len(latencies),
+        "failed_cycles": failures,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        # A cycle must fit in the interval for the fixed-rate schedule to hold
+        "min_interval_s": round(percentile(latencies, 99), 3),
+        "requests_per_cycle": round(requests / max(1, len(latencies)), 1),
+        "lines_written": lines,
+    }
+
+
+def run_local(size: int, args) -> dict:
+    with FakeLocalFleet(size, args.protocol, latency=args.latency, loss=args.loss) as fleet, \
+            LineProtocolSink() as sink:
+        config = {"settings": {"mode": "local", "local": {"hosts": fleet.hosts(), "timeout": 0.5}}}
+        collector = Collector(GoodWeLocalDriver.from_config(config), sink.influx_config(),
+                              {"poll_workers": args.workers})
+        latencies, failures = run_cycles(collector, args.cycles)
+        reads = sum(inverter.reads for inverter in fleet.inverters)
+        return summarize(f"local/{args.protocol}", size, latencies, failures, sink.line_count, reads)
+
+
+def run_cloud(size: int, args) -> dict:
+    fleet = FakeFleet(1, stations_per_account=size)
+    with FakeSEMSPortal(fleet, latency=args.portal_latency) as portal, LineProtocolSink() as sink:
+        driver = scraper.GoodWeDriver(account_username(0), "bench", "au", base_url=portal.base_url)
+        collector = Collector(driver, sink.influx_config(), {"poll_workers": args.workers})
+        latencies, failures = run_cycles(collector, args.cycles)
+        return summarize("cloud", size, latencies, failures, sink.line_count, sum(portal.requests.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,10,50", help="comma separated simulated inverter counts")
+    parser.add_argument("--cycles", type=int, default=20, help="poll cycles per size")
+    parser.add_argument("--protocol", choices=("modbus_tcp", "udp"), default="modbus_tcp")
+    parser.add_argument("--workers", type=int, default=16, help="inverters polled concurrently")
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated LAN reply latency (s)")
+    parser.add_argument("--loss", type=float, default=0.0, help="fraction of UDP replies dropped")
+    parser.add_argument("--portal-latency", type=float, default=0.3,
+                        help="SEMS portal latency per request for the cloud comparison (s); negative skips it")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    logging.getLogger("sems_scraper").setLevel(logging.CRITICAL)
+    logging.getLogger("collector").setLevel(logging.CRITICAL)
+
+    results = []
+    print(f"{'mode':>16} {'inverters':>9} {'p50 ms':>8} {'p99 ms':>8} {'req/cycle':>9} {'failed':>6}")
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        runs = [run_local(size, args)]
+        if args.portal_latency >= 0:
+            runs.append(run_cloud(size, args))
+        for result in runs:
+            results.append(result)
+            print(f"{result['mode']:>16} {result['inverters']:>9} {result['p50_ms']:>8} {result['p99_ms']:>8} "
+                  f"{result['requests_per_cycle']:>9} {result['failed_cycles']:>6}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "local_poll", "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
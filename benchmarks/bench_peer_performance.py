@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Benchmark: nearest-peer lookup and performance ratios for a synthetic fleet.
+
+Scatters inverters around a handful of cities, builds the spatial grid, finds each inverter's
+nearest peers and computes hourly ratios against them. The brute-force check compares the
+grid's neighbours with an all-pairs distance matrix on a sample.
+
+    python benchmarks/bench_peer_performance.py --inverters 1000,10000,50000 --hours 24
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "backend"))
+
+from peer_performance import PEER_K, PEER_RADIUS_KM, SpatialGrid, haversine_km, peer_ratios  # noqa: E402
+
+CITIES = [(-33.87, 151.21), (-31.95, 115.86), (52.52, 13.40), (39.74, -104.99), (64.15, -21.94), (-36.85, 174.76)]
+
+
+def make_fleet(inverters: int, rng: np.random.Generator):
+    city = rng.integers(0, len(CITIES), inverters)
+    centres = np.array(CITIES)[city]
+    # Roughly 30 km spread around each city
+    lat = centres[:, 0] + rng.normal(0, 0.3, inverters)
+    lon = centres[:, 1] + rng.normal(0, 0.3, inverters) / np.cos(np.radians(centres[:, 0]))
+    return lat, lon
+
+
+def make_yields(inverters: int, hours: int, rng: np.random.Generator) -> np.ndarray:
+    sun = np.clip(np.sin(np.linspace(0, 2 * np.pi, hours)), 0, None)
+    yields = sun[None, :] * rng.uniform(0.7, 0.8, (inverters, 1)) + rng.normal(0, 0.02, (inverters, hours))
+    yields[::250] *= 0.5  # Faulty strings
+    yields[rng.random((inverters, hours)) < 0.02] = np.nan  # Missed polls
+    return yields
+
+
+def check(grid: SpatialGrid, neighbors: np.ndarray, sample: np.ndarray) -> int:
+    """Rows in ``sample`` whose grid neighbours differ from the brute-force ones"""
+    mismatches = 0
+    for row in sample.tolist():
+        d = haversine_km(grid.lat[row], grid.lon[row], grid.lat, grid.lon)
+        d[row] = np.inf
+        expected = np.sort(d[np.argsort(d)[:PEER_K]])
+        expected[expected > PEER_RADIUS_KM] = np.inf
+        found = neighbors[row]
+        actual = np.sort(np.where(found >= 0, d[found], np.inf))
+        mismatches += not np.allclose(expected, actual)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inverters", default="1000,10000,50000", help="comma separated fleet sizes")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--check", type=int, default=200, help="rows compared against brute force")
+    args = parser.parse_args()
+
+    print(f"k={PEER_K} peers within {PEER_RADIUS_KM:g} km, {args.hours} hours")
+    for inverters in [int(value) for value in args.inverters.split(",")]:
+        rng = np.random.default_rng(42)
+        lat, lon = make_fleet(inverters, rng)
+        yields = make_yields(inverters, args.hours, rng)
+
+        start = time.perf_counter()
+        grid = SpatialGrid(lat, lon)
+        neighbors, _ = grid.neighbors(PEER_K, PEER_RADIUS_KM)
+        index = time.perf_counter() - start
+        start = time.perf_counter()
+        ratio, _, _ = peer_ratios(yields, neighbors)
+        ratios = time.perf_counter() - start
+
+        flagged = np.unique(np.nonzero(np.nanmedian(np.where(np.isnan(ratio), np.nan, ratio), axis=1) < 0.8)[0]
+                            if np.isfinite(ratio).any() else [])
+        mismatches = check(grid, neighbors, rng.choice(inverters, min(args.check, inverters), replace=False))
+        print(f"  {inverters:>6} inverters  index {index * 1e3:8.1f} ms  ratios {ratios * 1e3:7.1f} ms  "
+              f"{len(flagged)} flagged ({len(range(0, inverters, 250))} faulty)  {mismatches} neighbour mismatches")
+
+
+if __name__ == "__main__":
+    main()
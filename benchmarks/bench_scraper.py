@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Scrape capacity benchmark: how many inverters can one host poll?
+
+Starts a fake SEMS portal and a local line-protocol sink, then drives the real
+goodwe driver through the shared ``Collector`` (``poll_once``, exactly what each
+scraper container runs per cycle) for every simulated inverter. Reports polls/s,
+p50/p99 poll-cycle latency, RSS and CPU per fleet size. Everything runs against
+127.0.0.1 with seeded latency/error injection, so results are repeatable in CI.
+
+    python benchmarks/bench_scraper.py --sizes 10,100,1000 --cycles 3 --latency 0.005
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "templates"))
+sys.path.insert(0, str(ROOT / "templates" / "goodwe"))
+
+import scraper  # noqa: E402
+from collector import Collector  # noqa: E402
+from fake_sems import FakeFleet, FakeSEMSPortal, account_username  # noqa: E402
+from influx_sink import LineProtocolSink  # noqa: E402
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MiB"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        # ru_maxrss is KiB on Linux, bytes on macOS; peak is the best we can do here
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_size(size: int, args) -> dict:
+    fleet = FakeFleet(size, inverters_per_station=1)
+    with FakeSEMSPortal(fleet, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, seed=args.seed) as portal, LineProtocolSink() as sink:
+        influx_config = sink.influx_config()
+        clients = [
+            Collector(scraper.GoodWeDriver(account_username(i), "bench", "bench", base_url=portal.base_url),
+                      influx_config)
+            for i in range(size)
+        ]
+
+        def poll(client):
+            start = time.perf_counter()
+            ok = client.poll_once() == "success"
+            return time.perf_counter() - start, ok
+
+        latencies, failures, sweeps = [], 0, []
+        rss_before = current_rss_mb()
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            for _ in range(args.cycles):
+                sweep_start = time.perf_counter()
+                for elapsed, ok in pool.map(poll, clients):
+                    latencies.append(elapsed)
+                    failures += not ok
+                sweeps.append(time.perf_counter() - sweep_start)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        for client in clients:
+            client.close()
+
+        latencies.sort()
+        polls = len(latencies)
+        return {
+            "inverters": size,
+            "cycles": args.cycles,
+            "workers": args.workers,
+            "polls": polls,
+            "failed_polls": failures,
+            "wall_s": round(wall, 3),
+            "polls_per_s": round(polls / wall, 1) if wall else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "sweep_max_s": round(max(sweeps), 3),
+            "cpu_s": round(cpu, 3),
+            "cpu_ms_per_poll": round(cpu / polls * 1000, 3) if polls else 0.0,
+            "rss_mb": round(current_rss_mb(), 1),
+            "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+            "portal_requests": dict(sorted(portal.requests.items())),
+            "lines_written": sink.line_count,
+            "write_requests": sink.write_requests,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="comma separated simulated inverter counts")
+    parser.add_argument("--cycles", type=int, default=3, help="poll cycles per size")
+    parser.add_argument("--workers", type=int, default=64, help="concurrent pollers")
+    parser.add_argument("--latency", type=float, default=0.0, help="portal latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of portal requests that fail")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--verbose", action="store_true", help="keep scraper logging enabled")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger("sems_scraper").setLevel(logging.CRITICAL)
+        logging.getLogger("collector").setLevel(logging.CRITICAL)
+
+    results = []
+    header = f"{'inverters':>9} {'polls/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'cpu ms/poll':>11} {'rss MB':>7} {'failed':>6}"
+    print(header)
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        result = run_size(size, args)
+        results.append(result)
+        print(f"{result['inverters']:>9} {result['polls_per_s']:>9} {result['p50_ms']:>8} {result['p99_ms']:>8} "
+              f"{result['cpu_ms_per_poll']:>11} {result['rss_mb']:>7} {result['failed_polls']:>6}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "scraper", "args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
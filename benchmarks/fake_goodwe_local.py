@@ -0,0 +1,159 @@
+"""In-process simulator of GoodWe inverters on the LAN for benchmarks.
+
+Each simulated inverter listens on its own 127.0.0.1 port and answers holding-register
+reads (function 0x03) over Modbus TCP or the Wi-Fi kit's UDP protocol (Modbus RTU request,
+``AA55``-prefixed reply), with the serial at 35003 and running data around 35100 laid out
+as the goodwe template's local driver expects. Output follows a bell curve over the day;
+latency and UDP packet loss are configurable.
+"""
+import random
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "templates" / "goodwe"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "templates"))
+
+from local import COMM_ADDRESS, SERIAL_REGISTER, crc16  # noqa: E402
+
+
+class FakeLocalInverter:
+    """Register file of one inverter, recomputed on every read"""
+
+    def __init__(self, index: int, rated_w: int = 5000):
+        self.serial = f"9010KETU{index:08d}"
+        self.rated_w = rated_w
+        self.reads = 0
+
+    def registers(self) -> Dict[int, int]:
+        seconds = time.time() % 86400
+        daylight = max(0.0, 1 - ((seconds - 43200) / 21600) ** 2)
+        power = int(self.rated_w * daylight)
+        energy_day = int(self.rated_w * 0.06 * daylight)  # 0.1 kWh, about six full-power hours
+        energy_total = 123456 + energy_day
+        regs = {}
+        text = self.serial.encode().ljust(16, b"\0")
+        for i in range(8):
+            regs[SERIAL_REGISTER + i] = struct.unpack(">H", text[2 * i:2 * i + 2])[0]
+        regs[35138] = power & 0xFFFF
+        regs[35187] = 1 if power else 0
+        for address, value in ((35191, energy_total), (35193, energy_day), (35197, 4321)):
+            regs[address], regs[address + 1] = value >> 16, value & 0xFFFF
+        return regs
+
+    def read(self, start: int, count: int) -> Optional[List[int]]:
+        if count < 1 or count > 125:
+            return None
+        self.reads += 1
+        regs = self.registers()
+        return [regs.get(address, 0) for address in range(start, start + count)]
+
+
+class FakeLocalFleet:
+    """Simulated inverters, each on its own port, speaking ``modbus_tcp`` or ``udp``"""
+
+    def __init__(self, count: int, protocol: str = "modbus_tcp", latency: float = 0.0,
+                 loss: float = 0.0, seed: int = 1):
+        self.inverters = [FakeLocalInverter(i) for i in range(count)]
+        self.protocol = protocol
+        self.latency = latency
+        self.loss = loss
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._servers: List[socketserver.BaseServer] = []
+
+    def hosts(self) -> List[Dict[str, object]]:
+        """settings.local.hosts entries for the running fleet"""
+        return [{"host": "127.0.0.1", "port": server.server_address[1], "protocol": self.protocol}
+                for server in self._servers]
+
+    def start(self) -> "FakeLocalFleet":
+        for inverter in self.inverters:
+            server = self._tcp_server(inverter) if self.protocol == "modbus_tcp" else self._udp_server(inverter)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._servers.append(server)
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _tcp_server(self, inverter: FakeLocalInverter) -> socketserver.BaseServer:
+        fleet = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                while True:
+                    header = self._recv(7)
+                    if header is None:
+                        return
+                    transaction, protocol, length, unit = struct.unpack(">HHHB", header)
+                    pdu = self._recv(length - 1)
+                    if pdu is None:
+                        return
+                    function, start, count = struct.unpack(">BHH", pdu[:5])
+                    if fleet.latency:
+                        time.sleep(fleet.latency)
+                    words = inverter.read(start, count) if function == 3 else None
+                    if words is None:
+                        body = struct.pack(">BB", function | 0x80, 2)
+                    else:
+                        body = struct.pack(f">BB{count}H", function, count * 2, *words)
+                    self.request.sendall(struct.pack(">HHHB", transaction, 0, len(body) + 1, unit) + body)
+
+            def _recv(self, size: int) -> Optional[bytes]:
+                data = b""
+                while len(data) < size:
+                    chunk = self.request.recv(size - len(data))
+                    if not chunk:
+                        return None
+                    data += chunk
+                return data
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        return Server(("127.0.0.1", 0), Handler)
+
+    def _udp_server(self, inverter: FakeLocalInverter) -> socketserver.BaseServer:
+        fleet = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                if len(data) != 8 or struct.unpack("<H", data[6:])[0] != crc16(data[:6]):
+                    return
+                address, function, start, count = struct.unpack(">BBHH", data[:6])
+                if address != COMM_ADDRESS or function != 3:
+                    return
+                with fleet._rng_lock:
+                    dropped = fleet.loss and fleet._rng.random() < fleet.loss
+                if dropped:
+                    return
+                if fleet.latency:
+                    time.sleep(fleet.latency)
+                words = inverter.read(start, count)
+                if words is None:
+                    return
+                body = struct.pack(f">BBB{count}H", address, function, count * 2, *words)
+                sock.sendto(b"\xaa\x55" + body + struct.pack("<H", crc16(body)), self.client_address)
+
+        class Server(socketserver.ThreadingUDPServer):
+            daemon_threads = True
+
+        return Server(("127.0.0.1", 0), Handler)
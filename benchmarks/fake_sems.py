@@ -0,0 +1,225 @@
+"""In-process fake SEMS portal for benchmarks.
+
+Serves the endpoints the goodwe scraper uses (CrossLogin, GetPowerStationIdByOwner,
+PowerStation/List, GetInverterAllPoint), the daily GetPlantPowerChart used by
+backfills and SaveRemoteControlInverter (switching takes ``switch_delay`` seconds to show
+in the inverter's status) from a deterministic fleet, with configurable
+latency and error injection. Everything binds to 127.0.0.1 so runs need no network.
+"""
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class BenchHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 turns bursts from many pollers into 1s SYN retries
+    request_queue_size = 1024
+
+
+class FakeFleet:
+    """Deterministic accounts -> power stations -> inverters layout.
+
+    With ``inverters`` set, the layout stops at that many inverters, leaving the last
+    account (and station) partly filled.
+    """
+
+    def __init__(self, accounts: int, stations_per_account: int = 1, inverters_per_station: int = 1,
+                 inverters: Optional[int] = None):
+        self.accounts: Dict[str, List[str]] = {}
+        self.stations: Dict[str, List[str]] = {}
+        remaining = accounts * stations_per_account * inverters_per_station if inverters is None else inverters
+        for a in range(accounts):
+            username = account_username(a)
+            self.accounts[username] = []
+            for s in range(stations_per_account):
+                if remaining <= 0:
+                    break
+                station_id = f"ps-{a:06d}-{s:02d}"
+                self.accounts[username].append(station_id)
+                count = min(inverters_per_station, remaining)
+                self.stations[station_id] = [f"GW{a:06d}{s:02d}{i:02d}" for i in range(count)]
+                remaining -= count
+
+    @property
+    def inverter_count(self) -> int:
+        return sum(len(sns) for sns in self.stations.values())
+
+
+def account_username(index: int) -> str:
+    return f"bench-{index:06d}@example.com"
+
+
+class FakeSEMSPortal:
+    """Threaded HTTP server emulating semsportal.com/api for a FakeFleet"""
+
+    def __init__(self, fleet: FakeFleet, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 1, switch_delay: float = 0.0):
+        self.fleet = fleet
+        self.switch_delay = switch_delay
+        # serial -> (time.monotonic() the switch takes effect, status afterwards)
+        self._switched: Dict[str, Tuple[float, int]] = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._tokens: Dict[str, str] = {}
+        self.requests: Dict[str, int] = {}
+        self._server: Optional[BenchHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> "FakeSEMSPortal":
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                status, payload = portal.handle(self.path, body, self.headers.get("Token", ""))
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = BenchHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay_and_fail(self) -> bool:
+        with self._rng_lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def handle(self, path: str, body: Dict[str, Any], token: str):
+        endpoint = path.split("/api", 1)[-1]
+        with self._rng_lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        if self._delay_and_fail():
+            return 200, {"hasError": True, "code": 100001, "msg": "Simulated portal error", "data": None}
+
+        if endpoint.endswith("/Common/CrossLogin"):
+            username = body.get("account")
+            if username not in self.fleet.accounts:
+                return 200, {"hasError": True, "msg": "Email or password error.", "data": None}
+            return 200, {
+                "hasError": False,
+                "msg": "Successful",
+                "data": {"uid": username, "timestamp": int(time.time() * 1000), "token": username,
+                         "client": "web", "version": "", "language": "en"},
+                "api": self.base_url,
+            }
+
+        username = self._username(token)
+        if username is None:
+            return 200, {"hasError": True, "code": 100002, "msg": "The authorization has expired", "data": None}
+        stations = self.fleet.accounts[username]
+
+        if endpoint.endswith("/PowerStation/GetPowerStationIdByOwner"):
+            return 200, {"hasError": False, "msg": "success", "data": stations[0]}
+        if endpoint.endswith("/PowerStation/List"):
+            page, size = int(body.get("page", 1)), int(body.get("size", 10))
+            items = stations[(page - 1) * size:page * size]
+            return 200, {"hasError": False, "msg": "success",
+                         "data": {"record": len(stations), "list": [{"id": s, "stationname": s} for s in items]}}
+        if endpoint.endswith("/PowerStation/GetInverterAllPoint"):
+            station_id = body.get("powerStationId")
+            if station_id not in stations:
+                return 200, {"hasError": True, "msg": "Power station not found", "data": None}
+            return 200, {"hasError": False, "msg": "success",
+                         "data": {"inverterPoints": [self._switch(self._inverter_point(sn))
+                                                     for sn in self.fleet.stations[station_id]]}}
+        if endpoint.endswith("/PowerStation/SaveRemoteControlInverter"):
+            serial = body.get("InverterSN")
+            if not any(serial in self.fleet.stations[station] for station in stations):
+                return 200, {"hasError": True, "msg": "Inverter not found", "data": None}
+            with self._rng_lock:
+                self._switched[serial] = (time.monotonic() + self.switch_delay,
+                                          1 if body.get("InverterStatus") == "1" else 0)
+            return 200, {"hasError": False, "msg": "success", "data": None}
+        if endpoint.endswith("/Charts/GetPlantPowerChart"):
+            station_id = body.get("id")
+            if station_id not in stations:
+                return 200, {"hasError": True, "msg": "Power station not found", "data": None}
+            return 200, {"hasError": False, "msg": "success",
+                         "data": {"lines": [{"key": "PCurve_Power_PV", "unit": "W",
+                                             "xy": self._power_chart(station_id, body.get("date", ""))}]}}
+        return 404, {"hasError": True, "msg": f"Unknown endpoint {endpoint}", "data": None}
+
+    def _username(self, token_header: str) -> Optional[str]:
+        username = self._tokens.get(token_header)
+        if username is None:
+            try:
+                username = json.loads(base64.b64decode(token_header)).get("token")
+            except Exception:
+                # The backend client sends the token JSON unencoded
+                try:
+                    username = json.loads(token_header).get("token")
+                except Exception:
+                    return None
+            self._tokens[token_header] = username
+        return username if username in self.fleet.accounts else None
+
+    def _switch(self, point: Dict[str, Any]) -> Dict[str, Any]:
+        switched = self._switched.get(point["sn"])
+        if switched is not None and time.monotonic() >= switched[0]:
+            point["status"] = switched[1]
+            if not switched[1]:
+                point["out_pac"] = 0.0
+        return point
+
+    @staticmethod
+    def _power_chart(station_id: str, day: str) -> List[Dict[str, Any]]:
+        """Five-minute bell curve between 06:00 and 18:00, scaled per station and day"""
+        peak = 1000 + (sum(map(ord, station_id + day)) * 37) % 4000
+        chart = []
+        for minute in range(0, 24 * 60, 5):
+            daylight = max(0.0, 1 - ((minute - 720) / 360) ** 2)
+            chart.append({"x": f"{minute // 60:02d}:{minute % 60:02d}", "y": round(peak * daylight, 1)})
+        return chart
+
+    @staticmethod
+    def _inverter_point(sn: str) -> Dict[str, Any]:
+        seed = sum(map(ord, sn))
+        return {
+            "sn": sn,
+            "name": f"Inverter {sn}",
+            "status": 1,
+            "out_pac": float((seed * 37) % 5000),
+            "eday": round((seed % 400) / 10, 1),
+            "emonth": float(seed % 900),
+            "etotal": float(seed * 11),
+            "hTotal": seed * 3,
+        }
@@ -0,0 +1,98 @@
+"""Local InfluxDB v2 write endpoint that counts (and optionally stores) line protocol.
+
+Accepts ``POST /api/v2/write`` the way influxdb-client sends it, so the scraper's real
+write path can be benchmarked without an InfluxDB server or network access. An optional
+``query_handler`` turns it into a stub for ``POST /api/v2/query`` as well: it receives the
+Flux text and returns an annotated CSV body.
+"""
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from typing import Callable, List, Optional
+
+from fake_sems import BenchHTTPServer
+
+
+class LineProtocolSink:
+    """Threaded HTTP server that acknowledges writes with 204 and tallies lines"""
+
+    def __init__(self, keep_lines: bool = False, query_handler: Optional[Callable[[str], str]] = None):
+        self.keep_lines = keep_lines
+        self.query_handler = query_handler
+        self.query_requests = 0
+        self.lines: List[str] = []
+        self.line_count = 0
+        self.write_requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server: Optional[BenchHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def influx_config(self, bucket: str = "bench-bucket", org: str = "bench") -> dict:
+        return {"url": self.url, "token": "bench-token", "org": org, "bucket": bucket}
+
+    def start(self) -> "LineProtocolSink":
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                if self.path.startswith("/api/v2/write"):
+                    sink.record(body)
+                    self.send_response(204)
+                elif self.path.startswith("/api/v2/query") and sink.query_handler:
+                    with sink._lock:
+                        sink.query_requests += 1
+                    data = sink.query_handler(json.loads(body).get("query", "")).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/csv; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                else:
+                    self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                self.send_response(204 if self.path in ("/ping", "/health") else 404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = BenchHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def record(self, body: bytes):
+        lines = [line for line in body.decode().split("\n") if line]
+        with self._lock:
+            self.write_requests += 1
+            self.bytes_received += len(body)
+            self.line_count += len(lines)
+            if self.keep_lines:
+                self.lines.extend(lines)
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,12 @@
+"""Shared scraper runtime bundled into every template that sets ``"runtime": "collector"``.
+
+A vendor template only implements ``Driver`` (login, discover, poll, parse) and calls
+``run(MyDriver.from_config)``; scheduling, target caching, concurrent polling, the
+write-ahead log, InfluxDB writes, alert forwarding, metrics and tracing live here.
+"""
+from .driver import Driver
+from .lines import FIELDS, InverterMap, Reading, readings_to_lines
+from .runtime import Collector, load_config, run
+from .tracing import setup_tracing, span
+from .wal import RejectedBatch, WriteAheadLog, open_wal
+
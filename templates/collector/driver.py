@@ -0,0 +1,67 @@
+"""The interface a vendor implements to be run by the collector runtime"""
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, List, Optional
+
+from .lines import Reading
+from .metrics import LOGINS, REQUEST_ERRORS, REQUEST_SECONDS
+from .tracing import span
+
+class Driver(ABC):
+    """One vendor account or gateway.
+
+    Per cycle the runtime calls ``login``, then ``discover`` when its cached targets are
+    stale, then ``poll`` for every target (possibly from several threads) and finally
+    ``parse`` once over all payloads. Drivers do no looping, writing or retrying of their
+    own; they time their API calls with ``request`` so every vendor reports the same metrics.
+    """
+
+    # Metric label and span prefix
+    name = "driver"
+    # Shortest settings.interval the vendor tolerates, in seconds
+    min_interval = 0
+
+    @classmethod
+    @abstractmethod
+    def from_config(cls, config: Dict[str, Any]) -> "Driver":
+        """Driver for a scraper config (the vendor section plus ``settings``)"""
+
+    @abstractmethod
+    def login(self) -> bool:
+        """Make sure the session is authenticated; cheap when it still is"""
+
+    @abstractmethod
+    def discover(self) -> List[Hashable]:
+        """Targets to poll each cycle (power stations, devices); empty on failure"""
+
+    @abstractmethod
+    def poll(self, target: Hashable) -> Optional[Any]:
+        """Raw payload of one target, or None if it could not be read"""
+
+    @abstractmethod
+    def parse(self, payloads: List[Any]) -> List[Reading]:
+        """Readings in all payloads of one cycle"""
+
+    def close(self) -> None:
+        """Release connections when the collector stops"""
+
+    @contextmanager
+    def request(self, endpoint: str, **attributes):
+        """Time one API call; an exception counts as an error"""
+        start = time.perf_counter()
+        try:
+            with span(f"{self.name}.{endpoint}", **attributes):
+                yield
+        except Exception:
+            REQUEST_ERRORS.labels(self.name, endpoint).inc()
+            raise
+        finally:
+            REQUEST_SECONDS.labels(self.name, endpoint).observe(time.perf_counter() - start)
+
+    def request_failed(self, endpoint: str) -> None:
+        """Count a call that returned but reported an error"""
+        REQUEST_ERRORS.labels(self.name, endpoint).inc()
+
+    def login_result(self, result: str) -> None:
+        LOGINS.labels(self.name, result).inc()
@@ -0,0 +1,64 @@
+"""Vendor-neutral readings and their inverter_status line protocol"""
+import math
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+# inverter_status fields every driver maps its vendor's values onto
+FIELDS = ("current_power", "daily_energy", "monthly_energy", "total_energy", "total_hours")
+ESCAPE_TAG = str.maketrans({",": "\\,", "=": "\\=", " ": "\\ ", "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+class Reading(NamedTuple):
+    """One inverter at one poll, as returned by ``Driver.parse``"""
+    serial: str
+    # Raw values in FIELDS order; None, non-numeric and non-finite values are skipped
+    values: Sequence[Any]
+    online: bool
+
+class InverterMap:
+    """Platform inverters a collector serves, from ``settings.inverters``.
+
+    Readings whose serial matches are tagged with ``inverter_id``. The rest are dropped,
+    unless no inverter list was given or one of them has no serial to match on.
+    """
+
+    def __init__(self, inverters: Optional[List[Dict[str, Any]]] = None):
+        inverters = inverters or []
+        self.ids = {str(inv['sn']): inv['id'] for inv in inverters if inv.get('sn')}
+        self.write_unmatched = not inverters or any(not inv.get('sn') for inv in inverters)
+
+def _format_float(value: float) -> str:
+    text = repr(value)
+    return text[:-2] if text.endswith(".0") else text
+
+def readings_to_lines(readings: Iterable[Reading], timestamp_ns: int,
+                      inverter_map: Optional[InverterMap] = None) -> List[str]:
+    """Serialize readings into inverter_status line protocol in a single pass.
+
+    Only ids and serials are tags (see the backend's influx_schema); status is the
+    ``online`` field so a flip does not start a new series.
+    """
+    inverter_ids = inverter_map.ids if inverter_map else {}
+    write_unmatched = inverter_map.write_unmatched if inverter_map else True
+    lines = []
+    for serial, values, online in readings:
+        inverter_id = inverter_ids.get(serial)
+        if inverter_id is None and not write_unmatched:
+            continue
+        # Tags are emitted in sorted key order, empty values are skipped like the Point builder does
+        tags = "inverter_status"
+        if inverter_id is not None:
+            tags += f",inverter_id={inverter_id}"
+        sn = serial.translate(ESCAPE_TAG)
+        if sn:
+            tags += f",inverter_sn={sn}"
+
+        fields = []
+        for field, raw in zip(FIELDS, values):
+            try:
+                value = float(raw)
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(value):
+                fields.append(f"{field}={_format_float(value)}")
+        fields.append("online=1" if online else "online=0")
+        lines.append(f"{tags} {','.join(fields)} {timestamp_ns}")
+    return lines
@@ -0,0 +1,29 @@
+"""Prometheus metrics shared by every driver, served on ``settings.metrics_port``"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# Vendor API calls, labelled by driver so one dashboard covers every vendor
+REQUEST_SECONDS = Histogram(
+    'scraper_request_duration_seconds', 'Vendor API request latency', ['driver', 'endpoint'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+REQUEST_ERRORS = Counter(
+    'scraper_request_errors_total', 'Vendor API requests that failed or returned an error', ['driver', 'endpoint']
+)
+LOGINS = Counter('scraper_logins_total', 'Vendor logins performed', ['driver', 'result'])
+DISCOVERIES = Counter('scraper_discoveries_total', 'Target discoveries by outcome', ['driver', 'result'])
+TARGETS = Gauge('scraper_targets', 'Targets (stations, devices) polled per cycle', ['driver'])
+POLLS = Counter('scraper_polls_total', 'Poll cycles by outcome', ['result'])
+POLL_SECONDS = Histogram(
+    'scraper_poll_duration_seconds', 'Whole poll cycle latency (collect + write)',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+POINTS_WRITTEN = Counter('scraper_points_written_total', 'inverter_status points written to InfluxDB')
+INFLUX_WRITE_SECONDS = Histogram(
+    'scraper_influx_write_duration_seconds', 'InfluxDB write latency',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+WRITE_QUEUE_DEPTH = Gauge('scraper_write_queue_depth', 'Points collected but not yet written to InfluxDB')
+WAL_BYTES = Gauge('scraper_wal_bytes', 'Size of the on-disk write-ahead log')
+WAL_DROPPED = Counter('scraper_wal_dropped_points_total', 'Unreplayed points dropped by the WAL size cap')
+WAL_REJECTED = Counter('scraper_wal_rejected_points_total', 'Points InfluxDB refused for good, set aside by the WAL')
+INGEST_FORWARDS = Counter('scraper_ingest_forwards_total', 'Polls forwarded to the alert engine by outcome', ['result'])
@@ -0,0 +1,218 @@
+"""Vendor-neutral poll loop: scheduling, target caching, batching, WAL, writes and metrics"""
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import requests
+from influxdb_client import InfluxDBClient, WritePrecision
+from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.rest import ApiException
+from prometheus_client import start_http_server
+
+from .driver import Driver
+from .lines import InverterMap, readings_to_lines
+from .metrics import (
+    DISCOVERIES, INFLUX_WRITE_SECONDS, INGEST_FORWARDS, POINTS_WRITTEN, POLL_SECONDS, POLLS, TARGETS
+)
+from .tracing import setup_tracing, span
+from .wal import RejectedBatch, WriteAheadLog, open_wal
+
+# InfluxDB answers malformed line protocol with 400 and field type conflicts with 422
+REJECTED_STATUSES = (400, 422)
+
+logger = logging.getLogger('collector')
+
+class Collector:
+    """Runs one driver: a cycle is login, cached discovery, polls, one parse and one write.
+
+    ``settings`` are the scraper's ``settings`` section: ``inverters`` (serial -> inverter_id
+    fan-out), ``ingest_url``, ``poll_workers`` (targets polled concurrently, default 1) and
+    ``rediscover_seconds`` (how long discovered targets are reused, default 3600).
+    """
+
+    def __init__(self, driver: Driver, influx_config: Dict[str, str], settings: Optional[Dict[str, Any]] = None,
+                 wal: Optional[WriteAheadLog] = None):
+        settings = settings or {}
+        self.driver = driver
+        self.influx_config = influx_config
+        self.inverter_map = InverterMap(settings.get('inverters'))
+        # Without a WAL a failed write loses the poll
+        self.wal = wal
+        self.ingest_url = settings.get('ingest_url')
+        self.poll_workers = max(1, int(settings.get('poll_workers', 1)))
+        self.rediscover_seconds = float(settings.get('rediscover_seconds', 3600))
+        self.targets: List[Hashable] = []
+        self._discovered = float('-inf')
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._influx: Optional[InfluxDBClient] = None
+        self._write_api = None
+
+    def _discover(self) -> bool:
+        if self.targets and time.monotonic() - self._discovered < self.rediscover_seconds:
+            return True
+        targets = self.driver.discover()
+        if not targets:
+            DISCOVERIES.labels(self.driver.name, "failure").inc()
+            # Keep polling what was found before rather than nothing
+            return bool(self.targets)
+        DISCOVERIES.labels(self.driver.name, "success").inc()
+        TARGETS.labels(self.driver.name).set(len(targets))
+        self.targets = list(targets)
+        self._discovered = time.monotonic()
+        return True
+
+    def _poll_all(self) -> List[Any]:
+        if self.poll_workers == 1 or len(self.targets) == 1:
+            return [self.driver.poll(target) for target in self.targets]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.poll_workers, thread_name_prefix="poll")
+        return list(self._pool.map(self.driver.poll, self.targets))
+
+    def collect(self) -> Optional[List[str]]:
+        """inverter_status lines of one cycle, or None if nothing could be read"""
+        if not self.driver.login() or not self._discover():
+            return None
+        payloads = [payload for payload in self._poll_all() if payload is not None]
+        if not payloads:
+            # Targets may have been removed from the account
+            self._discovered = float('-inf')
+            return None
+        readings = self.driver.parse(payloads)
+        if not readings:
+            return None
+        return readings_to_lines(readings, time.time_ns(), self.inverter_map)
+
+    def _write_batch(self, batch: List[str]):
+        if self._write_api is None:
+            # One client for the life of the collector instead of one per poll
+            self._influx = InfluxDBClient(url=self.influx_config['url'], token=self.influx_config['token'],
+                                          org=self.influx_config['org'])
+            self._write_api = self._influx.write_api(write_options=SYNCHRONOUS)
+        with INFLUX_WRITE_SECONDS.time(), span("influx.write", points=len(batch)):
+            try:
+                self._write_api.write(bucket=self.influx_config['bucket'], org=self.influx_config['org'],
+                                      record=batch, write_precision=WritePrecision.NS)
+            except ApiException as e:
+                if e.status in REJECTED_STATUSES:
+                    raise RejectedBatch(f"HTTP {e.status}: {e.body or e.reason}") from e
+                raise
+        POINTS_WRITTEN.inc(len(batch))
+
+    def write(self, lines: List[str]) -> bool:
+        """Write one cycle's lines, through the WAL when there is one"""
+        if not lines:
+            return False
+        try:
+            if self.wal:
+                # Durable first, then replay everything pending (this poll included) in order
+                self.wal.append(lines)
+                if not self.wal.replay(self._write_batch):
+                    return False
+            else:
+                # One request for the whole poll instead of one per inverter
+                self._write_batch(lines)
+        except Exception as e:
+            logger.error(f"Failed to write to InfluxDB: {str(e)}")
+            return False
+        logger.info("Data written to InfluxDB successfully")
+        self.forward(lines)
+        return True
+
+    def forward(self, lines: List[str]):
+        """Hand this poll's points to the backend alert engine; failures never fail the poll"""
+        if not self.ingest_url or not lines:
+            return
+        try:
+            # Plain requests, not a driver session: that one carries vendor credentials
+            response = requests.post(self.ingest_url, data="\n".join(lines).encode(),
+                                     headers={"Content-Type": "text/plain"}, timeout=5)
+            response.raise_for_status()
+            INGEST_FORWARDS.labels("success").inc()
+        except Exception as e:
+            INGEST_FORWARDS.labels("error").inc()
+            logger.warning(f"Failed to forward points to the alert engine: {str(e)}")
+
+    def poll_once(self) -> str:
+        """One cycle; returns its outcome (success, write_failed or collect_failed)"""
+        with POLL_SECONDS.time(), span("poll", driver=self.driver.name):
+            lines = self.collect()
+            if lines is None:
+                result = "collect_failed"
+            else:
+                result = "success" if self.write(lines) else "write_failed"
+        POLLS.labels(result).inc()
+        return result
+
+    def close(self):
+        self.driver.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        if self._influx is not None:
+            self._influx.close()
+            self._influx = self._write_api = None
+
+def load_config() -> Optional[Dict[str, Any]]:
+    """Load configuration from SCRAPER_CONFIG, falling back to config.json"""
+    try:
+        if os.getenv('SCRAPER_CONFIG'):
+            return json.loads(os.environ['SCRAPER_CONFIG'])
+        with open('config.json', 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Failed to load config: {str(e)}")
+        return None
+
+def run(driver_factory: Callable[[Dict[str, Any]], Driver]):
+    """Entry point of a scraper container: build the driver from the config and poll forever"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    config = load_config()
+    if not config:
+        logger.error("Failed to load configuration")
+        sys.exit(1)
+
+    settings = config.get('settings', {})
+    driver = driver_factory(config)
+    collector = Collector(driver, config['influxdb'], settings, open_wal(settings))
+
+    interval = settings.get('interval', 300)
+    if interval < driver.min_interval:
+        logger.warning(f"Interval {interval}s is below the {driver.name} minimum, using {driver.min_interval}s")
+        interval = driver.min_interval
+    metrics_port = settings.get('metrics_port', 9100)
+    if metrics_port:
+        start_http_server(metrics_port)
+        logger.info(f"Serving metrics on :{metrics_port}/metrics")
+    setup_tracing(settings.get('tracing', {}), f"{driver.name}_scraper")
+    logger.info(f"Starting {driver.name} data collection, interval: {interval}s")
+
+    # Cycles start every ``interval`` seconds, so slow polls do not drift the schedule
+    next_run = time.monotonic()
+    while True:
+        try:
+            result = collector.poll_once()
+            if result == "success":
+                logger.info("✅ Data collection successful")
+            elif result == "write_failed":
+                logger.error("❌ Failed to write to InfluxDB")
+            else:
+                logger.error("❌ Failed to collect data")
+            next_run += interval
+            time.sleep(max(0.0, next_run - time.monotonic()))
+            # A cycle longer than the interval starts the next one right away, without catch-up bursts
+            next_run = max(next_run, time.monotonic())
+        except KeyboardInterrupt:
+            logger.info("🛑 Stopping data collection...")
+            break
+        except Exception as e:
+            logger.error(f"❌ Error: {str(e)}")
+            time.sleep(30)  # Wait before retrying on error
+            next_run = time.monotonic()
+    collector.close()
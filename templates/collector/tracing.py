@@ -0,0 +1,43 @@
+"""Opt-in OpenTelemetry spans for collectors (``settings.tracing``)"""
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict
+
+logger = logging.getLogger('collector')
+
+# Set by setup_tracing() when settings.tracing is configured and OpenTelemetry is installed
+tracer = None
+
+def setup_tracing(tracing_config: Dict[str, Any], service_name: str = 'collector'):
+    """Export spans to a JSON lines file or an OTLP/HTTP collector"""
+    global tracer
+    exporter_name = tracing_config.get('exporter')
+    if not exporter_name:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        if exporter_name == 'otlp':
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter(endpoint=tracing_config.get('endpoint'))
+        else:
+            out = open(tracing_config.get('file', 'spans.jsonl'), 'a', buffering=1)
+            exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    except ImportError as e:
+        logger.warning(f"Tracing requested but OpenTelemetry is not installed: {e}")
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    tracer = trace.get_tracer(service_name)
+    logger.info(f"Tracing enabled with '{exporter_name}' exporter")
+
+@contextmanager
+def span(name: str, **attributes):
+    if tracer is None:
+        yield
+        return
+    with tracer.start_as_current_span(name, attributes=attributes):
+        yield
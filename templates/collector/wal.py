@@ -0,0 +1,197 @@
+"""Segmented on-disk write-ahead log between collection and InfluxDB"""
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import WAL_BYTES, WAL_DROPPED, WAL_REJECTED, WRITE_QUEUE_DEPTH
+
+logger = logging.getLogger('collector')
+
+class RejectedBatch(Exception):
+    """Raised by ``write_batch`` when the database refuses a batch for good (bad line, field
+    type conflict): retrying cannot succeed, so replay sets it aside instead of stopping"""
+
+class WriteAheadLog:
+    """Append-only, segmented on-disk buffer of line protocol between collection and InfluxDB.
+
+    Every poll is appended (one fsync per batch) before any write is attempted, and replay
+    sends pending lines in order, in large batches, advancing a checkpoint after each
+    accepted batch. Fully replayed segments are deleted; when the log exceeds ``max_bytes``
+    the oldest segments are dropped so an endless outage cannot fill the disk. Batches the
+    database rejects for good are moved to ``rejected.log`` (and one older ``rejected.log.1``)
+    for inspection rather than blocking every later point.
+    """
+
+    SEGMENT_PREFIX = 'wal-'
+    SEGMENT_SUFFIX = '.log'
+    REJECTED_NAME = 'rejected.log'
+
+    def __init__(self, directory: str, segment_bytes: int = 4 * 2**20, max_bytes: int = 256 * 2**20,
+                 replay_batch: int = 5000):
+        self.directory = directory
+        # At least four segments fit under the cap, so it drops old points a segment at a time
+        # (the active segment is never dropped)
+        self.segment_bytes = max(1, min(segment_bytes, max_bytes // 4))
+        self.max_bytes = max_bytes
+        self.replay_batch = replay_batch
+        os.makedirs(directory, exist_ok=True)
+        self.checkpoint_path = os.path.join(directory, 'checkpoint')
+        self.rejected_path = os.path.join(directory, self.REJECTED_NAME)
+        self.segments = sorted(
+            int(name[len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)])
+            for name in os.listdir(directory)
+            if name.startswith(self.SEGMENT_PREFIX) and name.endswith(self.SEGMENT_SUFFIX)
+        )
+        self.cursor = self._load_checkpoint()
+        if self.segments:
+            self._repair_tail()
+        else:
+            self.segments.append(self.cursor[0])
+        self.active = open(self._path(self.segments[-1]), 'ab')
+        self.pending_lines = self._count_pending()
+        self._update_gauges()
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{self.SEGMENT_PREFIX}{segment:012d}{self.SEGMENT_SUFFIX}")
+
+    def _load_checkpoint(self) -> Tuple[int, int]:
+        try:
+            with open(self.checkpoint_path) as f:
+                segment, offset = f.read().split()
+            cursor = (int(segment), int(offset))
+        except (OSError, ValueError):
+            cursor = (self.segments[0] if self.segments else 0, 0)
+        # Segments before the checkpoint may have been dropped by the size cap
+        if self.segments and cursor[0] < self.segments[0]:
+            cursor = (self.segments[0], 0)
+        return cursor
+
+    def _save_checkpoint(self):
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(f"{self.cursor[0]} {self.cursor[1]}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _repair_tail(self):
+        """Drop a partially written last line left behind by a crash mid-append"""
+        path = self._path(self.segments[-1])
+        with open(path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+                logger.warning(f"Truncated partial record at the end of {path}")
+
+    def _count_pending(self) -> int:
+        count = 0
+        for segment in self.segments:
+            if segment < self.cursor[0]:
+                continue
+            with open(self._path(segment), 'rb') as f:
+                if segment == self.cursor[0]:
+                    f.seek(self.cursor[1])
+                count += sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(2**20), b''))
+        return count
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(self._path(segment)) for segment in self.segments)
+
+    def _update_gauges(self):
+        WRITE_QUEUE_DEPTH.set(self.pending_lines)
+        WAL_BYTES.set(self.size_bytes())
+
+    def append(self, lines: List[str]):
+        """Durably append one batch of line protocol"""
+        if not lines:
+            return
+        self.active.write(('\n'.join(lines) + '\n').encode())
+        self.active.flush()
+        os.fsync(self.active.fileno())
+        self.pending_lines += len(lines)
+        if self.active.tell() >= self.segment_bytes:
+            self._rotate()
+        self._enforce_cap()
+        self._update_gauges()
+
+    def _rotate(self):
+        self.active.close()
+        self.segments.append(self.segments[-1] + 1)
+        self.active = open(self._path(self.segments[-1]), 'ab')
+
+    def _enforce_cap(self):
+        while len(self.segments) > 1 and self.size_bytes() > self.max_bytes:
+            segment = self.segments.pop(0)
+            path = self._path(segment)
+            with open(path, 'rb') as f:
+                if segment == self.cursor[0]:
+                    f.seek(self.cursor[1])
+                dropped = sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(2**20), b''))
+            os.remove(path)
+            if segment >= self.cursor[0]:
+                self.cursor = (self.segments[0], 0)
+                self._save_checkpoint()
+                self.pending_lines -= dropped
+                WAL_DROPPED.inc(dropped)
+                logger.error(f"WAL over {self.max_bytes} bytes, dropped {dropped} unreplayed points")
+
+    def _reject(self, raw: List[bytes], error: Exception):
+        """Set a refused batch aside so replay can move past it"""
+        if os.path.exists(self.rejected_path) and os.path.getsize(self.rejected_path) >= self.segment_bytes:
+            os.replace(self.rejected_path, self.rejected_path + '.1')
+        with open(self.rejected_path, 'ab') as f:
+            f.writelines(raw)
+        WAL_REJECTED.inc(len(raw))
+        logger.error(f"InfluxDB rejected {len(raw)} points, moved to {self.rejected_path}: {error}")
+
+    def replay(self, write_batch) -> bool:
+        """Send pending lines in order via ``write_batch(lines)``; True once fully caught up.
+
+        Replay stops at the first batch that fails, to be retried next time, unless it raised
+        ``RejectedBatch``.
+        """
+        while self.cursor[0] <= self.segments[-1]:
+            segment, offset = self.cursor
+            with open(self._path(segment), 'rb') as f:
+                f.seek(offset)
+                while True:
+                    raw = f.readlines(self.replay_batch * 256)
+                    if not raw:
+                        break
+                    try:
+                        write_batch([line.decode().rstrip('\n') for line in raw])
+                    except RejectedBatch as e:
+                        self._reject(raw, e)
+                    except Exception as e:
+                        logger.error(f"WAL replay stopped, {self.pending_lines} points pending: {e}")
+                        self._update_gauges()
+                        return False
+                    offset = f.tell()
+                    self.cursor = (segment, offset)
+                    self._save_checkpoint()
+                    self.pending_lines -= len(raw)
+            if segment == self.segments[-1]:
+                break
+            # Closed segment fully replayed: compact it away
+            os.remove(self._path(segment))
+            self.segments.pop(0)
+            self.cursor = (self.segments[0], 0)
+            self._save_checkpoint()
+        # Start a fresh segment once the active one is fully replayed and big enough
+        if self.cursor[1] >= self.segment_bytes // 2:
+            self._rotate()
+            os.remove(self._path(self.segments.pop(0)))
+            self.cursor = (self.segments[0], 0)
+            self._save_checkpoint()
+        self._update_gauges()
+        return True
+
+def open_wal(settings: Dict[str, Any]) -> Optional[WriteAheadLog]:
+    """WAL from settings.wal_dir (default /app/wal); an empty wal_dir disables it"""
+    wal_dir = settings.get('wal_dir', '/app/wal')
+    if not wal_dir:
+        return None
+    wal = WriteAheadLog(wal_dir, max_bytes=int(settings.get('wal_max_mb', 256)) * 2**20)
+    if wal.pending_lines:
+        logger.info(f"WAL has {wal.pending_lines} points pending from a previous run")
+    return wal
@@ -0,0 +1,273 @@
+"""GoodWe inverters read directly on the LAN, without the SEMS portal.
+
+Two transports carry the same holding-register reads (function 0x03):
+
+- ``modbus_tcp``: Modbus TCP on port 502 (ET/EH/BT families with a LAN or Wi-Fi/LAN kit),
+  one persistent connection per inverter
+- ``udp``: the Wi-Fi kit's UDP service on port 8899, a Modbus RTU request to address 0xF7
+  answered with an ``AA55`` header, as the SolarGo app does
+
+The register map is read in as few requests as possible: registers closer than
+``MAX_GAP`` apart share one read of at most ``MAX_BLOCK`` registers.
+"""
+import logging
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from collector import FIELDS, Driver, Reading
+
+logger = logging.getLogger('sems_scraper')
+
+MODBUS_TCP_PORT = 502
+UDP_PORT = 8899
+# Modbus address GoodWe inverters answer on, over both transports
+COMM_ADDRESS = 0xF7
+# Largest read a Modbus request may ask for, and the widest hole worth reading through
+MAX_BLOCK = 125
+MAX_GAP = 64
+
+# Collector field -> (first register, type, scale) for ET/EH/BT running data (block 35100).
+# Overridable per config through settings.local.registers.
+REGISTERS: Dict[str, Tuple[int, str, float]] = {
+    "current_power": (35138, "int16", 1),     # Total inverter power, W
+    "work_mode": (35187, "uint16", 1),        # 1 is normal operation
+    "total_energy": (35191, "uint32", 0.1),   # kWh
+    "daily_energy": (35193, "uint32", 0.1),   # kWh
+    "total_hours": (35197, "uint32", 1),
+}
+SERIAL_REGISTER = 35003
+SERIAL_LENGTH = 8  # Registers, 16 ASCII characters
+ONLINE_WORK_MODE = 1
+
+REGISTER_WIDTH = {"int16": 1, "uint16": 1, "int32": 2, "uint32": 2}
+
+class LocalProtocolError(Exception):
+    """A malformed, mismatched or exception response"""
+
+def crc16(data: bytes) -> int:
+    """Modbus RTU CRC (poly 0xA001, init 0xFFFF)"""
+    crc = 0xFFFF
+    for byte in data:
+        crc = _CRC_TABLE[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc
+
+def _crc_table() -> List[int]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+_CRC_TABLE = _crc_table()
+
+def register_blocks(addresses: List[Tuple[int, int]], max_gap: int = MAX_GAP,
+                    max_block: int = MAX_BLOCK) -> List[Tuple[int, int]]:
+    """Merge (start, count) spans into the fewest (start, count) reads"""
+    blocks: List[List[int]] = []
+    for start, count in sorted(addresses):
+        end = start + count
+        if blocks and start - blocks[-1][1] <= max_gap and end - blocks[-1][0] <= max_block:
+            blocks[-1][1] = max(blocks[-1][1], end)
+        else:
+            blocks.append([start, end])
+    return [(start, end - start) for start, end in blocks]
+
+def decode(registers: Dict[int, int], address: int, kind: str, scale: float = 1) -> Optional[float]:
+    words = [registers.get(address + offset) for offset in range(REGISTER_WIDTH[kind])]
+    if None in words:
+        return None
+    value = words[0] << 16 | words[1] if len(words) == 2 else words[0]
+    if kind == "int16" and value >= 0x8000:
+        value -= 0x10000
+    elif kind == "int32" and value >= 0x80000000:
+        value -= 0x100000000
+    # Dividing by 10 rather than multiplying by 0.1 keeps 3 * 0.1 from becoming 0.30000000000000004
+    return value * scale if scale >= 1 else value / round(1 / scale)
+
+class ModbusTcpTransport:
+    """Persistent Modbus TCP connection, reconnected after any error"""
+
+    def __init__(self, host: str, port: int = MODBUS_TCP_PORT, unit_id: int = COMM_ADDRESS, timeout: float = 2.0):
+        self.host = host
+        self.port = port
+        self.unit_id = unit_id
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._transaction = 0
+
+    def _recv(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by the inverter")
+            data += chunk
+        return data
+
+    def read(self, start: int, count: int) -> List[int]:
+        if self._sock is None:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._transaction = (self._transaction + 1) & 0xFFFF
+        request = struct.pack(">HHHBBHH", self._transaction, 0, 6, self.unit_id, 3, start, count)
+        try:
+            self._sock.sendall(request)
+            transaction, protocol, length = struct.unpack(">HHH", self._recv(6))
+            body = self._recv(length)
+        except Exception:
+            self.close()
+            raise
+        if transaction != self._transaction or protocol != 0 or length < 3:
+            self.close()
+            raise LocalProtocolError(f"Unexpected MBAP header from {self.host}")
+        function = body[1]
+        if function & 0x80:
+            raise LocalProtocolError(f"Modbus exception {body[2]} reading {count} register(s) at {start}")
+        if body[2] != count * 2 or len(body) != 3 + count * 2:
+            raise LocalProtocolError(f"Short read from {self.host}: {body[2]} bytes for {count} register(s)")
+        return list(struct.unpack(f">{count}H", body[3:]))
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+class UdpTransport:
+    """Modbus RTU over the Wi-Fi kit's UDP port, answered with an AA55 header"""
+
+    def __init__(self, host: str, port: int = UDP_PORT, unit_id: int = COMM_ADDRESS, timeout: float = 2.0,
+                 retries: int = 2):
+        self.host = host
+        self.port = port
+        self.unit_id = unit_id
+        self.timeout = timeout
+        self.retries = retries
+        self._sock: Optional[socket.socket] = None
+
+    def read(self, start: int, count: int) -> List[int]:
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.settimeout(self.timeout)
+            self._sock.connect((self.host, self.port))
+        frame = struct.pack(">BBHH", self.unit_id, 3, start, count)
+        request = frame + struct.pack("<H", crc16(frame))
+        expected = 2 + 3 + count * 2 + 2
+        problem = "no response"
+        for _ in range(self.retries + 1):
+            self._sock.send(request)
+            try:
+                response = self._sock.recv(expected + 16)
+            except socket.timeout:
+                # UDP drops are routine on these kits
+                problem = "no response"
+                continue
+            # A late answer to an earlier request fails these checks and is retried past
+            if response[:2] != b"\xaa\x55" or len(response) != expected or response[2:4] != frame[:2]:
+                problem = f"unexpected response {response[:8].hex()}"
+                continue
+            if struct.unpack("<H", response[-2:])[0] != crc16(response[2:-2]):
+                problem = "CRC mismatch"
+                continue
+            return list(struct.unpack(f">{count}H", response[5:-2]))
+        raise LocalProtocolError(f"Reading {count} register(s) at {start} from {self.host}: {problem}")
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+TRANSPORTS = {"modbus_tcp": ModbusTcpTransport, "udp": UdpTransport}
+
+class LocalInverter:
+    """One inverter on the LAN and its transport"""
+
+    def __init__(self, host: str, protocol: str = "modbus_tcp", port: Optional[int] = None,
+                 unit_id: int = COMM_ADDRESS, sn: Optional[str] = None, timeout: float = 2.0):
+        if protocol not in TRANSPORTS:
+            raise ValueError(f"protocol must be one of {', '.join(TRANSPORTS)}")
+        kwargs = {"unit_id": unit_id, "timeout": timeout}
+        if port:
+            kwargs["port"] = port
+        self.host = host
+        self.transport = TRANSPORTS[protocol](host, **kwargs)
+        # Read from the inverter on first contact unless configured
+        self.sn = sn
+        # Inverters are polled from worker threads; each one by one thread at a time
+        self.lock = threading.Lock()
+
+    def read_serial(self) -> str:
+        words = self.transport.read(SERIAL_REGISTER, SERIAL_LENGTH)
+        return b"".join(struct.pack(">H", word) for word in words).decode("ascii", "ignore").strip("\x00 ")
+
+class GoodWeLocalDriver(Driver):
+    """GoodWe inverters polled over Modbus TCP or UDP instead of the SEMS portal"""
+
+    name = "goodwe_local"
+    # No cloud rate limit to respect: the LAN kit answers in tens of milliseconds
+    min_interval = 1
+
+    def __init__(self, inverters: List[LocalInverter], registers: Optional[Dict[str, Tuple[int, str, float]]] = None):
+        self.inverters = inverters
+        self.registers = {name: tuple(spec) for name, spec in (registers or REGISTERS).items()}
+        for name, (_, kind, _) in self.registers.items():
+            if kind not in REGISTER_WIDTH:
+                raise ValueError(f"Unknown register type {kind!r} for {name}")
+        self.blocks = register_blocks([(address, REGISTER_WIDTH[kind])
+                                       for address, kind, _ in self.registers.values()])
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "GoodWeLocalDriver":
+        local = config.get('settings', {}).get('local', {})
+        timeout = float(local.get('timeout', 2.0))
+        inverters = [
+            LocalInverter(host['host'], host.get('protocol', local.get('protocol', 'modbus_tcp')), host.get('port'),
+                          int(host.get('unit_id', COMM_ADDRESS)), host.get('sn'), timeout)
+            for host in local.get('hosts', [])
+        ]
+        return cls(inverters, {**REGISTERS, **local.get('registers', {})})
+
+    def login(self) -> bool:
+        return bool(self.inverters)
+
+    def discover(self) -> List[int]:
+        """Every configured inverter; unreachable ones simply fail their poll"""
+        return list(range(len(self.inverters)))
+
+    def poll(self, index: int) -> Optional[Tuple[str, Dict[int, int]]]:
+        """(serial, register -> value) of one inverter"""
+        inverter = self.inverters[index]
+        with inverter.lock:
+            try:
+                if not inverter.sn:
+                    with self.request("read_serial"):
+                        inverter.sn = inverter.read_serial()
+                registers: Dict[int, int] = {}
+                for start, count in self.blocks:
+                    with self.request("read_registers"):
+                        words = inverter.transport.read(start, count)
+                    registers.update(zip(range(start, start + count), words))
+                return inverter.sn, registers
+            except Exception as e:
+                logger.error(f"Failed to read inverter at {inverter.host}: {str(e)}")
+                return None
+
+    def parse(self, payloads: List[Tuple[str, Dict[int, int]]]) -> List[Reading]:
+        # Monthly energy has no register and is left out of the points
+        fields = [self.registers.get(field) for field in FIELDS]
+        readings = []
+        for serial, registers in payloads:
+            values = [decode(registers, *spec) if spec else None for spec in fields]
+            work_mode = decode(registers, *self.registers["work_mode"]) if "work_mode" in self.registers else None
+            readings.append(Reading(serial, values, work_mode == ONLINE_WORK_MODE))
+        return readings
+
+    def close(self):
+        for inverter in self.inverters:
+            inverter.transport.close()
+